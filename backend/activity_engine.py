@@ -0,0 +1,160 @@
+"""Points, daily points and streak bookkeeping for completed activities.
+
+Every completed activity is scored on the server (ACTIVITY_POINTS) and applied
+in one transaction to the `users/{uid}` counters, the user's day doc and the
+history summary. Counters use `Increment`, so two devices completing tasks at
+the same moment both count.
+
+Days are the user's local calendar days (IANA timezone sent by the client,
+else the last one stored on the user, else DEFAULT_TIMEZONE). `dailyPoints`
+resets on the first activity after local midnight, and the streak grows by one
+on each consecutive active day. Readers use `effective_counters` so a user who
+has been away sees 0 daily points and a broken streak without any write.
+"""
+
+import copy
+import datetime
+import os
+from dataclasses import dataclass
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from google.cloud.firestore_v1 import Increment
+
+ACTIVITY_POINTS = {
+    "task": 10,
+    "water": 2,
+    "sleep": 5,
+    "gym": 10,
+    "medication": 5,
+    "custom": 5,
+}
+# Day-doc activity field each kind accumulates into.
+_ACTIVITY_FIELDS = {
+    "water": "waterIntake",
+    "sleep": "sleepHours",
+    "gym": "gymMinutes",
+}
+
+
+def default_timezone() -> str:
+    return (os.getenv("DEFAULT_TIMEZONE") or "Asia/Kolkata").strip()
+
+
+def local_today(tz_name: str | None, now: datetime.datetime | None = None) -> str:
+    try:
+        tz = ZoneInfo(tz_name or default_timezone())
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone '{tz_name}'")
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now.astimezone(tz).date().isoformat()
+
+
+def _days_between(earlier: str, later: str) -> int | None:
+    try:
+        return (datetime.date.fromisoformat(later) - datetime.date.fromisoformat(earlier)).days
+    except (TypeError, ValueError):
+        return None
+
+
+def effective_counters(user_doc: dict[str, Any], today: str) -> dict[str, int]:
+    """Streak and daily points as of `today`, without requiring a write at midnight."""
+
+    streak = int(user_doc.get("streak") or 0)
+    daily_points = int(user_doc.get("dailyPoints") or 0)
+    gap = _days_between(str(user_doc.get("lastActivityDate") or ""), today)
+    if gap is None or gap > 0:
+        daily_points = 0
+    if gap is None or gap > 1:
+        streak = 0
+    return {"streak": streak, "dailyPoints": daily_points}
+
+
+@dataclass
+class ActivityPlan:
+    points: int
+    today: str
+    user_updates: dict[str, Any]
+    user_values: dict[str, Any]
+    day_updates: dict[str, Any]
+    day: dict[str, Any]
+
+
+def plan_activity(
+    user_doc: dict[str, Any],
+    day_doc: dict[str, Any] | None,
+    kind: str,
+    amount: float,
+    task_name: str | None,
+    tz_name: str,
+    today: str,
+    now_iso: str,
+) -> ActivityPlan:
+    points = ACTIVITY_POINTS[kind]
+    tasks = 1 if kind in ("task", "custom") else 0
+
+    last_date = str(user_doc.get("lastActivityDate") or "")
+    gap = _days_between(last_date, today)
+    if gap is not None and gap < 0:
+        # Travelling west can put "today" behind the stored day; keep counting on that day.
+        today, gap = last_date, 0
+    streak = int(user_doc.get("streak") or 0)
+    if gap == 0 and streak > 0:
+        new_streak = streak
+    elif gap == 1:
+        new_streak = streak + 1
+    else:
+        new_streak = 1
+    rollover = gap != 0
+
+    user_updates: dict[str, Any] = {
+        "points": Increment(points),
+        "dailyPoints": points if rollover else Increment(points),
+        "totalTasksCompleted": Increment(tasks),
+        "streak": new_streak,
+        "lastActivityDate": today,
+        "timezone": tz_name,
+    }
+    user_values = {
+        "points": int(user_doc.get("points") or 0) + points,
+        "dailyPoints": points if rollover else int(user_doc.get("dailyPoints") or 0) + points,
+        "totalTasksCompleted": int(user_doc.get("totalTasksCompleted") or 0) + tasks,
+        "streak": new_streak,
+        "lastActivityDate": today,
+        "timezone": tz_name,
+    }
+
+    activity_updates: dict[str, Any] = {"pointsEarned": Increment(points), "tasksCompleted": Increment(tasks)}
+    day = copy.deepcopy(day_doc or {})
+    activities = day.setdefault("activities", {})
+    activities["pointsEarned"] = int(activities.get("pointsEarned") or 0) + points
+    activities["tasksCompleted"] = int(activities.get("tasksCompleted") or 0) + tasks
+    field = _ACTIVITY_FIELDS.get(kind)
+    if field is not None:
+        activity_updates[field] = Increment(amount)
+        activities[field] = float(activities.get(field) or 0) + amount
+    elif kind == "medication":
+        activity_updates["medicationTaken"] = True
+        activities["medicationTaken"] = True
+    elif kind == "custom" and task_name:
+        activity_updates["customActivities"] = {task_name: Increment(1)}
+        custom = activities.setdefault("customActivities", {})
+        custom[task_name] = int(custom.get(task_name) or 0) + 1
+
+    snapshot = {
+        "date": today,
+        "points": user_values["points"],
+        "dailyPoints": user_values["dailyPoints"],
+        "streak": new_streak,
+        "totalTasksCompleted": user_values["totalTasksCompleted"],
+        "savedAt": now_iso,
+    }
+    day.update(snapshot)
+    return ActivityPlan(
+        points=points,
+        today=today,
+        user_updates=user_updates,
+        user_values=user_values,
+        day_updates={**snapshot, "activities": activity_updates},
+        day=day,
+    )
@@ -0,0 +1,194 @@
+"""Async AssemblyAI client on a pooled httpx connection.
+
+One `httpx.AsyncClient` is shared per process so upload, transcript creation
+and polling reuse keep-alive connections instead of paying a TLS handshake per
+call. Audio is streamed to /v2/upload in chunks. Completion is awaited with
+exponential backoff plus jitter; when ASSEMBLYAI_WEBHOOK_URL is set the
+transcript is also created with a webhook and the waiter wakes as soon as
+`/voice/assemblyai/webhook` reports it, with polling kept as a slow fallback
+(the callback may land on a different worker process).
+
+ASSEMBLYAI_BASE_URL points the client at a local fake server for testing.
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, AsyncIterator, BinaryIO
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+_UPLOAD_CHUNK_BYTES = 64 * 1024
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+WEBHOOK_SECRET_HEADER = "x-swasthai-webhook-secret"
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter: uniform in [base, min(cap, base * 2**attempt)]."""
+
+    ceiling = min(cap, base * (2 ** attempt))
+    return random.uniform(base, max(base, ceiling))
+
+
+async def _iter_file(audio_file: BinaryIO) -> AsyncIterator[bytes]:
+    # Uploads are spooled to disk past a size, so reads run off the event loop.
+    while True:
+        chunk = await run_in_threadpool(audio_file.read, _UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AssemblyAIClient:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        webhook_url: str | None = None,
+        webhook_secret: str | None = None,
+        timeout_seconds: float = 90.0,
+        poll_base_seconds: float = 0.5,
+        poll_max_seconds: float = 5.0,
+        max_retries: int = 3,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.timeout_seconds = timeout_seconds
+        self.poll_base_seconds = poll_base_seconds
+        self.poll_max_seconds = poll_max_seconds
+        self.max_retries = max_retries
+        self._client: httpx.AsyncClient | None = None
+        self._waiters: dict[str, asyncio.Future[None]] = {}
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"authorization": self.api_key},
+                timeout=httpx.Timeout(30.0, write=60.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                resp = await self._http().request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if resp.status_code not in _RETRY_STATUS or attempt >= self.max_retries:
+                    resp.raise_for_status()
+                    return resp
+            await asyncio.sleep(backoff_delay(attempt, self.poll_base_seconds, self.poll_max_seconds))
+            attempt += 1
+
+    async def upload(self, audio_file: BinaryIO) -> str:
+        # A streamed body cannot be replayed, so uploads are not retried.
+        resp = await self._http().post("/v2/upload", content=_iter_file(audio_file), timeout=60.0)
+        resp.raise_for_status()
+        upload_url = resp.json().get("upload_url")
+        if not upload_url:
+            raise RuntimeError("AssemblyAI upload failed")
+        return upload_url
+
+    async def create_transcript(self, audio_url: str) -> str:
+        body: dict[str, Any] = {
+            "audio_url": audio_url,
+            "language_detection": True,
+        }
+        if self.webhook_url:
+            body["webhook_url"] = self.webhook_url
+            if self.webhook_secret:
+                body["webhook_auth_header_name"] = WEBHOOK_SECRET_HEADER
+                body["webhook_auth_header_value"] = self.webhook_secret
+        resp = await self._request("POST", "/v2/transcript", json=body)
+        transcript_id = resp.json().get("id")
+        if not transcript_id:
+            raise RuntimeError("AssemblyAI transcript creation failed")
+        return transcript_id
+
+    async def wait_for_transcript(self, transcript_id: str) -> str:
+        deadline = time.monotonic() + self.timeout_seconds
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters[transcript_id] = waiter
+        attempt = 0
+        try:
+            while True:
+                resp = await self._request("GET", f"/v2/transcript/{transcript_id}")
+                payload = resp.json()
+                status = payload.get("status")
+                if status == "completed":
+                    return (payload.get("text") or "").strip()
+                if status == "error":
+                    raise RuntimeError(payload.get("error") or "AssemblyAI transcription error")
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError("AssemblyAI transcription timed out")
+                delay = min(remaining, backoff_delay(attempt, self.poll_base_seconds, self.poll_max_seconds))
+                attempt += 1
+                try:
+                    # A webhook callback cuts the wait short.
+                    await asyncio.wait_for(asyncio.shield(waiter), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.pop(transcript_id, None)
+
+    def notify_webhook(self, transcript_id: str) -> bool:
+        """Wake a local waiter for `transcript_id`; False when none is waiting here."""
+
+        waiter = self._waiters.get(transcript_id)
+        if waiter is None or waiter.done():
+            return False
+        waiter.set_result(None)
+        return True
+
+    async def transcribe(self, audio_file: BinaryIO, language_code: str) -> str:
+        # Language detection stays on; `language_code` is reserved for forcing a language.
+        _ = language_code
+        upload_url = await self.upload(audio_file)
+        transcript_id = await self.create_transcript(upload_url)
+        return await self.wait_for_transcript(transcript_id)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_assemblyai_client: AssemblyAIClient | None = None
+
+
+def get_assemblyai_client() -> AssemblyAIClient | None:
+    """Shared client, or None when ASSEMBLYAI_API_KEY is not set."""
+
+    global _assemblyai_client
+    api_key = (os.getenv("ASSEMBLYAI_API_KEY") or "").strip()
+    if not api_key:
+        return None
+    if _assemblyai_client is None:
+        _assemblyai_client = AssemblyAIClient(
+            api_key=api_key,
+            base_url=(os.getenv("ASSEMBLYAI_BASE_URL") or "https://api.assemblyai.com").strip(),
+            webhook_url=(os.getenv("ASSEMBLYAI_WEBHOOK_URL") or "").strip() or None,
+            webhook_secret=(os.getenv("ASSEMBLYAI_WEBHOOK_SECRET") or "").strip() or None,
+            timeout_seconds=_float_env("ASSEMBLYAI_TIMEOUT_SECONDS", 90.0),
+            poll_base_seconds=_float_env("ASSEMBLYAI_POLL_BASE_SECONDS", 0.5),
+            poll_max_seconds=_float_env("ASSEMBLYAI_POLL_MAX_SECONDS", 5.0),
+        )
+    return _assemblyai_client
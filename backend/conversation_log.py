@@ -0,0 +1,286 @@
+"""Write-behind log for voice conversation records.
+
+`append` only queues the record, so the request path never waits on
+Firestore. A background thread writes queued records in batches (at most 500
+writes each) every CONVERSATION_LOG_FLUSH_MS, or sooner once
+CONVERSATION_LOG_FLUSH_RECORDS are waiting. Each record gets its document id at
+append time, so a retried batch overwrites rather than duplicates.
+
+When a spill directory is configured (CONVERSATION_LOG_SPILL_DIR; off by
+default, since records hold transcripts), a failed batch is written to a new
+JSONL file there and replayed ahead of new records on later flushes, so
+transient outages and restarts lose nothing. Spill files are written
+atomically (in a 0700 directory) and never appended to. A process claims one by
+renaming it before replay, so workers sharing the directory never drop each
+other's records. Claims held longer than _STALE_CLAIM_SECONDS (a process died
+mid-replay) are taken over; replays are idempotent because ids are fixed.
+
+Without a spill directory, failed records stay queued, up to
+CONVERSATION_LOG_MAX_QUEUED; past that the oldest are dropped. `stop()` drains
+the queue on shutdown.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable
+
+# Firestore allows at most 500 writes per batch.
+_MAX_BATCH_WRITES = 500
+_DATETIME_TAG = "$datetime"
+_SPILL_SUFFIX = ".jsonl"
+_CLAIM_MARKER = ".claimed-"
+_STALE_CLAIM_SECONDS = 600.0
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {_DATETIME_TAG: value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and set(value) == {_DATETIME_TAG}:
+        return datetime.datetime.fromisoformat(value[_DATETIME_TAG])
+    return value
+
+
+class ConversationLog:
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        collection: str,
+        flush_interval_seconds: float,
+        flush_max_records: int,
+        spill_dir: str | Path | None,
+        max_queued: int = 10000,
+    ):
+        self._get_client = get_client
+        self.collection = collection
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_max_records = max(int(flush_max_records), 1)
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_queued = max(int(max_queued), self.flush_max_records)
+        self._queue: deque[tuple[str, dict[str, Any]]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.appended = 0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.skipped_rows = 0
+        self.flush_errors = 0
+        self.last_flush_at: float | None = None
+        self.last_error: str | None = None
+
+    def append(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            self._queue.append((uuid.uuid4().hex, record))
+            self.appended += 1
+            self._trim_queue()
+            if len(self._queue) >= self.flush_max_records:
+                self._wake.set()
+
+    def _trim_queue(self) -> None:
+        # Callers hold self._lock.
+        while len(self._queue) > self.max_queued:
+            self._queue.popleft()
+            self.dropped += 1
+
+    def _requeue(self, records: list[tuple[str, dict[str, Any]]]) -> None:
+        with self._lock:
+            self._queue.extendleft(reversed(records))
+            self._trim_queue()
+
+    def _write(self, records: list[tuple[str, dict[str, Any]]]) -> None:
+        fs = self._get_client()
+        col = fs.collection(self.collection)
+        for start in range(0, len(records), _MAX_BATCH_WRITES):
+            batch = fs.batch()
+            for doc_id, data in records[start : start + _MAX_BATCH_WRITES]:
+                batch.set(col.document(doc_id), data)
+            batch.commit()
+
+    def _spill(self, records: list[tuple[str, dict[str, Any]]]) -> None:
+        if self.spill_dir is None:
+            # Nowhere durable to put them; keep them queued for the next flush.
+            self._requeue(records)
+            return
+        lines = [
+            json.dumps({"id": doc_id, "data": {k: _encode_value(v) for k, v in data.items()}}, ensure_ascii=False)
+            for doc_id, data in records
+        ]
+        name = f"{time.time_ns()}-{uuid.uuid4().hex}"
+        tmp_path = self.spill_dir / f"{name}.tmp"
+        try:
+            self.spill_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            # Only complete files ever carry the replayable suffix.
+            os.replace(tmp_path, self.spill_dir / f"{name}{_SPILL_SUFFIX}")
+        except OSError as e:
+            print(f"[conversation-log] spill to {self.spill_dir} failed: {e}")
+            self._requeue(records)
+            return
+        self.spilled += len(records)
+
+    def _spill_files(self) -> list[Path]:
+        """Unclaimed spill files, oldest first, plus claims abandoned by a dead process."""
+
+        if self.spill_dir is None or not self.spill_dir.is_dir():
+            return []
+        files = sorted(self.spill_dir.glob(f"*{_SPILL_SUFFIX}"))
+        now = time.time()
+        for path in sorted(self.spill_dir.glob(f"*{_CLAIM_MARKER}*")):
+            try:
+                if now - path.stat().st_mtime > _STALE_CLAIM_SECONDS:
+                    files.append(path)
+            except OSError:
+                continue
+        return files
+
+    def _read_spill_file(self, path: Path) -> list[tuple[str, dict[str, Any]]]:
+        records: list[tuple[str, dict[str, Any]]] = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    self.skipped_rows += 1
+                    continue
+                if (
+                    not isinstance(row, dict)
+                    or not isinstance(row.get("id"), str)
+                    or not isinstance(row.get("data"), dict)
+                ):
+                    self.skipped_rows += 1
+                    continue
+                records.append((row["id"], {k: _decode_value(v) for k, v in row["data"].items()}))
+        return records
+
+    def _replay_spill(self) -> None:
+        for path in self._spill_files():
+            base_name = path.name.split(_CLAIM_MARKER)[0]
+            claimed = path.with_name(f"{base_name}{_CLAIM_MARKER}{uuid.uuid4().hex}")
+            try:
+                os.replace(path, claimed)
+                os.utime(claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            try:
+                records = self._read_spill_file(claimed)
+                if records:
+                    self._write(records)
+            except Exception:
+                # Release the claim so this (or another) worker retries it.
+                try:
+                    os.replace(claimed, path.with_name(base_name))
+                except OSError:
+                    pass
+                raise
+            self.replayed += len(records)
+            claimed.unlink(missing_ok=True)
+
+    def flush(self) -> int:
+        """Write spilled and queued records. Returns the number of queued records written."""
+
+        with self._flush_lock:
+            with self._lock:
+                records = list(self._queue)
+                self._queue.clear()
+            try:
+                self._replay_spill()
+                if records:
+                    self._write(records)
+            except Exception as e:
+                self.flush_errors += 1
+                self.last_error = str(e)
+                # Ids are fixed, so records from a partly committed write are simply rewritten later.
+                if records:
+                    self._spill(records)
+                raise
+            self.written += len(records)
+            self.last_flush_at = time.time()
+            return len(records)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[conversation-log] flush failed: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-log-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval_seconds + 5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[conversation-log] final flush failed, records kept in {self.spill_dir}: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            queued = len(self._queue)
+        spill_files = len(self._spill_files())
+        return {
+            "flushIntervalSeconds": self.flush_interval_seconds,
+            "flushMaxRecords": self.flush_max_records,
+            "queued": queued,
+            "maxQueued": self.max_queued,
+            "dropped": self.dropped,
+            "appended": self.appended,
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "spillFiles": spill_files,
+            "skippedSpillRows": self.skipped_rows,
+            "flushErrors": self.flush_errors,
+            "lastFlushAt": self.last_flush_at,
+            "lastError": self.last_error,
+        }
+
+
+def conversation_log_settings() -> dict[str, Any]:
+    try:
+        interval_ms = float(os.getenv("CONVERSATION_LOG_FLUSH_MS") or "1000")
+    except ValueError:
+        interval_ms = 1000.0
+    try:
+        max_records = int(os.getenv("CONVERSATION_LOG_FLUSH_RECORDS") or "100")
+    except ValueError:
+        max_records = 100
+    try:
+        max_queued = int(os.getenv("CONVERSATION_LOG_MAX_QUEUED") or "10000")
+    except ValueError:
+        max_queued = 10000
+    spill_dir = (os.getenv("CONVERSATION_LOG_SPILL_DIR") or "").strip() or None
+    return {
+        "flush_interval_seconds": interval_ms / 1000.0,
+        "flush_max_records": max_records,
+        "spill_dir": spill_dir,
+        "max_queued": max_queued,
+    }
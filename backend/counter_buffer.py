@@ -0,0 +1,183 @@
+"""Write-behind aggregation of counter increments.
+
+Hot counters (reaction totals, member counts) would serialize on Firestore's
+~1 sustained write/second/document limit if every request incremented the
+document directly. Instead, requests add deltas to an in-process buffer and a
+background thread flushes them every COUNTER_FLUSH_INTERVAL_SECONDS as one
+`Increment` per (document, field) in batched writes. Increments from several
+workers still compose correctly because Increment is applied server-side.
+
+Flushes use `update`, so a deleted document is skipped rather than recreated
+as a counters-only stub. Deltas are kept for the next flush only when the
+commit was rejected; after a timeout or server error the commit may have been
+applied, so they are dropped (and counted) rather than risk counting twice.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable
+
+from google.api_core.exceptions import ClientError, NotFound
+from google.cloud.firestore_v1 import Increment
+from google.cloud.firestore_v1.field_path import FieldPath
+
+# Firestore allows at most 500 writes per batch.
+_MAX_BATCH_WRITES = 500
+
+
+def _increments(fields: dict[tuple[str, ...], int]) -> dict[str, Any]:
+    return {FieldPath(*field_path).to_api_repr(): Increment(delta) for field_path, delta in fields.items()}
+
+
+class CounterBuffer:
+    def __init__(self, name: str, get_client: Callable[[], Any], flush_interval_seconds: float):
+        self.name = name
+        self._get_client = get_client
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: dict[str, dict[tuple[str, ...], int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.flushes = 0
+        self.flushed_increments = 0
+        self.flush_errors = 0
+        self.dropped_increments = 0
+        self.missing_docs = 0
+        self.last_flush_at: float | None = None
+        self.last_error: str | None = None
+
+    def add(self, doc_path: str, field_path: tuple[str, ...], delta: int) -> None:
+        if not delta:
+            return
+        with self._lock:
+            self._pending[doc_path][field_path] += delta
+
+    def pending(self, doc_path: str) -> dict[tuple[str, ...], int]:
+        with self._lock:
+            return {k: v for k, v in self._pending.get(doc_path, {}).items() if v}
+
+    def _drain(self) -> dict[str, dict[tuple[str, ...], int]]:
+        with self._lock:
+            drained = {path: {f: d for f, d in fields.items() if d} for path, fields in self._pending.items()}
+            self._pending = defaultdict(lambda: defaultdict(int))
+        return {path: fields for path, fields in drained.items() if fields}
+
+    def _restore(self, drained: dict[str, dict[tuple[str, ...], int]]) -> None:
+        with self._lock:
+            for path, fields in drained.items():
+                for field_path, delta in fields.items():
+                    self._pending[path][field_path] += delta
+
+    def _failed(self, e: Exception, unsent: list[tuple[str, dict[tuple[str, ...], int]]], uncertain: int) -> None:
+        # `unsent` never reached Firestore and goes out with the next flush;
+        # `uncertain` increments may have been applied and are dropped.
+        self._restore(dict(unsent))
+        self.dropped_increments += uncertain
+        self.flush_errors += 1
+        self.last_error = str(e)
+
+    def _update_each(self, fs: Any, chunk: list[tuple[str, dict[tuple[str, ...], int]]]) -> int:
+        """Write a chunk one document at a time, skipping documents that were deleted."""
+
+        written = 0
+        for doc_path, fields in chunk:
+            try:
+                fs.document(doc_path).update(_increments(fields))
+            except NotFound:
+                self.missing_docs += 1
+                continue
+            except ClientError as e:
+                self._failed(e, [(doc_path, fields)], 0)
+                continue
+            except Exception as e:
+                self._failed(e, [], len(fields))
+                continue
+            written += 1
+            self.flushed_increments += len(fields)
+        return written
+
+    def flush(self) -> int:
+        """Write all pending deltas. Returns the number of documents updated."""
+
+        with self._flush_lock:
+            drained = self._drain()
+            if not drained:
+                return 0
+
+            fs = self._get_client()
+            items = list(drained.items())
+            written = 0
+            for start in range(0, len(items), _MAX_BATCH_WRITES):
+                chunk = items[start : start + _MAX_BATCH_WRITES]
+                batch = fs.batch()
+                for doc_path, fields in chunk:
+                    batch.update(fs.document(doc_path), _increments(fields))
+                try:
+                    batch.commit()
+                except NotFound:
+                    # A batch is all-or-nothing: one deleted document rejects it.
+                    written += self._update_each(fs, chunk)
+                    continue
+                except ClientError as e:
+                    self._failed(e, items[start:], 0)
+                    raise
+                except Exception as e:
+                    self._failed(e, items[start + len(chunk) :], sum(len(fields) for _, fields in chunk))
+                    raise
+                written += len(chunk)
+                self.flushed_increments += sum(len(fields) for _, fields in chunk)
+
+            self.flushes += 1
+            self.last_flush_at = time.time()
+            return written
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[{self.name}] counter flush failed: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval_seconds + 5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[{self.name}] final counter flush failed: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            pending_docs = len(self._pending)
+            pending_increments = sum(1 for fields in self._pending.values() for d in fields.values() if d)
+        return {
+            "flushIntervalSeconds": self.flush_interval_seconds,
+            "pendingDocs": pending_docs,
+            "pendingIncrements": pending_increments,
+            "flushes": self.flushes,
+            "flushedIncrements": self.flushed_increments,
+            "flushErrors": self.flush_errors,
+            "droppedIncrements": self.dropped_increments,
+            "missingDocs": self.missing_docs,
+            "lastFlushAt": self.last_flush_at,
+            "lastError": self.last_error,
+        }
+
+
+def counter_flush_interval() -> float:
+    try:
+        return float(os.getenv("COUNTER_FLUSH_INTERVAL_SECONDS") or "2")
+    except ValueError:
+        return 2.0
@@ -0,0 +1,126 @@
+"""Emergency phrase detection for voice transcripts.
+
+Phrases come from a UTF-8 text file (EMERGENCY_PHRASES_PATH, default
+emergency_phrases.txt next to this module): one phrase per line, `#` starts a
+comment. Phrases and transcripts are normalized the same way (NFKC,
+case-folded, punctuation to spaces, whitespace collapsed), then matched with
+an Aho-Corasick automaton so a scan costs O(len(text)) no matter how many
+phrases are configured.
+
+A phrase must start at a word boundary but may run into a longer word, so
+"behosh" also matches "behoshi" and "bleeding" matches "bleedings".
+"""
+
+import os
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Iterable
+
+_DEFAULT_PHRASES_PATH = Path(__file__).resolve().parent / "emergency_phrases.txt"
+
+
+def normalize_text(text: str) -> str:
+    normalized = unicodedata.normalize("NFKC", text).casefold()
+    # Letters, digits and combining marks (Devanagari vowel signs) are word characters.
+    kept = "".join(ch if unicodedata.category(ch)[0] in "LNM" else " " for ch in normalized)
+    return " ".join(kept.split())
+
+
+class EmergencyMatcher:
+    def __init__(self, phrases: Iterable[str]):
+        # Node 0 is the root. Each node has its outgoing edges, a failure link
+        # and the length of the longest phrase ending there (0 if none).
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[int] = [0]
+        self._phrases: list[str] = []
+        for phrase in phrases:
+            self._add(normalize_text(phrase))
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+    def _add(self, phrase: str) -> None:
+        if not phrase:
+            return
+        node = 0
+        for ch in phrase:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(0)
+                self._goto[node][ch] = nxt
+            node = nxt
+        if not self._out[node]:
+            self._phrases.append(phrase)
+        self._out[node] = len(phrase)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # Keep the longest output reachable through the failure chain.
+                if not self._out[child]:
+                    self._out[child] = self._out[self._fail[child]]
+
+    def find(self, text: str) -> str | None:
+        """First emergency phrase found in `text` (normalized form), else None."""
+
+        normalized = normalize_text(text)
+        node = 0
+        for i, ch in enumerate(normalized):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            length = self._out[node]
+            if not length:
+                continue
+            start = i + 1 - length
+            if start == 0 or normalized[start - 1] == " ":
+                return normalized[start : i + 1]
+            # The longest output failed the boundary check; try shorter ones.
+            suffix = self._fail[node]
+            while suffix:
+                length = self._out[suffix]
+                if not length:
+                    break
+                start = i + 1 - length
+                if start == 0 or normalized[start - 1] == " ":
+                    return normalized[start : i + 1]
+                suffix = self._fail[suffix]
+        return None
+
+    def matches(self, text: str) -> bool:
+        return self.find(text) is not None
+
+
+def load_phrases(path: str | Path) -> list[str]:
+    phrases: list[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            phrase = line.split("#", 1)[0].strip()
+            if phrase:
+                phrases.append(phrase)
+    return phrases
+
+
+_emergency_matcher: EmergencyMatcher | None = None
+
+
+def get_emergency_matcher() -> EmergencyMatcher:
+    global _emergency_matcher
+    if _emergency_matcher is None:
+        path = (os.getenv("EMERGENCY_PHRASES_PATH") or "").strip() or _DEFAULT_PHRASES_PATH
+        _emergency_matcher = EmergencyMatcher(load_phrases(path))
+    return _emergency_matcher
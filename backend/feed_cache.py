@@ -0,0 +1,216 @@
+"""In-memory ring buffers of the newest serialized posts per community feed.
+
+Each feed (keyed by community slug, or "" for the unfiltered feed) keeps the
+newest FEED_CACHE_SIZE posts as plain dicts, newest first. A feed is warmed by
+the first read, `create_post` pushes new posts into it, and it is reloaded from
+Firestore once older than FEED_CACHE_TTL_SECONDS (which also bounds how long
+other workers' writes take to show up). At most FEED_CACHE_MAX_FEEDS feeds are
+kept; the least recently read one is dropped first.
+"""
+
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any
+
+ALL_POSTS_FEED = ""
+
+
+@dataclass
+class FeedEntry:
+    created_at: datetime.datetime
+    post_id: str
+    post: dict[str, Any]
+
+    @property
+    def sort_key(self) -> tuple[datetime.datetime, str]:
+        return self.created_at, self.post_id
+
+
+@dataclass
+class _Feed:
+    entries: "deque[FeedEntry]"
+    # True when the buffer holds every post in the feed (fewer than capacity exist).
+    complete: bool
+    loaded_at: float
+    version: int = 0
+    pushes: int = 0
+    last_push_at: float | None = None
+
+
+class FeedCache:
+    def __init__(self, capacity: int, ttl_seconds: float, max_feeds: int = 64):
+        self.capacity = max(int(capacity), 0)
+        self.ttl_seconds = ttl_seconds
+        self.max_feeds = max(int(max_feeds), 1)
+        self._feeds: "OrderedDict[str, _Feed]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _next_version(self) -> int:
+        self._version += 1
+        return self._version
+
+    def _fresh_feed(self, key: str) -> _Feed | None:
+        feed = self._feeds.get(key)
+        if feed is None:
+            return None
+        if time.time() - feed.loaded_at > self.ttl_seconds:
+            del self._feeds[key]
+            self.expirations += 1
+            return None
+        self._feeds.move_to_end(key)
+        return feed
+
+    def is_fresh(self, key: str) -> bool:
+        with self._lock:
+            return self._fresh_feed(key) is not None
+
+    def page(
+        self,
+        key: str,
+        limit: int,
+        after: tuple[datetime.datetime, str] | None = None,
+        record: bool = True,
+    ) -> tuple[list[FeedEntry], bool, int] | None:
+        """Return (entries, has_more, version) or None if the cache can't answer.
+
+        The cache can answer when the feed is fresh and the requested window
+        (plus one entry to detect a next page) lies inside the buffer, or the
+        buffer holds the whole feed.
+        """
+
+        with self._lock:
+            feed = self._fresh_feed(key)
+            if feed is None:
+                self.misses += record
+                return None
+            entries = list(feed.entries)
+            start = 0
+            if after is not None:
+                start = len(entries)
+                for i, e in enumerate(entries):
+                    if e.sort_key < after:
+                        start = i
+                        break
+            window = entries[start : start + limit + 1]
+            if len(window) <= limit and not feed.complete:
+                self.misses += record
+                return None
+            self.hits += record
+            return window[:limit], len(window) > limit, feed.version
+
+    def warm(self, key: str, entries: list[FeedEntry], complete: bool) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._feeds[key] = _Feed(
+                entries=deque(entries[: self.capacity], maxlen=self.capacity),
+                complete=complete and len(entries) <= self.capacity,
+                loaded_at=time.time(),
+                version=self._next_version(),
+            )
+            self._feeds.move_to_end(key)
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+                self.evictions += 1
+            self.refreshes += 1
+
+    def push(self, keys: list[str], entry: FeedEntry) -> None:
+        with self._lock:
+            for key in keys:
+                feed = self._feeds.get(key)
+                if feed is None:
+                    continue
+                if any(e.post_id == entry.post_id for e in feed.entries):
+                    # A warm-up query that raced with create_post already loaded it.
+                    continue
+                if feed.complete and len(feed.entries) == feed.entries.maxlen:
+                    # The oldest post is about to fall out of the buffer.
+                    feed.complete = False
+                feed.entries.appendleft(entry)
+                feed.version = self._next_version()
+                feed.pushes += 1
+                feed.last_push_at = time.time()
+
+    def update_post(self, post_id: str, updater: Any) -> None:
+        """Apply `updater(post_dict)` to every cached copy of a post."""
+
+        with self._lock:
+            for feed in self._feeds.values():
+                for e in feed.entries:
+                    if e.post_id == post_id:
+                        updater(e.post)
+                        feed.version = self._next_version()
+
+    def invalidate(self, key: str | None = None) -> None:
+        with self._lock:
+            if key is None:
+                self._feeds.clear()
+            else:
+                self._feeds.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            lookups = self.hits + self.misses
+            feeds = {
+                (key or "*"): {
+                    "size": len(feed.entries),
+                    "complete": feed.complete,
+                    "ageSeconds": round(now - feed.loaded_at, 3),
+                    "pushes": feed.pushes,
+                    "secondsSinceLastPush": (round(now - feed.last_push_at, 3) if feed.last_push_at else None),
+                    "version": feed.version,
+                }
+                for key, feed in self._feeds.items()
+            }
+            ages = [f["ageSeconds"] for f in feeds.values()]
+            return {
+                "capacity": self.capacity,
+                "ttlSeconds": self.ttl_seconds,
+                "maxFeeds": self.max_feeds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": (self.hits / lookups) if lookups else 0.0,
+                "refreshes": self.refreshes,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "maxStalenessSeconds": max(ages) if ages else 0.0,
+                "feeds": feeds,
+            }
+
+
+_feed_cache: FeedCache | None = None
+
+
+def get_feed_cache() -> FeedCache:
+    global _feed_cache
+    if _feed_cache is None:
+        enabled = (os.getenv("FEED_CACHE") or "1").strip().lower() not in {"0", "false", "no", "off"}
+        try:
+            capacity = int(os.getenv("FEED_CACHE_SIZE") or "100")
+        except ValueError:
+            capacity = 100
+        try:
+            ttl = float(os.getenv("FEED_CACHE_TTL_SECONDS") or "15")
+        except ValueError:
+            ttl = 15.0
+        try:
+            max_feeds = int(os.getenv("FEED_CACHE_MAX_FEEDS") or "64")
+        except ValueError:
+            max_feeds = 64
+        _feed_cache = FeedCache(capacity=capacity if enabled else 0, ttl_seconds=ttl, max_feeds=max_feeds)
+    return _feed_cache
@@ -1,20 +1,27 @@
 import os
 import json
 import base64
+import hashlib
 import re
 import textwrap
+import time
 from pathlib import Path
 from typing import Any
 
 import firebase_admin
 from firebase_admin import auth as firebase_auth
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 from dotenv import load_dotenv
+from google.cloud.firestore_v1 import AsyncClient as AsyncFirestoreClient
 from google.cloud.firestore_v1 import Client as FirestoreClient
 from typing import cast
 
+from ttl_cache import TTLCache
+
 
 _firestore_client: FirestoreClient | None = None
+_async_firestore_client: AsyncFirestoreClient | None = None
+_token_cache: TTLCache[dict[str, Any]] | None = None
 
 
 def _try_load_service_account_from_env() -> dict[str, Any] | None:
@@ -268,7 +275,60 @@ def get_firestore() -> FirestoreClient:
     return cast(FirestoreClient, _firestore_client)
 
 
+def get_async_firestore() -> AsyncFirestoreClient:
+    """Lazily create the `AsyncClient` used by `async def` routes.
+
+    Awaiting this client releases the event loop while Firestore RPCs are in
+    flight instead of pinning a threadpool worker per request.
+    """
+
+    global _async_firestore_client
+    if _async_firestore_client is None:
+        init_firebase_admin()
+        _async_firestore_client = firestore_async.client()  # type: ignore[assignment]
+    assert _async_firestore_client is not None
+    return cast(AsyncFirestoreClient, _async_firestore_client)
+
+
+def _token_cache_enabled() -> bool:
+    return (os.getenv("FIREBASE_TOKEN_CACHE") or "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def get_token_cache() -> TTLCache[dict[str, Any]]:
+    """Verified-claims cache keyed by SHA-256 of the raw ID token.
+
+    Size is controlled by FIREBASE_TOKEN_CACHE_SIZE (default 4096).
+    """
+
+    global _token_cache
+    if _token_cache is None:
+        try:
+            size = int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE") or "4096")
+        except ValueError:
+            size = 4096
+        _token_cache = TTLCache(max_size=size)
+    return _token_cache
+
+
 def verify_bearer_token(token: str) -> dict[str, Any]:
     init_firebase_admin()
+
+    # Verifying an ID token means parsing the JWT, checking its RSA signature and
+    # occasionally refetching Google's public certs. The result only depends on
+    # the token itself (we don't check revocation), so it's safe to reuse the
+    # verified claims until the token's own `exp`.
+    use_cache = _token_cache_enabled()
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest() if use_cache else ""
+    if use_cache:
+        cached = get_token_cache().get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
     # Allow small clock skew in local/dev environments to avoid spurious failures.
-    return firebase_auth.verify_id_token(token, clock_skew_seconds=60)
+    claims = firebase_auth.verify_id_token(token, clock_skew_seconds=60)
+
+    if use_cache:
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)) and exp > time.time():
+            get_token_cache().set(cache_key, dict(claims), expires_at=float(exp))
+    return claims
@@ -0,0 +1,567 @@
+"""In-memory leaderboards for points and streaks, global and per community.
+
+Each board is an indexable skiplist ordered by (-score, uid), so top-N pages,
+"my rank" and score updates are O(log n) and never touch Firestore. Ties share
+a rank (1, 2, 2, 4, ...).
+
+Entries change only when the server changes a score (activity ingestion) or
+a membership, and each change marks the user dirty. A background thread
+writes dirty users every LEADERBOARD_SNAPSHOT_SECONDS to one doc per user
+(`leaderboard/entries/users/{uid}`), and `load()` rebuilds every board from
+that collection on startup. Snapshots from before this layout (a fixed set of
+`leaderboard/shard-{n}` docs holding every user) are read once when the
+collection is still empty and rewritten per user; the shard docs can be
+deleted after that.
+
+Every worker keeps its own copy, so copies are reconciled with `merge_entries`
+instead of overwritten: points only grow and the streak fields are written with
+them, so the copy with more points has the current score; profile fields and
+each membership carry the time they changed. Writes merge inside a
+transaction, and the same thread reads back only the user docs whose
+server-set `updatedAt` moved, so a worker sees points scored on the others
+within one interval.
+
+The thread also drops streaks whose last activity day has passed, so the
+streak board does not keep users who stopped. That is derived from
+`lastActivityDate` on every worker and never written.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from google.cloud.firestore_v1.transaction import transactional
+
+_MAX_LEVEL = 32
+# Users merged per snapshot transaction (Firestore allows 500 writes per commit).
+_MAX_TRANSACTION_USERS = 100
+_ENTRIES_DOC = "entries"
+_ENTRIES_COLLECTION = "users"
+
+LEADERBOARD_METRICS = ("points", "streak")
+# Written together by activity ingestion; `points` orders the copies.
+_SCORE_FIELDS = ("points", "streak", "lastActivityDate", "timezone")
+_PROFILE_FIELDS = ("name", "avatarUrl")
+# Board id of the global board; community boards use the community slug.
+GLOBAL_BOARD = ""
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.next: list[_Node | None] = [None] * level
+        # width[i]: how many level-0 steps next[i] skips.
+        self.width = [0] * level
+
+
+class IndexableSkipList:
+    """Sorted set of keys with O(log n) insert, remove, rank and slice."""
+
+    def __init__(self, seed: int | None = None):
+        self._head = _Node(None, _MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < _MAX_LEVEL and self._random.random() < 0.25:
+            level += 1
+        return level
+
+    def insert(self, key: Any) -> None:
+        update: list[_Node] = [self._head] * _MAX_LEVEL
+        rank = [0] * _MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._level)):
+            rank[i] = rank[i + 1] if i + 1 < self._level else 0
+            while node.next[i] is not None and node.next[i].key < key:  # type: ignore[union-attr]
+                rank[i] += node.width[i]
+                node = node.next[i]  # type: ignore[assignment]
+            update[i] = node
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                self._head.width[i] = self._size
+            self._level = level
+
+        new = _Node(key, level)
+        for i in range(level):
+            new.next[i] = update[i].next[i]
+            update[i].next[i] = new
+            new.width[i] = update[i].width[i] - (rank[0] - rank[i])
+            update[i].width[i] = rank[0] - rank[i] + 1
+        for i in range(level, self._level):
+            update[i].width[i] += 1
+        self._size += 1
+
+    def remove(self, key: Any) -> bool:
+        update: list[_Node] = [self._head] * _MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key < key:  # type: ignore[union-attr]
+                node = node.next[i]  # type: ignore[assignment]
+            update[i] = node
+        target = node.next[0]
+        if target is None or target.key != key:
+            return False
+        for i in range(self._level):
+            if update[i].next[i] is target:
+                update[i].width[i] += target.width[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].width[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+        return True
+
+    def count_less(self, key: Any) -> int:
+        """Number of stored keys strictly less than `key`."""
+
+        count = 0
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key < key:  # type: ignore[union-attr]
+                count += node.width[i]
+                node = node.next[i]  # type: ignore[assignment]
+        return count
+
+    def slice(self, start: int, count: int) -> Iterator[Any]:
+        """Yield up to `count` keys starting at 0-based position `start`."""
+
+        if start < 0 or start >= self._size or count <= 0:
+            return
+        traversed = 0
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and traversed + node.width[i] <= start + 1:
+                traversed += node.width[i]
+                node = node.next[i]  # type: ignore[assignment]
+        current: _Node | None = node
+        while current is not None and count > 0:
+            yield current.key
+            current = current.next[0]
+            count -= 1
+
+
+def new_entry() -> dict[str, Any]:
+    return {
+        "points": 0,
+        "streak": 0,
+        "name": "",
+        "avatarUrl": None,
+        "profileAt": 0.0,
+        "lastActivityDate": None,
+        "timezone": None,
+        # slug -> {"member": bool, "at": unix time of the join or leave}
+        "memberships": {},
+        "communities": [],
+    }
+
+
+def stored_entry(stored: dict[str, Any] | None) -> dict[str, Any]:
+    """Normalize a stored entry (older snapshots stored a `communities` list)."""
+
+    stored = stored or {}
+    entry = new_entry()
+    entry.update({k: v for k, v in stored.items() if k in entry and k not in ("memberships", "communities")})
+    entry["points"] = int(entry["points"] or 0)
+    entry["streak"] = int(entry["streak"] or 0)
+    entry["profileAt"] = float(entry["profileAt"] or 0)
+    memberships = {slug: {"member": True, "at": 0.0} for slug in stored.get("communities") or []}
+    for slug, membership in (stored.get("memberships") or {}).items():
+        if isinstance(membership, dict):
+            memberships[slug] = {"member": bool(membership.get("member")), "at": float(membership.get("at") or 0)}
+    entry["memberships"] = memberships
+    entry["communities"] = [slug for slug, m in memberships.items() if m["member"]]
+    return entry
+
+
+def _score_version(entry: dict[str, Any]) -> tuple[int, str, int]:
+    return (int(entry["points"] or 0), str(entry["lastActivityDate"] or ""), int(entry["streak"] or 0))
+
+
+def merge_entries(current: dict[str, Any], other: dict[str, Any]) -> dict[str, Any]:
+    """Combine two copies of one user's entry, keeping the newer data of each part."""
+
+    out = {**current, "memberships": dict(current["memberships"])}
+    if _score_version(other) > _score_version(current):
+        out.update({k: other[k] for k in _SCORE_FIELDS})
+    if other["profileAt"] > current["profileAt"]:
+        out.update({k: other[k] for k in (*_PROFILE_FIELDS, "profileAt")})
+    for slug, membership in other["memberships"].items():
+        mine = out["memberships"].get(slug)
+        if mine is None or membership["at"] > mine["at"]:
+            out["memberships"][slug] = dict(membership)
+    out["communities"] = [slug for slug, m in out["memberships"].items() if m["member"]]
+    return out
+
+
+def _persisted(entry: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in entry.items() if k != "communities"}
+
+
+@transactional
+def _merge_users(transaction: Any, col: Any, entries: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """Merge `entries` into their user docs and return what was written."""
+
+    refs = {uid: col.document(uid) for uid in entries}
+    stored = {snap.id: snap.to_dict() for snap in transaction.get_all(list(refs.values())) if snap.exists}
+    merged: dict[str, Any] = {}
+    for uid, entry in entries.items():
+        merged[uid] = _persisted(merge_entries(stored_entry(stored.get(uid)), entry))
+        transaction.set(refs[uid], {**merged[uid], "updatedAt": SERVER_TIMESTAMP})
+    return merged
+
+
+class Leaderboard:
+    def __init__(
+        self,
+        get_client: Callable[[], Any],
+        collection: str,
+        snapshot_interval_seconds: float,
+        streak_is_current: Callable[[dict[str, Any]], bool] | None = None,
+    ):
+        self._get_client = get_client
+        self.collection = collection
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self._streak_is_current = streak_is_current
+        # uid -> new_entry() layout; `communities` lists the memberships that are joined.
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._boards: dict[str, dict[str, IndexableSkipList]] = {}
+        self._dirty: set[str] = set()
+        # Highest `updatedAt` read so far; refresh() asks only for docs at or after it.
+        self._read_through: Any = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.loaded_from: str | None = None
+        self.snapshots = 0
+        self.snapshot_errors = 0
+        self.refreshes = 0
+        self.last_snapshot_at: float | None = None
+        self.last_error: str | None = None
+
+    # -- board maintenance (callers hold self._lock) --------------------------
+
+    def _board(self, board_id: str) -> dict[str, IndexableSkipList]:
+        board = self._boards.get(board_id)
+        if board is None:
+            board = {metric: IndexableSkipList() for metric in LEADERBOARD_METRICS}
+            self._boards[board_id] = board
+        return board
+
+    def _board_ids(self, entry: dict[str, Any]) -> list[str]:
+        return [GLOBAL_BOARD, *entry["communities"]]
+
+    def _index(self, uid: str, entry: dict[str, Any], board_ids: list[str]) -> None:
+        for board_id in board_ids:
+            board = self._board(board_id)
+            for metric in LEADERBOARD_METRICS:
+                board[metric].insert((-entry[metric], uid))
+
+    def _unindex(self, uid: str, entry: dict[str, Any], board_ids: list[str]) -> None:
+        for board_id in board_ids:
+            board = self._boards.get(board_id)
+            if board is None:
+                continue
+            for metric in LEADERBOARD_METRICS:
+                board[metric].remove((-entry[metric], uid))
+
+    def _replace(self, uid: str, entry: dict[str, Any]) -> None:
+        current = self._entries.get(uid)
+        if current is not None:
+            self._unindex(uid, current, self._board_ids(current))
+        self._entries[uid] = entry
+        self._index(uid, entry, self._board_ids(entry))
+
+    # -- updates --------------------------------------------------------------
+
+    def update_user(self, uid: str, **fields: Any) -> None:
+        """Set any of points, streak, name, avatarUrl, lastActivityDate, timezone for `uid`."""
+
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                entry = new_entry()
+                self._entries[uid] = entry
+            else:
+                self._unindex(uid, entry, self._board_ids(entry))
+            for key, value in fields.items():
+                if key in ("points", "streak"):
+                    entry[key] = int(value or 0)
+                elif key in _PROFILE_FIELDS:
+                    if entry[key] != value:
+                        entry[key] = value
+                        entry["profileAt"] = time.time()
+                elif key in ("lastActivityDate", "timezone"):
+                    entry[key] = value
+            self._index(uid, entry, self._board_ids(entry))
+            self._dirty.add(uid)
+
+    def join(self, community: str, uid: str) -> None:
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                entry = new_entry()
+                self._entries[uid] = entry
+                self._index(uid, entry, [GLOBAL_BOARD])
+            if community in entry["communities"]:
+                return
+            entry["memberships"][community] = {"member": True, "at": time.time()}
+            entry["communities"].append(community)
+            self._index(uid, entry, [community])
+            self._dirty.add(uid)
+
+    def leave(self, community: str, uid: str) -> None:
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None or community not in entry["communities"]:
+                return
+            self._unindex(uid, entry, [community])
+            entry["memberships"][community] = {"member": False, "at": time.time()}
+            entry["communities"].remove(community)
+            self._dirty.add(uid)
+
+    def __contains__(self, uid: str) -> bool:
+        with self._lock:
+            return uid in self._entries
+
+    # -- reads ----------------------------------------------------------------
+
+    def _public(self, uid: str, entry: dict[str, Any], metric: str, rank: int) -> dict[str, Any]:
+        return {
+            "rank": rank,
+            "uid": uid,
+            "name": entry["name"],
+            "avatarUrl": entry["avatarUrl"],
+            "points": entry["points"],
+            "streak": entry["streak"],
+            "score": entry[metric],
+        }
+
+    def top(self, metric: str, limit: int, offset: int = 0, community: str = GLOBAL_BOARD) -> list[dict[str, Any]]:
+        with self._lock:
+            board = self._boards.get(community)
+            if board is None:
+                return []
+            ranks = board[metric]
+            out: list[dict[str, Any]] = []
+            previous_score: int | None = None
+            rank = 0
+            for position, (negative_score, uid) in enumerate(ranks.slice(offset, limit), start=offset):
+                if negative_score != previous_score:
+                    rank = ranks.count_less((negative_score,)) + 1 if position == offset else position + 1
+                    previous_score = negative_score
+                out.append(self._public(uid, self._entries[uid], metric, rank))
+            return out
+
+    def rank(self, uid: str, metric: str, community: str = GLOBAL_BOARD) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(uid)
+            board = self._boards.get(community)
+            if entry is None or board is None or (community != GLOBAL_BOARD and community not in entry["communities"]):
+                return None
+            rank = board[metric].count_less((-entry[metric],)) + 1
+            return self._public(uid, entry, metric, rank)
+
+    def size(self, community: str = GLOBAL_BOARD) -> int:
+        with self._lock:
+            board = self._boards.get(community)
+            return len(board["points"]) if board is not None else 0
+
+    # -- persistence ----------------------------------------------------------
+
+    def _users(self, fs: Any) -> Any:
+        return fs.collection(self.collection).document(_ENTRIES_DOC).collection(_ENTRIES_COLLECTION)
+
+    def _read_legacy_shards(self, fs: Any) -> dict[str, dict[str, Any]]:
+        restored: dict[str, dict[str, Any]] = {}
+        for snap in fs.collection(self.collection).stream():
+            if snap.id.startswith("shard-"):
+                for uid, stored in ((snap.to_dict() or {}).get("entries") or {}).items():
+                    restored[uid] = stored_entry(stored)
+        return restored
+
+    def _note_read(self, doc: dict[str, Any]) -> None:
+        updated_at = doc.get("updatedAt")
+        if updated_at is not None and (self._read_through is None or updated_at > self._read_through):
+            self._read_through = updated_at
+
+    def load(self, rebuild: Callable[["Leaderboard"], None] | None = None) -> bool:
+        """Rebuild every board from the stored user entries.
+
+        Without a snapshot (first deploy), `rebuild` fills the boards from the
+        source collections once. Returns False when there was no snapshot.
+        """
+
+        fs = self._get_client()
+        restored: dict[str, dict[str, Any]] = {}
+        self._read_through = None
+        for snap in self._users(fs).stream():
+            doc = snap.to_dict() or {}
+            self._note_read(doc)
+            restored[snap.id] = stored_entry(doc)
+        migrated = not restored
+        if migrated:
+            restored = self._read_legacy_shards(fs)
+        found = bool(restored)
+        with self._lock:
+            self._entries = restored
+            self._boards = {}
+            for uid, entry in restored.items():
+                self._index(uid, entry, self._board_ids(entry))
+            if migrated:
+                # Written to per-user docs by the next snapshot.
+                self._dirty.update(restored)
+        self.loaded_from = ("shards" if migrated else "snapshot") if found else None
+        if not found and rebuild is not None:
+            rebuild(self)
+            self.loaded_from = "rebuild"
+        self.expire_streaks()
+        return found
+
+    def _fold(self, stored: dict[str, Any]) -> None:
+        """Merge stored entries into memory (they are already stored, so not dirty)."""
+
+        with self._lock:
+            for uid, raw in stored.items():
+                other = stored_entry(raw)
+                current = self._entries.get(uid)
+                merged = other if current is None else merge_entries(current, other)
+                if merged != current:
+                    self._replace(uid, merged)
+
+    def refresh(self) -> int:
+        """Fold user docs written since the last read (by any worker) into memory. Returns docs read."""
+
+        fs = self._get_client()
+        query = self._users(fs)
+        if self._read_through is not None:
+            # >= rather than >: a doc sharing the newest timestamp may not have been read yet.
+            query = query.where("updatedAt", ">=", self._read_through)
+        changed: dict[str, Any] = {}
+        for snap in query.stream():
+            doc = snap.to_dict() or {}
+            self._note_read(doc)
+            changed[snap.id] = doc
+        self._fold(changed)
+        self.refreshes += 1
+        return len(changed)
+
+    def expire_streaks(self) -> int:
+        """Zero the streak of users whose last active day has passed. Returns how many changed.
+
+        Only the in-memory boards change: a stored copy must not carry a zero
+        that could win over a newer streak from another worker.
+        """
+
+        if self._streak_is_current is None:
+            return 0
+        with self._lock:
+            expired = [uid for uid, e in self._entries.items() if e["streak"] and not self._streak_is_current(e)]
+            for uid in expired:
+                self._replace(uid, {**self._entries[uid], "streak": 0})
+        return len(expired)
+
+    def snapshot(self) -> int:
+        """Merge dirty users into their docs. Returns the number of users written."""
+
+        with self._flush_lock:
+            with self._lock:
+                dirty = {uid: dict(self._entries[uid]) for uid in self._dirty if uid in self._entries}
+                self._dirty.clear()
+            if not dirty:
+                return 0
+            for entry in dirty.values():
+                entry["memberships"] = {slug: dict(m) for slug, m in entry["memberships"].items()}
+
+            fs = self._get_client()
+            users = self._users(fs)
+            uids = list(dirty)
+            failed: dict[str, dict[str, Any]] = {}
+            error: Exception | None = None
+            for start in range(0, len(uids), _MAX_TRANSACTION_USERS):
+                entries = {uid: dirty[uid] for uid in uids[start : start + _MAX_TRANSACTION_USERS]}
+                try:
+                    stored = _merge_users(fs.transaction(), users, entries)
+                except Exception as e:
+                    failed.update(entries)
+                    error = e
+                    continue
+                self._fold(stored)
+            if error is not None:
+                # Failed users are merged again with the next snapshot.
+                with self._lock:
+                    self._dirty.update(failed)
+                self.snapshot_errors += 1
+                self.last_error = str(error)
+                raise error
+            self.snapshots += 1
+            self.last_snapshot_at = time.time()
+            return len(dirty)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.snapshot_interval_seconds):
+            try:
+                self.snapshot()
+                self.refresh()
+                self.expire_streaks()
+            except Exception as e:
+                print(f"[leaderboard] snapshot failed: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leaderboard-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.snapshot_interval_seconds + 5)
+            self._thread = None
+        try:
+            self.snapshot()
+        except Exception as e:
+            print(f"[leaderboard] final snapshot failed: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            users = len(self._entries)
+            boards = len(self._boards)
+            dirty = len(self._dirty)
+        return {
+            "users": users,
+            "boards": boards,
+            "dirty": dirty,
+            "loadedFrom": self.loaded_from,
+            "snapshotIntervalSeconds": self.snapshot_interval_seconds,
+            "snapshots": self.snapshots,
+            "snapshotErrors": self.snapshot_errors,
+            "refreshes": self.refreshes,
+            "lastSnapshotAt": self.last_snapshot_at,
+            "lastError": self.last_error,
+        }
+
+
+def leaderboard_settings() -> dict[str, Any]:
+    try:
+        interval = float(os.getenv("LEADERBOARD_SNAPSHOT_SECONDS") or "60")
+    except ValueError:
+        interval = 60.0
+    return {"snapshot_interval_seconds": interval}
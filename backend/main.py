@@ -1,37 +1,102 @@
+import asyncio
 import os
 import time
 import json
+import base64
+import hashlib
 import datetime
-import io
-import wave
+import threading
 import uuid
-from typing import Any, List
+from typing import Any, Callable, List
 
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, UploadFile
+from fastapi import (
+    Depends,
+    FastAPI,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query as QueryParam,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from openai import OpenAI  # type: ignore[import-untyped]
-import requests
-from google.api_core.exceptions import FailedPrecondition, PermissionDenied
-
-from firebase_app import get_firestore, verify_bearer_token
-from google.cloud.firestore_v1 import Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI  # type: ignore[import-untyped]
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition, NotFound, PermissionDenied
+
+from firebase_app import get_async_firestore, get_firestore, get_token_cache, verify_bearer_token
+from activity_engine import default_timezone, effective_counters, local_today, plan_activity
+from assemblyai_client import WEBHOOK_SECRET_HEADER, get_assemblyai_client
+from conversation_log import ConversationLog, conversation_log_settings
+from counter_buffer import CounterBuffer, counter_flush_interval
+from emergency_matcher import get_emergency_matcher
+from feed_cache import ALL_POSTS_FEED, FeedEntry, get_feed_cache
+from leaderboard import GLOBAL_BOARD, Leaderboard, leaderboard_settings
+from profile_cache import get_profile_cache
+from reply_cache import get_reply_cache
+from response_cache import encode_json, get_response_cache, json_response
+from transcript_cache import get_transcript_cache, transcript_cache_key
+from transcription_pool import TranscriptionSaturated, get_transcription_pool
+from ttl_cache import TTLCache
+from user_data_days import apply_day_to_summary, day_range, empty_summary, parse_day
+from user_data_sync import (
+    UserDataConflict,
+    empty_user_data_doc,
+    full_user_data_lists,
+    read_user_data_state,
+    stage_user_data_ops,
+    user_data_changes_since,
+    user_data_delta_available,
+    user_data_replace_ops,
+)
+from voice_vosk import (
+    VoskStream,
+    get_recognizer_pool,
+    preload_status,
+    preload_vosk_models,
+    resolve_vosk_model_paths,
+    split_wav_header,
+    transcribe_wav,
+    transcription_scope as vosk_transcription_scope,
+)
+from google.cloud.firestore_v1 import Increment, Query
+from google.cloud.firestore_v1.async_transaction import async_transactional
 from schemas import (
+    ActivityIn,
+    ActivityOut,
     AuthLoginIn,
     AuthResponse,
     AuthResolveLoginIn,
     AuthResolveLoginOut,
     AuthSignupIn,
     CommunityCreateIn,
+    CommunityMembershipOut,
     CommunityOut,
     CommunityPostCreateIn,
     CommunityPostOut,
+    CommunityPostPageOut,
+    DailyHistoryNotesIn,
+    DailyHistoryOut,
+    DailyHistoryRangeOut,
+    LeaderboardMeOut,
+    LeaderboardOut,
     PostCommentCreateIn,
     PostCommentOut,
+    PostCommentPageOut,
+    PostReactionIn,
+    PostReactionOut,
+    PostViewerReactionsOut,
     PostUserOut,
     UserDataOut,
+    UserDataPatchIn,
+    UserDataPatchOut,
     UserDataPutIn,
+    UserDataSummaryOut,
     UserOut,
     UserPatchIn,
     UserBootstrapIn,
@@ -107,6 +172,16 @@ FIRESTORE_COLLECTION_USER_DATA = "userData"
 FIRESTORE_COLLECTION_COMMUNITIES = "communities"
 FIRESTORE_COLLECTION_POSTS = "posts"
 FIRESTORE_COLLECTION_CONVERSATIONS = "conversations"
+FIRESTORE_COLLECTION_LEADERBOARD = "leaderboard"
+FIRESTORE_SUBCOLLECTION_COMMENTS = "comments"
+FIRESTORE_SUBCOLLECTION_REACTIONS = "reactions"
+FIRESTORE_SUBCOLLECTION_MEMBERS = "members"
+FIRESTORE_SUBCOLLECTION_DAYS = "days"
+FIRESTORE_SUBCOLLECTION_SUMMARY = "summary"
+USER_DATA_SUMMARY_DOC_ID = "current"
+FIRESTORE_SUBCOLLECTION_ACTIVITY_EVENTS = "activityEvents"
+# Processed clientEventIds are kept this long (Firestore TTL policy on `expireAt`).
+ACTIVITY_EVENT_TTL = datetime.timedelta(days=7)
 
 
 def _parse_origins(value: str | None) -> List[str]:
@@ -192,16 +267,34 @@ def debug_voice_config():
         "assemblyaiConfigured": bool(aai),
     }
 
-_openai_client: OpenAI | None = None
 
+@app.get("/debug/metrics")
+def debug_metrics():
+    return {
+        "tokenCache": get_token_cache().stats(),
+        "profileCache": get_profile_cache().stats(),
+        "feedCache": get_feed_cache().stats(),
+        "responseCache": get_response_cache().stats(),
+        "reactionCounters": _reaction_counters.stats(),
+        "memberCounters": _member_counters.stats(),
+        "voskRecognizerPool": get_recognizer_pool().stats(),
+        "transcriptionPool": get_transcription_pool().stats(),
+        "transcriptCache": get_transcript_cache().stats(),
+        "replyCache": get_reply_cache().stats(),
+        "conversationLog": _conversation_log.stats(),
+        "leaderboard": _leaderboard.stats(),
+    }
+
+_openai_client: AsyncOpenAI | None = None
 
-def get_openai_client() -> OpenAI:
+
+def get_openai_client() -> AsyncOpenAI:
     global _openai_client
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not set")
     if _openai_client is None:
-        _openai_client = OpenAI(api_key=api_key)
+        _openai_client = AsyncOpenAI(api_key=api_key)
     return _openai_client
 
 
@@ -231,17 +324,25 @@ def _default_buddy_persona() -> dict[str, Any]:
     }
 
 
+def _user_local_today(doc: dict[str, Any]) -> str:
+    try:
+        return local_today(doc.get("timezone"))
+    except ValueError:
+        return local_today(None)
+
+
 def _user_doc_to_out(uid: str, doc: dict[str, Any]) -> UserOut:
     buddy = doc.get("buddyPersona")
+    counters = effective_counters(doc, _user_local_today(doc))
     return UserOut(
         uid=uid,
         name=str(doc.get("name") or ""),
         age=int(doc.get("age") or 0),
         gender=doc.get("gender") or "Prefer not to say",  # type: ignore[arg-type]
         avatarUrl=str(doc.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100"),
-        streak=int(doc.get("streak") or 0),
+        streak=counters["streak"],
         points=int(doc.get("points") or 0),
-        dailyPoints=int(doc.get("dailyPoints") or 0),
+        dailyPoints=counters["dailyPoints"],
         lastActivityDate=str(doc.get("lastActivityDate") or _today_iso()),
         totalTasksCompleted=int(doc.get("totalTasksCompleted") or 0),
         bio=doc.get("bio"),
@@ -279,17 +380,10 @@ def get_current_uid(claims: dict[str, Any] = Depends(get_current_claims)) -> str
     return uid
 
 
-def _ensure_user_doc(uid: str, claims: dict[str, Any] | None = None) -> dict[str, Any]:
-    fs = get_firestore()
-    ref = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid)
-    snap = ref.get()
-    if snap.exists:
-        return snap.to_dict() or {}
-
+def _new_user_doc(claims: dict[str, Any] | None) -> dict[str, Any]:
     email = (claims or {}).get("email")
     phone_number = (claims or {}).get("phone_number")
-
-    doc: dict[str, Any] = {
+    return {
         "name": (claims or {}).get("name") or "",
         "age": 0,
         "gender": "Prefer not to say",
@@ -310,253 +404,221 @@ def _ensure_user_doc(uid: str, claims: dict[str, Any] | None = None) -> dict[str
         "doshaIsBalanced": False,
         "createdAt": datetime.datetime.utcnow().isoformat(),
     }
-    ref.set(doc)
 
-    # Ensure user-data container exists.
+
+def _new_user_data_doc() -> dict[str, Any]:
+    return empty_user_data_doc(datetime.datetime.utcnow().isoformat())
+
+
+def _stage_user_provisioning(
+    batch: Any,
+    user_ref: Any,
+    data_ref: Any,
+    user_snap: Any,
+    data_snap: Any,
+    claims: dict[str, Any] | None,
+    build_updates: Callable[[dict[str, Any]], dict[str, Any]] | None,
+) -> tuple[dict[str, Any], int]:
+    """Stage the provisioning writes on `batch` (sync or async) and return (merged doc, write count)."""
+
+    user_exists = bool(user_snap is not None and user_snap.exists)
+    doc = (user_snap.to_dict() or {}) if user_exists else _new_user_doc(claims)
+    updates = build_updates(doc) if build_updates is not None else {}
+
+    writes = 0
+    if not user_exists:
+        doc.update(updates)
+        batch.create(user_ref, doc)
+        writes += 1
+    elif updates:
+        batch.set(user_ref, updates, merge=True)
+        doc.update(updates)
+        writes += 1
+    if not (data_snap is not None and data_snap.exists):
+        batch.create(data_ref, _new_user_data_doc())
+        writes += 1
+    return doc, writes
+
+
+def _provision_user(
+    uid: str,
+    claims: dict[str, Any] | None = None,
+    build_updates: Callable[[dict[str, Any]], dict[str, Any]] | None = None,
+    _retry: bool = True,
+) -> dict[str, Any]:
+    """Create-if-absent the `users` and `userData` docs and apply profile updates.
+
+    Costs one batched read (`get_all` of both docs) plus at most one batched
+    write, and returns the merged user doc without re-reading it.
+    """
+
+    fs = get_firestore()
+    user_ref = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid)
     data_ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
-    if not data_ref.get().exists:
-        data_ref.set({"challenges": [], "dailyVibes": [], "updatedAt": datetime.datetime.utcnow().isoformat()})
+
+    snaps = {snap.reference.path: snap for snap in fs.get_all([user_ref, data_ref])}
+    batch = fs.batch()
+    doc, writes = _stage_user_provisioning(
+        batch, user_ref, data_ref, snaps.get(user_ref.path), snaps.get(data_ref.path), claims, build_updates
+    )
+    if writes:
+        try:
+            batch.commit()
+        except AlreadyExists:
+            # Another request provisioned the same user between our read and write.
+            if not _retry:
+                raise
+            return _provision_user(uid, claims, build_updates, _retry=False)
+    get_profile_cache().put(uid, doc)
     return doc
 
 
-_vosk_models_by_path: dict[str, object] = {}
+async def _provision_user_async(
+    uid: str,
+    claims: dict[str, Any] | None = None,
+    build_updates: Callable[[dict[str, Any]], dict[str, Any]] | None = None,
+    _retry: bool = True,
+) -> dict[str, Any]:
+    fs = get_async_firestore()
+    user_ref = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid)
+    data_ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
 
+    snaps = {snap.reference.path: snap async for snap in fs.get_all([user_ref, data_ref])}
+    batch = fs.batch()
+    doc, writes = _stage_user_provisioning(
+        batch, user_ref, data_ref, snaps.get(user_ref.path), snaps.get(data_ref.path), claims, build_updates
+    )
+    if writes:
+        try:
+            await batch.commit()
+        except AlreadyExists:
+            if not _retry:
+                raise
+            return await _provision_user_async(uid, claims, build_updates, _retry=False)
+    await get_profile_cache().aput(uid, doc)
+    return doc
 
-def _get_vosk_model(model_path: str):
-    if not model_path:
-        raise RuntimeError(
-            "Voice transcription is not configured. Set ASSEMBLYAI_API_KEY (cloud) or VOSK_MODEL_PATH_* (offline)."
-        )
-    if not os.path.isdir(model_path):
-        raise RuntimeError(
-            "Vosk model path is set but the folder does not exist. "
-            "Download a Vosk model, extract it, and point VOSK_MODEL_PATH_* to that folder."
-        )
 
-    cached = _vosk_models_by_path.get(model_path)
+def _ensure_user_doc(uid: str, claims: dict[str, Any] | None = None) -> dict[str, Any]:
+    cache = get_profile_cache()
+    cached = cache.get(uid)
     if cached is not None:
         return cached
 
-    try:
-        from vosk import Model  # type: ignore
-    except Exception as e:
-        raise RuntimeError(f"Offline transcription dependency missing: {e}")
-
-    model = Model(model_path)
-    _vosk_models_by_path[model_path] = model
-    return model
-
-
-def _score_vosk_result(payload: dict) -> float:
-    text = (payload.get("text") or "").strip()
-    if not text:
-        return 0.0
-    words = payload.get("result")
-    if isinstance(words, list) and words:
-        confs: list[float] = []
-        for w in words:
-            if not isinstance(w, dict):
-                continue
-            conf = w.get("conf")
-            if isinstance(conf, (int, float)):
-                confs.append(float(conf))
-        if confs:
-            avg_conf = sum(confs) / max(len(confs), 1)
-            return float(avg_conf) * float(len(text) + 1)
-    return float(len(text))
-
-
-def _auto_detect_vosk_models() -> tuple[str, str, str]:
-    """Auto-detect local Vosk models under backend/.vosk/models.
-
-    Returns (en_path, hi_path, default_path). Any value may be empty.
-    """
+    fs = get_firestore()
+    snap = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid).get()
+    if snap.exists:
+        doc = snap.to_dict() or {}
+        cache.put(uid, doc)
+        return doc
+    return _provision_user(uid, claims)
 
-    models_root = os.path.join(_ENV_DIR, ".vosk", "models")
-    if not os.path.isdir(models_root):
-        return "", "", ""
 
-    try:
-        dirs = [
-            os.path.join(models_root, d)
-            for d in os.listdir(models_root)
-            if os.path.isdir(os.path.join(models_root, d))
-        ]
-    except Exception:
-        return "", "", ""
-
-    def pick(prefixes: list[str]) -> str:
-        for p in prefixes:
-            for d in dirs:
-                name = os.path.basename(d).lower()
-                if name.startswith(p.lower()):
-                    return d
-        return ""
+async def _ensure_user_doc_async(uid: str, claims: dict[str, Any] | None = None) -> dict[str, Any]:
+    cache = get_profile_cache()
+    cached = await cache.aget(uid)
+    if cached is not None:
+        return cached
 
-    en = pick(["vosk-model-small-en-us", "vosk-model-en-us", "vosk-model-small-en-in", "vosk-model-en-in"])
-    hi = pick(["vosk-model-small-hi", "vosk-model-hi"])
-    default = en or hi or (dirs[0] if dirs else "")
-    return en, hi, default
+    fs = get_async_firestore()
+    snap = await fs.collection(FIRESTORE_COLLECTION_USERS).document(uid).get()
+    if snap.exists:
+        doc = snap.to_dict() or {}
+        await cache.aput(uid, doc)
+        return doc
+    return await _provision_user_async(uid, claims)
 
 
 def _transcribe_audio_vosk_wav(audio_bytes: bytes, language_code: str) -> str:
     if not audio_bytes:
         return ""
-    if not audio_bytes.startswith(b"RIFF"):
-        raise RuntimeError(
-            "Offline transcription expects WAV audio. Please update the client to send WAV/PCM."
-        )
-
     _ensure_backend_env_loaded()
+    return transcribe_wav(audio_bytes, language_code=language_code)
 
-    model_path_default = (os.getenv("VOSK_MODEL_PATH") or "").strip()
-    model_path_en = (os.getenv("VOSK_MODEL_PATH_EN") or "").strip()
-    model_path_hi = (os.getenv("VOSK_MODEL_PATH_HI") or "").strip()
-
-    # If env vars are not present (common on Windows + reload quirks),
-    # auto-detect models we downloaded under backend/.vosk/models.
-    if not (model_path_default or model_path_en or model_path_hi):
-        auto_en, auto_hi, auto_default = _auto_detect_vosk_models()
-        model_path_en = auto_en
-        model_path_hi = auto_hi
-        model_path_default = auto_default
-
-    # If both language models are available, run both and pick the better result.
-    # This keeps UX simple (no language picker) while supporting English + Hindi.
-    candidate_paths: list[str] = []
-    if model_path_en and model_path_hi:
-        candidate_paths = [model_path_en, model_path_hi]
-    else:
-        # If only one model is configured, pick based on language code when possible.
-        if language_code.lower().startswith("hi") and model_path_hi:
-            candidate_paths = [model_path_hi]
-        elif language_code.lower().startswith("en") and model_path_en:
-            candidate_paths = [model_path_en]
-        elif model_path_default:
-            candidate_paths = [model_path_default]
-        elif model_path_en:
-            candidate_paths = [model_path_en]
-        elif model_path_hi:
-            candidate_paths = [model_path_hi]
-        else:
-            raise RuntimeError(
-                "Offline voice transcription is not configured. Set VOSK_MODEL_PATH_EN and VOSK_MODEL_PATH_HI (recommended), or VOSK_MODEL_PATH."
-            )
-
-    try:
-        from vosk import KaldiRecognizer  # type: ignore
-    except Exception as e:
-        raise RuntimeError(f"Offline transcription dependency missing: {e}")
-
-    best_text = ""
-    best_score = 0.0
-
-    for model_path in candidate_paths:
-        model = _get_vosk_model(model_path)
-        with wave.open(io.BytesIO(audio_bytes), "rb") as wf:
-            if wf.getnchannels() != 1:
-                raise RuntimeError("Offline transcription requires mono WAV audio")
-            if wf.getsampwidth() != 2:
-                raise RuntimeError("Offline transcription requires 16-bit PCM WAV audio")
 
-            sample_rate = wf.getframerate()
-            recognizer = KaldiRecognizer(model, sample_rate)
-
-            while True:
-                data = wf.readframes(4000)
-                if len(data) == 0:
-                    break
-                recognizer.AcceptWaveform(data)
+async def transcribe_audio(audio_file, language_code: str) -> str:
+    _ensure_backend_env_loaded()
+    client = get_assemblyai_client()
+    scope = "assemblyai" if client is not None else vosk_transcription_scope(language_code)
+    cache = get_transcript_cache()
+    if not cache.enabled:
+        return await _transcribe_audio_uncached(client, audio_file, language_code)
+    key = await run_in_threadpool(transcript_cache_key, audio_file, language_code, scope)
 
-            payload = json.loads(recognizer.FinalResult() or "{}")
-            text = (payload.get("text") or "").strip()
-            score = _score_vosk_result(payload)
-            if score > best_score:
-                best_score = score
-                best_text = text
+    async def compute() -> str:
+        # Hashing left the spooled upload rewound; decode straight from it instead of copying it.
+        return await _transcribe_audio_uncached(client, audio_file, language_code)
 
-    return best_text
+    return await cache.get_or_compute(key, compute)
 
 
-def transcribe_audio(audio_file, language_code: str) -> str:
-    _ensure_backend_env_loaded()
-    api_key = (os.getenv("ASSEMBLYAI_API_KEY") or "").strip()
-    if not api_key:
-        # Offline fallback (Vosk). Client should send WAV/PCM.
-        audio_bytes = audio_file.read()
-        return _transcribe_audio_vosk_wav(audio_bytes, language_code=language_code)
+async def _transcribe_audio_uncached(client: Any, audio_file, language_code: str) -> str:
+    if client is None:
+        # Offline fallback (Vosk). Client should send WAV/PCM; the upload is read in the pool thread.
+        return await get_transcription_pool().run(
+            lambda: _transcribe_audio_vosk_wav(audio_file.read(), language_code=language_code)
+        )
 
     # NOTE: AssemblyAI supports multiple audio formats. Browser MediaRecorder sends webm/opus by default.
-    audio_bytes = audio_file.read()
-    if not audio_bytes:
+    if not await run_in_threadpool(audio_file.read, 1):
         return ""
+    audio_file.seek(0)
+    return await client.transcribe(audio_file, language_code=language_code)
 
-    headers = {"authorization": api_key}
 
-    # 1) Upload audio
-    upload_resp = requests.post(
-        "https://api.assemblyai.com/v2/upload",
-        headers=headers,
-        data=audio_bytes,
-        timeout=60,
-    )
-    upload_resp.raise_for_status()
-    upload_url = upload_resp.json().get("upload_url")
-    if not upload_url:
-        raise RuntimeError("AssemblyAI upload failed")
-
-    # 2) Request transcript (use language detection for multilingual support)
-    transcript_req = {
-        "audio_url": upload_url,
-        "language_detection": True,
-    }
+@app.post("/voice/assemblyai/webhook")
+async def assemblyai_webhook(
+    payload: dict[str, Any],
+    webhook_secret: str | None = Header(default=None, alias=WEBHOOK_SECRET_HEADER),
+):
+    client = get_assemblyai_client()
+    if client is None:
+        raise HTTPException(status_code=404, detail="AssemblyAI is not configured")
+    if client.webhook_secret and webhook_secret != client.webhook_secret:
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    transcript_id = str(payload.get("transcript_id") or "")
+    return {"ok": True, "matched": bool(transcript_id) and client.notify_webhook(transcript_id)}
 
-    # If you want to force a language, you can disable detection and set the language.
-    # Keeping detection enabled is better for multilingual SwasthAI.
-    _ = language_code  # reserved for future use
 
-    transcript_resp = requests.post(
-        "https://api.assemblyai.com/v2/transcript",
-        headers={**headers, "content-type": "application/json"},
-        json=transcript_req,
-        timeout=60,
-    )
-    transcript_resp.raise_for_status()
-    transcript_id = transcript_resp.json().get("id")
-    if not transcript_id:
-        raise RuntimeError("AssemblyAI transcript creation failed")
+@app.on_event("shutdown")
+async def _close_assemblyai_client() -> None:
+    client = get_assemblyai_client()
+    if client is not None:
+        await client.aclose()
+
 
-    # 3) Poll until completed
-    poll_url = f"https://api.assemblyai.com/v2/transcript/{transcript_id}"
-    deadline = time.time() + 90
-    while True:
-        if time.time() > deadline:
-            raise RuntimeError("AssemblyAI transcription timed out")
+def _vosk_preload_enabled() -> bool:
+    if (os.getenv("ASSEMBLYAI_API_KEY") or "").strip():
+        return False
+    return (os.getenv("VOSK_PRELOAD") or "1").strip().lower() not in {"0", "false", "no", "off"}
 
-        poll_resp = requests.get(poll_url, headers=headers, timeout=30)
-        poll_resp.raise_for_status()
-        payload = poll_resp.json()
-        status = payload.get("status")
 
-        if status == "completed":
-            return (payload.get("text") or "").strip()
-        if status == "error":
-            raise RuntimeError(payload.get("error") or "AssemblyAI transcription error")
+@app.on_event("startup")
+def _load_emergency_phrases() -> None:
+    matcher = get_emergency_matcher()
+    print(f"[voice] loaded {len(matcher)} emergency phrases")
 
-        time.sleep(0.8)
+
+@app.on_event("startup")
+def _start_vosk_preload() -> None:
+    _ensure_backend_env_loaded()
+    if not _vosk_preload_enabled():
+        return
+    # Load in the background so the server can bind; /health reports 503 until warm.
+    threading.Thread(target=preload_vosk_models, name="vosk-preload", daemon=True).start()
 
 
-EMERGENCY_KEYWORDS = [
-    "chest pain",
-    "unconscious",
-    "breathing difficulty",
-    "heavy bleeding",
-]
+@app.on_event("shutdown")
+def _stop_transcription_pool() -> None:
+    get_transcription_pool().shutdown()
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    voice = preload_status()
+    if voice.get("state") == "loading":
+        return JSONResponse(status_code=503, content={"status": "starting", "voice": voice})
+    return {"status": "ok", "voice": voice}
 
 
 @app.post("/auth/resolve-login", response_model=AuthResolveLoginOut)
@@ -619,46 +681,37 @@ def auth_bootstrap(
     claims: dict[str, Any] = Depends(get_current_claims),
     uid: str = Depends(get_current_uid),
 ):
-    fs = get_firestore()
-
-    # Ensure base doc exists, then overlay provided profile fields.
-    existing = _ensure_user_doc(uid, claims)
-
-    updates: dict[str, Any] = {
-        "name": payload.name.strip(),
-        "age": int(payload.age or 0),
-        "gender": payload.gender,
-        "avatarUrl": payload.avatarUrl or existing.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100",
-        "bio": payload.bio,
-        "dosha": payload.dosha,
-        "doshaIsBalanced": bool(payload.doshaIsBalanced),
-        "email": (claims.get("email") or existing.get("email")),
-        "phoneE164": (claims.get("phone_number") or existing.get("phoneE164")),
-        "lastActivityDate": existing.get("lastActivityDate") or _today_iso(),
-    }
-
-    # Only update phone if explicitly provided (avoid clearing it for email-only signups).
-    phone_norm = _phone_last10(payload.phone)
-    if phone_norm:
-        updates["phone"] = phone_norm
-
-    fs.collection(FIRESTORE_COLLECTION_USERS).document(uid).set(updates, merge=True)
+    def build_updates(existing: dict[str, Any]) -> dict[str, Any]:
+        # Overlay provided profile fields on top of the existing (or freshly created) doc.
+        updates: dict[str, Any] = {
+            "name": payload.name.strip(),
+            "age": int(payload.age or 0),
+            "gender": payload.gender,
+            "avatarUrl": payload.avatarUrl or existing.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100",
+            "bio": payload.bio,
+            "dosha": payload.dosha,
+            "doshaIsBalanced": bool(payload.doshaIsBalanced),
+            "email": (claims.get("email") or existing.get("email")),
+            "phoneE164": (claims.get("phone_number") or existing.get("phoneE164")),
+            "lastActivityDate": existing.get("lastActivityDate") or _today_iso(),
+        }
 
-    # Ensure user-data container exists.
-    data_ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
-    if not data_ref.get().exists:
-        data_ref.set({"challenges": [], "dailyVibes": [], "updatedAt": datetime.datetime.utcnow().isoformat()})
+        # Only update phone if explicitly provided (avoid clearing it for email-only signups).
+        phone_norm = _phone_last10(payload.phone)
+        if phone_norm:
+            updates["phone"] = phone_norm
+        return updates
 
-    doc = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid).get().to_dict() or {}
+    doc = _provision_user(uid, claims, build_updates)
     return _user_doc_to_out(uid, doc)
 
 
 @app.get("/auth/me", response_model=UserOut)
-def auth_me(
+async def auth_me(
     claims: dict[str, Any] = Depends(get_current_claims),
     uid: str = Depends(get_current_uid),
 ):
-    doc = _ensure_user_doc(uid, claims)
+    doc = await _ensure_user_doc_async(uid, claims)
     return _user_doc_to_out(uid, doc)
 
 
@@ -704,88 +757,446 @@ def patch_me(
     if updates:
         fs.collection(FIRESTORE_COLLECTION_USERS).document(uid).set(updates, merge=True)
         existing.update(updates)
+        get_profile_cache().put(uid, existing)
+        if ("name" in updates or "avatarUrl" in updates) and uid in _leaderboard:
+            _leaderboard.update_user(uid, name=existing.get("name") or "", avatarUrl=existing.get("avatarUrl"))
 
     return _user_doc_to_out(uid, existing)
 
 
+@async_transactional
+async def _apply_user_data_ops(
+    transaction: Any,
+    ref: Any,
+    build_ops: Callable[[dict[str, Any]], list[dict[str, Any]]],
+    if_updated_at: str | None,
+) -> dict[str, Any]:
+    """Read the userData doc, apply the ops built from it and write only what changed."""
+
+    snap = await ref.get(transaction=transaction)
+    state = read_user_data_state(snap.to_dict() if snap.exists else None)
+    updates = stage_user_data_ops(
+        state, build_ops(state), datetime.datetime.utcnow().isoformat(), if_updated_at=if_updated_at
+    )
+    if updates is not None:
+        if snap.exists:
+            transaction.update(ref, updates)
+        else:
+            transaction.set(ref, updates)
+    return state
+
+
+async def _write_user_data(
+    uid: str,
+    build_ops: Callable[[dict[str, Any]], list[dict[str, Any]]],
+    if_updated_at: str | None,
+) -> dict[str, Any]:
+    fs = get_async_firestore()
+    ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
+    try:
+        return await _apply_user_data_ops(fs.transaction(), ref, build_ops, if_updated_at)
+    except UserDataConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": str(e), "version": e.version, "updatedAt": e.updated_at},
+        )
+
+
 @app.get("/user-data/me", response_model=UserDataOut)
-def get_user_data(uid: str = Depends(get_current_uid)):
-    fs = get_firestore()
+async def get_user_data(
+    sinceVersion: int | None = QueryParam(default=None, ge=0),
+    uid: str = Depends(get_current_uid),
+):
+    fs = get_async_firestore()
     ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
-    snap = ref.get()
+    snap = await ref.get()
     if not snap.exists:
-        ref.set({"challenges": [], "dailyVibes": [], "updatedAt": datetime.datetime.utcnow().isoformat()})
-        return UserDataOut(challenges=[], dailyVibes=[])
-    doc = snap.to_dict() or {}
-    return UserDataOut(challenges=doc.get("challenges") or [], dailyVibes=doc.get("dailyVibes") or [])
+        doc = _new_user_data_doc()
+        await ref.set(doc)
+        return UserDataOut(version=doc["version"], updatedAt=doc["updatedAt"])
+    state = read_user_data_state(snap.to_dict())
+    if sinceVersion is None or not user_data_delta_available(state, sinceVersion):
+        # Tombstones older than the client's version are gone: send everything (no sinceVersion).
+        return UserDataOut(**full_user_data_lists(state), version=state["version"], updatedAt=state["updatedAt"])
+    changed, deleted = user_data_changes_since(state, sinceVersion)
+    return UserDataOut(
+        **changed,
+        version=state["version"],
+        updatedAt=state["updatedAt"],
+        sinceVersion=sinceVersion,
+        deleted=deleted,
+    )
 
 
 @app.put("/user-data/me", response_model=UserDataOut)
-def put_user_data(payload: UserDataPutIn, uid: str = Depends(get_current_uid)):
-    fs = get_firestore()
-    ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
-    ref.set(
-        {
-            "challenges": payload.challenges or [],
-            "dailyVibes": payload.dailyVibes or [],
-            "updatedAt": datetime.datetime.utcnow().isoformat(),
-        },
-        merge=True,
+async def put_user_data(payload: UserDataPutIn, uid: str = Depends(get_current_uid)):
+    """Replace whole lists; only the items that differ from the stored ones are written."""
+
+    lists = {"challenges": payload.challenges, "dailyVibes": payload.dailyVibes}
+    state = await _write_user_data(uid, lambda current: user_data_replace_ops(current, lists), payload.ifUpdatedAt)
+    return UserDataOut(**full_user_data_lists(state), version=state["version"], updatedAt=state["updatedAt"])
+
+
+@app.patch("/user-data/me", response_model=UserDataPatchOut)
+async def patch_user_data(payload: UserDataPatchIn, uid: str = Depends(get_current_uid)):
+    """Per-item upserts/deletes keyed by item id."""
+
+    for op in payload.ops:
+        if op.op == "upsert" and op.value is None:
+            raise HTTPException(status_code=422, detail=f"upsert of {op.field}/{op.id} needs a value")
+    ops = [op.model_dump() for op in payload.ops]
+    state = await _write_user_data(uid, lambda _current: ops, payload.ifUpdatedAt)
+    return UserDataPatchOut(version=state["version"], updatedAt=state["updatedAt"])
+
+
+def _user_days_refs(fs: Any, uid: str) -> tuple[Any, Any]:
+    data_ref = fs.collection(FIRESTORE_COLLECTION_USER_DATA).document(uid)
+    return (
+        data_ref.collection(FIRESTORE_SUBCOLLECTION_DAYS),
+        data_ref.collection(FIRESTORE_SUBCOLLECTION_SUMMARY).document(USER_DATA_SUMMARY_DOC_ID),
     )
-    return UserDataOut(challenges=payload.challenges or [], dailyVibes=payload.dailyVibes or [])
 
 
-def _ensure_default_community() -> None:
-    fs = get_firestore()
-    ref = fs.collection(FIRESTORE_COLLECTION_COMMUNITIES).document("general")
-    if ref.get().exists:
-        return
-    ref.set(
-        {
-            "slug": "general",
-            "name": "General",
-            "description": "SwasthAI community feed",
-            "memberCount": 0,
-            "createdAt": datetime.datetime.utcnow(),
-            "createdBy": None,
-        }
+def _day_doc_to_out(uid: str, date: str, doc: dict[str, Any]) -> DailyHistoryOut:
+    return DailyHistoryOut(**{**doc, "userId": uid, "date": date})
+
+
+@async_transactional
+async def _merge_user_day(transaction: Any, day_ref: Any, updates: dict[str, Any]) -> dict[str, Any]:
+    """Merge unscored fields into one day doc and return the stored result (1 read, 1 write)."""
+
+    snap = await day_ref.get(transaction=transaction)
+    day = (snap.to_dict() or {}) if snap.exists else {}
+    transaction.set(day_ref, updates, merge=True)
+    activities = {**(day.get("activities") or {}), **(updates.get("activities") or {})}
+    return {**day, **updates, "activities": activities}
+
+
+@app.put("/user-data/me/days/{date}", response_model=DailyHistoryOut)
+async def put_user_day(date: str, payload: DailyHistoryNotesIn, uid: str = Depends(get_current_uid)):
+    """Save a day's vibes, challenges and water goal; scored counters are not writable here."""
+
+    try:
+        date = parse_day(date).isoformat()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fields = payload.model_dump(exclude_none=True)
+    updates: dict[str, Any] = {"date": date, "savedAt": datetime.datetime.utcnow().isoformat()}
+    if "waterGoal" in fields:
+        updates["activities"] = {"waterGoal": fields.pop("waterGoal")}
+    updates.update(fields)
+    fs = get_async_firestore()
+    days, _ = _user_days_refs(fs, uid)
+    day = await _merge_user_day(fs.transaction(), days.document(date), updates)
+    return _day_doc_to_out(uid, date, day)
+
+
+@app.get("/user-data/me/days", response_model=DailyHistoryRangeOut)
+async def get_user_days(
+    from_: str = QueryParam(alias="from"),
+    to: str = QueryParam(),
+    uid: str = Depends(get_current_uid),
+):
+    """Every day in [from, to] (inclusive, at most 62) from one batched read; missing days are null."""
+
+    try:
+        dates = day_range(from_, to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fs = get_async_firestore()
+    days, _ = _user_days_refs(fs, uid)
+    out: dict[str, DailyHistoryOut | None] = {d: None for d in dates}
+    async for snap in fs.get_all([days.document(d) for d in dates]):
+        if snap.exists:
+            out[snap.id] = _day_doc_to_out(uid, snap.id, snap.to_dict() or {})
+    return DailyHistoryRangeOut(days=out)
+
+
+@app.get("/user-data/me/summary", response_model=UserDataSummaryOut)
+async def get_user_data_summary(uid: str = Depends(get_current_uid)):
+    fs = get_async_firestore()
+    _, summary_ref = _user_days_refs(fs, uid)
+    user_ref = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid)
+    snaps = {snap.reference.path: snap async for snap in fs.get_all([user_ref, summary_ref])}
+    summary_snap, user_snap = snaps.get(summary_ref.path), snaps.get(user_ref.path)
+    summary = summary_snap.to_dict() if summary_snap is not None and summary_snap.exists else empty_summary()
+    user_doc = (user_snap.to_dict() or {}) if user_snap is not None and user_snap.exists else {}
+    # The stored streak only moves when a day is saved; a missed day breaks it as of the user's today.
+    today = _user_local_today(user_doc)
+    counters = effective_counters(
+        {"streak": summary.get("streak"), "lastActivityDate": summary.get("lastActiveDate")}, today
     )
+    return UserDataSummaryOut(**{**summary, "streak": counters["streak"]})
+
+
+@async_transactional
+async def _record_activity(
+    transaction: Any,
+    user_ref: Any,
+    days: Any,
+    summary_ref: Any,
+    event_ref: Any | None,
+    payload: ActivityIn,
+    tz_name: str,
+    today: str,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Apply one activity to the user counters, its day doc and the summary.
+
+    Returns (user counter values, event record). A replayed clientEventId
+    returns the stored event and writes nothing.
+    """
 
+    refs = [user_ref, days.document(today), summary_ref] + ([event_ref] if event_ref is not None else [])
+    snaps = {snap.reference.path: snap async for snap in await transaction.get_all(refs)}
+
+    def _doc(ref: Any) -> dict[str, Any] | None:
+        snap = snaps.get(ref.path)
+        return (snap.to_dict() or {}) if snap is not None and snap.exists else None
+
+    if event_ref is not None:
+        event = _doc(event_ref)
+        if event is not None:
+            return {}, event
+
+    user_doc = _doc(user_ref) or {}
+    previous_day = _doc(days.document(today))
+    now = datetime.datetime.utcnow()
+    plan = plan_activity(
+        user_doc, previous_day, payload.kind, payload.amount, payload.taskName, tz_name, today, now.isoformat()
+    )
+    day_ref = days.document(plan.today)
+    if plan.today != today:
+        snap = await day_ref.get(transaction=transaction)
+        previous_day = (snap.to_dict() or {}) if snap.exists else None
+        plan = plan_activity(
+            user_doc, previous_day, payload.kind, payload.amount, payload.taskName, tz_name, today, now.isoformat()
+        )
+
+    event = {
+        "kind": payload.kind,
+        "amount": payload.amount,
+        "taskName": payload.taskName,
+        "pointsEarned": plan.points,
+        "date": plan.today,
+        "createdAt": now.isoformat(),
+        "expireAt": now + ACTIVITY_EVENT_TTL,
+    }
+    transaction.update(user_ref, plan.user_updates)
+    transaction.set(day_ref, plan.day_updates, merge=True)
+    summary = apply_day_to_summary(_doc(summary_ref), plan.today, previous_day, plan.day, now.isoformat())
+    transaction.set(summary_ref, summary)
+    if event_ref is not None:
+        transaction.set(event_ref, event)
+    return plan.user_values, event
+
+
+@app.post("/users/me/activities", response_model=ActivityOut)
+async def post_activity(
+    payload: ActivityIn,
+    claims: dict[str, Any] = Depends(get_current_claims),
+    uid: str = Depends(get_current_uid),
+):
+    """Score a completed activity on the server and update streak/points atomically."""
+
+    existing = await _ensure_user_doc_async(uid, claims)
+    tz_name = payload.timezone or existing.get("timezone")
+    try:
+        today = local_today(tz_name)
+    except ValueError as e:
+        if payload.timezone:
+            raise HTTPException(status_code=400, detail=str(e))
+        tz_name, today = None, local_today(None)
+    tz_name = tz_name or default_timezone()
+
+    fs = get_async_firestore()
+    user_ref = fs.collection(FIRESTORE_COLLECTION_USERS).document(uid)
+    days, summary_ref = _user_days_refs(fs, uid)
+    event_ref = (
+        user_ref.collection(FIRESTORE_SUBCOLLECTION_ACTIVITY_EVENTS).document(payload.clientEventId)
+        if payload.clientEventId
+        else None
+    )
+    values, event = await _record_activity(
+        fs.transaction(), user_ref, days, summary_ref, event_ref, payload, tz_name, today
+    )
+    if not values:
+        return ActivityOut(
+            user=_user_doc_to_out(uid, existing),
+            pointsEarned=int(event.get("pointsEarned") or 0),
+            date=str(event.get("date") or today),
+            duplicate=True,
+        )
+
+    doc = {**existing, **values}
+    await get_profile_cache().aput(uid, doc)
+    _leaderboard.update_user(uid, **_leaderboard_fields(doc))
+    return ActivityOut(user=_user_doc_to_out(uid, doc), pointsEarned=event["pointsEarned"], date=event["date"])
+
+
+def _leaderboard_fields(doc: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "points": int(doc.get("points") or 0),
+        "streak": effective_counters(doc, _user_local_today(doc))["streak"],
+        "name": doc.get("name") or "",
+        "avatarUrl": doc.get("avatarUrl"),
+        "lastActivityDate": doc.get("lastActivityDate"),
+        "timezone": doc.get("timezone"),
+    }
+
+
+def _leaderboard_streak_is_current(entry: dict[str, Any]) -> bool:
+    return effective_counters(entry, _user_local_today(entry))["streak"] > 0
+
+
+def _rebuild_leaderboard(board: Leaderboard) -> None:
+    """First start without a snapshot: one scan of users and of community memberships."""
 
-@app.get("/communities", response_model=list[CommunityOut])
-def list_communities():
-    _ensure_default_community()
     fs = get_firestore()
-    snaps = (
-        fs.collection(FIRESTORE_COLLECTION_COMMUNITIES)
-        .order_by("createdAt", direction=Query.DESCENDING)
-        .stream()
+    users = fs.collection(FIRESTORE_COLLECTION_USERS).select(
+        ["points", "streak", "name", "avatarUrl", "lastActivityDate", "timezone"]
     )
-    out: list[CommunityOut] = []
-    for s in snaps:
-        d = s.to_dict() or {}
-        out.append(
-            CommunityOut(
-                slug=str(d.get("slug") or s.id),
-                name=str(d.get("name") or ""),
-                description=d.get("description"),
-                memberCount=int(d.get("memberCount") or 0),
-            )
+    for snap in users.stream():
+        board.update_user(snap.id, **_leaderboard_fields(snap.to_dict() or {}))
+    for snap in fs.collection_group(FIRESTORE_SUBCOLLECTION_MEMBERS).select(["uid"]).stream():
+        community = snap.reference.parent.parent
+        if community is not None and community.parent.id == FIRESTORE_COLLECTION_COMMUNITIES:
+            board.join(community.id, snap.id)
+
+
+_leaderboard = Leaderboard(
+    get_firestore,
+    FIRESTORE_COLLECTION_LEADERBOARD,
+    streak_is_current=_leaderboard_streak_is_current,
+    **leaderboard_settings(),
+)
+
+
+@app.on_event("startup")
+def _start_leaderboard() -> None:
+    try:
+        _leaderboard.load(rebuild=_rebuild_leaderboard)
+    except Exception as e:
+        # Start empty; snapshots only merge changed users, so nothing stored is lost.
+        print(f"[leaderboard] load failed: {e}")
+    _leaderboard.start()
+
+
+@app.on_event("shutdown")
+def _stop_leaderboard() -> None:
+    _leaderboard.stop()
+
+
+def _leaderboard_board_id(community: str | None) -> str:
+    return (community or "").strip().lower() or GLOBAL_BOARD
+
+
+@app.get("/leaderboard", response_model=LeaderboardOut)
+def get_leaderboard(
+    metric: str = QueryParam(default="points", pattern="^(points|streak)$"),
+    community: str | None = QueryParam(default=None),
+    limit: int = QueryParam(default=20, ge=1, le=100),
+    offset: int = QueryParam(default=0, ge=0),
+):
+    """Top-N from the in-memory board; no Firestore reads."""
+
+    board_id = _leaderboard_board_id(community)
+    return LeaderboardOut(
+        metric=metric,  # type: ignore[arg-type]
+        community=board_id or None,
+        total=_leaderboard.size(board_id),
+        items=_leaderboard.top(metric, limit, offset, board_id),
+    )
+
+
+@app.get("/leaderboard/me", response_model=LeaderboardMeOut)
+async def get_my_leaderboard_rank(
+    metric: str = QueryParam(default="points", pattern="^(points|streak)$"),
+    community: str | None = QueryParam(default=None),
+    claims: dict[str, Any] = Depends(get_current_claims),
+    uid: str = Depends(get_current_uid),
+):
+    if uid not in _leaderboard:
+        _leaderboard.update_user(uid, **_leaderboard_fields(await _ensure_user_doc_async(uid, claims)))
+    board_id = _leaderboard_board_id(community)
+    return LeaderboardMeOut(
+        metric=metric,  # type: ignore[arg-type]
+        community=board_id or None,
+        total=_leaderboard.size(board_id),
+        entry=_leaderboard.rank(uid, metric, board_id),
+    )
+
+
+_default_community_ready = False
+
+
+async def _ensure_default_community() -> None:
+    global _default_community_ready
+    if _default_community_ready:
+        return
+    fs = get_async_firestore()
+    ref = fs.collection(FIRESTORE_COLLECTION_COMMUNITIES).document("general")
+    try:
+        await ref.create(
+            {
+                "slug": "general",
+                "name": "General",
+                "description": "SwasthAI community feed",
+                "memberCount": 0,
+                "createdAt": datetime.datetime.utcnow(),
+                "createdBy": None,
+            }
         )
-    return out
+    except AlreadyExists:
+        pass
+    _default_community_ready = True
+
+
+def _community_member_count(ref: Any, doc: dict[str, Any]) -> int:
+    """Persisted count plus the joins/leaves this worker hasn't flushed yet."""
+
+    count = int(doc.get("memberCount") or 0) + _member_counters.pending(ref.path).get(("memberCount",), 0)
+    return max(count, 0)
+
+
+def _community_snap_to_out(snap: Any) -> CommunityOut:
+    d = snap.to_dict() or {}
+    return CommunityOut(
+        slug=str(d.get("slug") or snap.id),
+        name=str(d.get("name") or ""),
+        description=d.get("description"),
+        memberCount=_community_member_count(snap.reference, d),
+    )
+
+
+# Bumped whenever this worker changes the communities list; cached bodies also
+# expire after RESPONSE_CACHE_TTL_SECONDS to pick up other workers' writes.
+_communities_version = 0
+
+
+@app.get("/communities", response_model=list[CommunityOut])
+async def list_communities(if_none_match: str | None = Header(default=None)):
+    await _ensure_default_community()
+    cache_key = ("communities", _communities_version)
+    response_cache = get_response_cache()
+    encoded = response_cache.get(cache_key)
+    if encoded is None:
+        fs = get_async_firestore()
+        q = fs.collection(FIRESTORE_COLLECTION_COMMUNITIES).order_by("createdAt", direction=Query.DESCENDING)
+        payload = [_community_snap_to_out(s).model_dump() async for s in q.stream()]
+        encoded = encode_json(payload)
+        response_cache.put(cache_key, encoded)
+    return json_response(encoded, if_none_match)
 
 
 @app.post("/communities", response_model=CommunityOut)
-def create_community(payload: CommunityCreateIn, uid: str = Depends(get_current_uid)):
+async def create_community(payload: CommunityCreateIn, uid: str = Depends(get_current_uid)):
+    global _communities_version
     slug = payload.slug.strip().lower()
     if not slug:
         raise HTTPException(status_code=400, detail="Invalid slug")
 
-    fs = get_firestore()
+    fs = get_async_firestore()
     ref = fs.collection(FIRESTORE_COLLECTION_COMMUNITIES).document(slug)
-    if ref.get().exists:
-        raise HTTPException(status_code=400, detail="Community already exists")
-
     doc = {
         "slug": slug,
         "name": payload.name.strip(),
@@ -794,75 +1205,391 @@ def create_community(payload: CommunityCreateIn, uid: str = Depends(get_current_
         "createdAt": datetime.datetime.utcnow(),
         "createdBy": uid,
     }
-    ref.set(doc)
+    try:
+        await ref.create(doc)
+    except AlreadyExists:
+        raise HTTPException(status_code=400, detail="Community already exists")
+
+    _communities_version += 1
+    _community_exists_cache.set(slug, True, expires_at=time.time() + _COMMUNITY_EXISTS_TTL_SECONDS)
     return CommunityOut(slug=slug, name=doc["name"], description=doc.get("description"), memberCount=0)
 
 
-@app.get("/posts", response_model=list[CommunityPostOut])
-def list_posts(community: str | None = None):
-    _ensure_default_community()
-    fs = get_firestore()
-    q = fs.collection(FIRESTORE_COLLECTION_POSTS)
-    community_slug = community.strip().lower() if community else None
+@async_transactional
+async def _swap_membership(transaction: Any, community_ref: Any, member_ref: Any, uid: str, join: bool):
+    """Create (or delete) a membership doc; returns (community doc, whether membership changed)."""
+
+    snaps = {snap.reference.path: snap async for snap in await transaction.get_all([community_ref, member_ref])}
+    community_snap = snaps.get(community_ref.path)
+    if community_snap is None or not community_snap.exists:
+        raise HTTPException(status_code=404, detail="Community not found")
+    member_snap = snaps.get(member_ref.path)
+    is_member = member_snap is not None and member_snap.exists
+    if join and not is_member:
+        transaction.create(member_ref, {"uid": uid, "joinedAt": datetime.datetime.utcnow()})
+    elif not join and is_member:
+        transaction.delete(member_ref)
+    return community_snap.to_dict() or {}, join != is_member
+
+
+async def _set_membership(slug: str, uid: str, join: bool) -> CommunityMembershipOut:
+    global _communities_version
+    slug = slug.strip().lower()
+    if not slug:
+        raise HTTPException(status_code=400, detail="Invalid slug")
+    fs = get_async_firestore()
+    community_ref = fs.collection(FIRESTORE_COLLECTION_COMMUNITIES).document(slug)
+    member_ref = community_ref.collection(FIRESTORE_SUBCOLLECTION_MEMBERS).document(uid)
+    community_doc, changed = await _swap_membership(fs.transaction(), community_ref, member_ref, uid, join)
+
+    if changed:
+        # memberCount goes through the write-behind buffer so a burst of joins
+        # to one community doesn't serialize on its document.
+        _member_counters.add(community_ref.path, ("memberCount",), 1 if join else -1)
+        _communities_version += 1
+        if join:
+            if uid not in _leaderboard:
+                _leaderboard.update_user(uid, **_leaderboard_fields(await _ensure_user_doc_async(uid)))
+            _leaderboard.join(slug, uid)
+        else:
+            _leaderboard.leave(slug, uid)
+    return CommunityMembershipOut(
+        slug=slug,
+        uid=uid,
+        isMember=join,
+        memberCount=_community_member_count(community_ref, community_doc),
+    )
+
+
+@app.post("/communities/{slug}/members", response_model=CommunityMembershipOut)
+async def join_community(slug: str, uid: str = Depends(get_current_uid)):
+    await _ensure_default_community()
+    return await _set_membership(slug, uid, join=True)
+
+
+@app.delete("/communities/{slug}/members", response_model=CommunityMembershipOut)
+async def leave_community(slug: str, uid: str = Depends(get_current_uid)):
+    return await _set_membership(slug, uid, join=False)
+
+
+def _post_user_out(user_doc: dict[str, Any]) -> PostUserOut:
+    return PostUserOut(
+        uid=str(user_doc.get("uid") or ""),
+        name=str(user_doc.get("name") or ""),
+        avatarUrl=str(user_doc.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100"),
+    )
+
+
+def _positive_counts(raw: Any) -> dict[str, int]:
+    if not isinstance(raw, dict):
+        return {}
+    out: dict[str, int] = {}
+    for key, value in raw.items():
+        try:
+            n = int(value or 0)
+        except (TypeError, ValueError):
+            continue
+        if n > 0:
+            out[str(key)] = n
+    return out
+
+
+def _post_snap_to_out(snap: Any) -> CommunityPostOut:
+    d = snap.to_dict() or {}
+    created_at = d.get("createdAt")
+    if isinstance(created_at, datetime.datetime):
+        timestamp = created_at.isoformat()
+    else:
+        timestamp = str(created_at or datetime.datetime.utcnow().isoformat())
+
+    return CommunityPostOut(
+        id=str(d.get("id") or snap.id),
+        user=_post_user_out(d.get("user") or {}),
+        timestamp=timestamp,
+        content=str(d.get("content") or ""),
+        imageUrl=d.get("imageUrl"),
+        imageHint=d.get("imageHint"),
+        reactions=_positive_counts(d.get("reactions")),
+        userReactions={},
+        comments=[],
+        commentCount=int(d.get("commentCount") or 0),
+    )
+
+
+POSTS_PAGE_DEFAULT_LIMIT = 50
+POSTS_PAGE_MAX_LIMIT = 100
+# Without the composite index a community page is found by scanning createdAt order.
+POSTS_FALLBACK_SCAN_PAGE = 200
+POSTS_FALLBACK_MAX_SCAN = 5000
+COMMENTS_PAGE_DEFAULT_LIMIT = 20
+COMMENTS_PAGE_MAX_LIMIT = 100
+FEED_INLINE_COMMENTS_MAX = 10
+
+
+def _encode_cursor(created_at: datetime.datetime, doc_id: str) -> str:
+    raw = json.dumps({"t": created_at.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime.datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        created_at = datetime.datetime.fromisoformat(str(data["t"]))
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+        doc_id = str(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not doc_id:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, doc_id
+
+
+def _post_sort_key(snap: Any) -> tuple[datetime.datetime, str]:
+    created_at = (snap.to_dict() or {}).get("createdAt")
+    if not isinstance(created_at, datetime.datetime):
+        return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc), snap.id
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+    return created_at, snap.id
+
+
+def _post_snap_to_entry(snap: Any) -> FeedEntry:
+    created_at, doc_id = _post_sort_key(snap)
+    return FeedEntry(created_at=created_at, post_id=doc_id, post=_post_snap_to_out(snap).model_dump())
+
+
+async def _query_posts(
+    community_slug: str | None,
+    after: tuple[datetime.datetime, str] | None,
+    fetch: int,
+) -> list[Any]:
+    """Fetch up to `fetch` post snapshots in (createdAt DESC, doc id DESC) order."""
+
+    fs = get_async_firestore()
+    col = fs.collection(FIRESTORE_COLLECTION_POSTS)
 
-    # Preferred query: filter by community and order by createdAt.
     # NOTE: Firestore may require a composite index for (communitySlug, createdAt).
-    # If that index is missing, fallback to a broader query and filter/sort in Python.
+    # If that index is missing, fall back to scanning createdAt order and filtering in Python.
     try:
-        q_primary = q
+        q_primary = col
         if community_slug:
             q_primary = q_primary.where("communitySlug", "==", community_slug)
-        q_primary = q_primary.order_by("createdAt", direction=Query.DESCENDING).limit(50)
-        snaps = list(q_primary.stream())
-    except Exception:
-        # Fallback: fetch recent posts without community filter, then filter locally.
-        # Fetch more than 50 so community-specific results are still likely present.
-        q_fallback = q.order_by("createdAt", direction=Query.DESCENDING).limit(200)
-        raw = list(q_fallback.stream())
-        if community_slug:
-            raw = [s for s in raw if (s.to_dict() or {}).get("communitySlug") == community_slug]
-        snaps = raw[:50]
+        q_primary = q_primary.order_by("createdAt", direction=Query.DESCENDING).order_by(
+            "__name__", direction=Query.DESCENDING
+        )
+        if after is not None:
+            q_primary = q_primary.start_after({"createdAt": after[0], "__name__": col.document(after[1])})
+        return [s async for s in q_primary.limit(fetch).stream()]
+    except Exception as e:
+        print(f"[posts] indexed query failed, scanning by createdAt (is the communitySlug+createdAt index missing?): {e}")
+
+    # Fallback on the single-field createdAt index: apply the cursor in the query
+    # and scan pages until enough posts of the community turn up.
+    out: list[Any] = []
+    scanned = 0
+    q_fallback = col.order_by("createdAt", direction=Query.DESCENDING)
+    if after is not None:
+        # start_at keeps posts sharing the cursor's createdAt; the id tie-break is applied below.
+        q_fallback = q_fallback.start_at({"createdAt": after[0]})
+    while len(out) < fetch:
+        page = [s async for s in q_fallback.limit(POSTS_FALLBACK_SCAN_PAGE).stream()]
+        scanned += len(page)
+        for snap in page:
+            if community_slug and (snap.to_dict() or {}).get("communitySlug") != community_slug:
+                continue
+            if after is not None and _post_sort_key(snap) >= after:
+                continue
+            out.append(snap)
+        if len(page) < POSTS_FALLBACK_SCAN_PAGE:
+            break
+        if scanned >= POSTS_FALLBACK_MAX_SCAN:
+            # Ending the page here would look like the end of the feed.
+            raise HTTPException(status_code=503, detail="Posts index is not ready, please retry shortly")
+        q_fallback = q_fallback.start_after(page[-1])
+    out.sort(key=_post_sort_key, reverse=True)
+    return out[:fetch]
+
+
+# Feeds are only cached for communities that exist, so `?community=<random>`
+# can't grow the feed cache or the warm-up locks. Existing slugs are cached for
+# long (communities are never deleted), unknown ones briefly.
+_community_exists_cache: TTLCache[bool] = TTLCache(max_size=1024)
+_COMMUNITY_EXISTS_TTL_SECONDS = 3600.0
+_COMMUNITY_MISSING_TTL_SECONDS = 30.0
+_feed_warm_locks: dict[str, asyncio.Lock] = {}
+
+
+async def _community_exists(slug: str) -> bool:
+    exists = _community_exists_cache.get(slug)
+    if exists is None:
+        snap = await get_async_firestore().collection(FIRESTORE_COLLECTION_COMMUNITIES).document(slug).get()
+        exists = bool(snap.exists)
+        ttl = _COMMUNITY_EXISTS_TTL_SECONDS if exists else _COMMUNITY_MISSING_TTL_SECONDS
+        _community_exists_cache.set(slug, exists, expires_at=time.time() + ttl)
+    return exists
+
+
+async def _warm_feed_cache(community_slug: str | None) -> None:
+    feed_cache = get_feed_cache()
+    key = community_slug or ALL_POSTS_FEED
+    lock = _feed_warm_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        # Concurrent cold reads share a single Firestore query.
+        if feed_cache.is_fresh(key):
+            return
+        snaps = await _query_posts(community_slug, None, feed_cache.capacity + 1)
+        feed_cache.warm(key, [_post_snap_to_entry(s) for s in snaps], complete=len(snaps) <= feed_cache.capacity)
+
+
+def _posts_page_payload(entries: list[FeedEntry], has_more: bool) -> dict[str, Any]:
+    """JSON-ready CommunityPostPageOut; entries already hold validated post dicts."""
+
+    next_cursor: str | None = None
+    if has_more and entries:
+        last = entries[-1]
+        next_cursor = _encode_cursor(last.created_at, last.post_id)
+    return {"items": [e.post for e in entries], "nextCursor": next_cursor}
+
+
+def _comment_snap_to_out(snap: Any) -> PostCommentOut:
+    d = snap.to_dict() or {}
+    created_at = d.get("createdAt")
+    if isinstance(created_at, datetime.datetime):
+        timestamp = created_at.isoformat()
+    else:
+        timestamp = str(created_at or datetime.datetime.utcnow().isoformat())
+    return PostCommentOut(
+        id=str(d.get("id") or snap.id),
+        user=_post_user_out(d.get("user") or {}),
+        content=str(d.get("content") or ""),
+        timestamp=timestamp,
+    )
 
-    posts: list[CommunityPostOut] = []
-    for snap in snaps:
-        d = snap.to_dict() or {}
-        created_at = d.get("createdAt")
-        if isinstance(created_at, datetime.datetime):
-            timestamp = created_at.isoformat()
-        else:
-            timestamp = str(created_at or datetime.datetime.utcnow().isoformat())
-
-        user_doc = d.get("user") or {}
-        posts.append(
-            CommunityPostOut(
-                id=str(d.get("id") or snap.id),
-                user=PostUserOut(
-                    uid=str(user_doc.get("uid") or ""),
-                    name=str(user_doc.get("name") or ""),
-                    avatarUrl=str(user_doc.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100"),
-                ),
-                timestamp=timestamp,
-                content=str(d.get("content") or ""),
-                imageUrl=d.get("imageUrl"),
-                imageHint=d.get("imageHint"),
-                reactions=d.get("reactions") or {},
-                userReactions={},
-                comments=[],
-            )
+
+async def _query_comments(
+    post_id: str,
+    after: tuple[datetime.datetime, str] | None,
+    fetch: int,
+) -> list[Any]:
+    """Fetch up to `fetch` comment snapshots of a post, oldest first."""
+
+    fs = get_async_firestore()
+    col = fs.collection(FIRESTORE_COLLECTION_POSTS).document(post_id).collection(FIRESTORE_SUBCOLLECTION_COMMENTS)
+    q = col.order_by("createdAt", direction=Query.ASCENDING).order_by("__name__", direction=Query.ASCENDING)
+    if after is not None:
+        q = q.start_after({"createdAt": after[0], "__name__": col.document(after[1])})
+    return [s async for s in q.limit(fetch).stream()]
+
+
+async def _inline_comments(entries: list[FeedEntry], k: int) -> list[dict[str, Any]]:
+    """Copy feed posts with their first `k` comments, querying all posts concurrently."""
+
+    async def first_comments(entry: FeedEntry) -> list[dict[str, Any]]:
+        return [_comment_snap_to_out(s).model_dump() for s in await _query_comments(entry.post_id, None, k)]
+
+    comment_lists = await asyncio.gather(*(first_comments(e) for e in entries))
+    return [{**e.post, "comments": comments} for e, comments in zip(entries, comment_lists)]
+
+
+async def _load_user_reactions(post_ids: list[str], uid: str) -> dict[str, str]:
+    """Batch-load one user's reactions for a page of posts in a single get_all."""
+
+    if not post_ids:
+        return {}
+    fs = get_async_firestore()
+    posts = fs.collection(FIRESTORE_COLLECTION_POSTS)
+    refs = [posts.document(pid).collection(FIRESTORE_SUBCOLLECTION_REACTIONS).document(uid) for pid in post_ids]
+    out: dict[str, str] = {}
+    async for snap in fs.get_all(refs):
+        if not snap.exists:
+            continue
+        emoji = (snap.to_dict() or {}).get("emoji")
+        if emoji:
+            out[snap.reference.parent.parent.id] = str(emoji)
+    return out
+
+
+@app.get("/posts", response_model=CommunityPostPageOut)
+async def list_posts(
+    community: str | None = None,
+    limit: int = QueryParam(default=POSTS_PAGE_DEFAULT_LIMIT, ge=1, le=POSTS_PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+    comments: int = QueryParam(default=0, ge=0, le=FEED_INLINE_COMMENTS_MAX),
+    if_none_match: str | None = Header(default=None),
+):
+    """Viewer-independent, so pages are shared and cached; see GET /posts/reactions/me."""
+
+    await _ensure_default_community()
+    community_slug = community.strip().lower() if community else None
+    after = _decode_cursor(cursor) if cursor else None
+
+    entries: list[FeedEntry] | None = None
+    has_more = False
+    version: int | None = None
+
+    # Serve from the in-memory feed buffer when the requested window is inside it.
+    feed_cache = get_feed_cache()
+    key = community_slug or ALL_POSTS_FEED
+    if (
+        feed_cache.enabled
+        and limit < feed_cache.capacity
+        and (community_slug is None or await _community_exists(community_slug))
+    ):
+        cached = feed_cache.page(key, limit, after)
+        if cached is None and after is None:
+            await _warm_feed_cache(community_slug)
+            cached = feed_cache.page(key, limit, after, record=False)
+        if cached is not None:
+            entries, has_more, version = cached
+
+    if entries is None:
+        # Keyset pagination on (createdAt DESC, doc id DESC). We fetch one extra doc
+        # to know whether another page exists without a second query.
+        snaps = await _query_posts(community_slug, after, limit + 1)
+        fetched = [_post_snap_to_entry(s) for s in snaps]
+        entries, has_more = fetched[:limit], len(fetched) > limit
+
+    if comments:
+        # Per-request page: inline each post's first comments.
+        payload = _posts_page_payload(entries, has_more)
+        payload["items"] = await _inline_comments(entries, comments)
+        return json_response(encode_json(payload), if_none_match)
+
+    if version is not None:
+        page_entries, page_has_more = entries, has_more
+        encoded = get_response_cache().get_or_encode(
+            ("posts", key, limit, cursor or "", version),
+            lambda: _posts_page_payload(page_entries, page_has_more),
         )
-    return posts
+        return json_response(encoded, if_none_match)
+    return json_response(encode_json(_posts_page_payload(entries, has_more)), if_none_match)
+
+
+@app.get("/posts/reactions/me", response_model=PostViewerReactionsOut)
+async def get_my_reactions(
+    ids: str = QueryParam(description="Comma-separated post ids, e.g. the ids of one /posts page"),
+    uid: str = Depends(get_current_uid),
+):
+    """The caller's reaction on each listed post (posts without one are omitted)."""
+
+    post_ids = list(dict.fromkeys(pid.strip() for pid in ids.split(",") if pid.strip()))
+    if len(post_ids) > POSTS_PAGE_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {POSTS_PAGE_MAX_LIMIT} post ids")
+    return PostViewerReactionsOut(reactions=await _load_user_reactions(post_ids, uid))
 
 
 @app.post("/posts", response_model=CommunityPostOut)
-def create_post(
+async def create_post(
     payload: CommunityPostCreateIn,
     claims: dict[str, Any] = Depends(get_current_claims),
     uid: str = Depends(get_current_uid),
 ):
-    _ensure_default_community()
-    fs = get_firestore()
+    await _ensure_default_community()
+    fs = get_async_firestore()
 
-    user_doc = _ensure_user_doc(uid, claims)
+    user_doc = await _ensure_user_doc_async(uid, claims)
     post_id = uuid.uuid4().hex
     community_slug = (payload.communitySlug or "general").strip().lower() or "general"
 
@@ -879,10 +1606,11 @@ def create_post(
             "avatarUrl": user_doc.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100",
         },
         "reactions": {},
+        "commentCount": 0,
     }
-    fs.collection(FIRESTORE_COLLECTION_POSTS).document(post_id).set(doc)
+    await fs.collection(FIRESTORE_COLLECTION_POSTS).document(post_id).set(doc)
 
-    return CommunityPostOut(
+    out = CommunityPostOut(
         id=post_id,
         user=PostUserOut(uid=uid, name=str(doc["user"]["name"]), avatarUrl=str(doc["user"]["avatarUrl"])),
         timestamp=doc["createdAt"].isoformat(),
@@ -894,20 +1622,71 @@ def create_post(
         comments=[],
     )
 
+    # Write-through to the cached feeds this post appears in. Firestore returns
+    # createdAt as an aware UTC datetime, so cached copies use the same form.
+    created_at_utc = doc["createdAt"].replace(tzinfo=datetime.timezone.utc)
+    cached_post = out.model_dump()
+    cached_post["timestamp"] = created_at_utc.isoformat()
+    get_feed_cache().push(
+        [community_slug, ALL_POSTS_FEED],
+        FeedEntry(created_at=created_at_utc, post_id=post_id, post=cached_post),
+    )
+    return out
+
+
+@app.get("/posts/{post_id}/comments", response_model=PostCommentPageOut)
+async def list_comments(
+    post_id: str,
+    limit: int = QueryParam(default=COMMENTS_PAGE_DEFAULT_LIMIT, ge=1, le=COMMENTS_PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+):
+    after = _decode_cursor(cursor) if cursor else None
+    snaps = await _query_comments(post_id, after, limit + 1)
+    if not snaps and after is None:
+        # Only pay for the existence check when there's nothing to return.
+        fs = get_async_firestore()
+        if not (await fs.collection(FIRESTORE_COLLECTION_POSTS).document(post_id).get()).exists:
+            raise HTTPException(status_code=404, detail="Post not found")
+
+    page = snaps[:limit]
+    next_cursor: str | None = None
+    if len(snaps) > limit and page:
+        created_at, doc_id = _post_sort_key(page[-1])
+        next_cursor = _encode_cursor(created_at, doc_id)
+    return PostCommentPageOut(items=[_comment_snap_to_out(s) for s in page], nextCursor=next_cursor)
+
+
+@async_transactional
+async def _add_comment_counting(transaction: Any, post_ref: Any, comment_ref: Any, doc: dict[str, Any]) -> None:
+    """Add a comment to a post that predates `commentCount`, counting its existing comments once."""
+
+    snap = await post_ref.get(transaction=transaction)
+    if not snap.exists:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if "commentCount" in (snap.to_dict() or {}):
+        # Another request backfilled it first.
+        transaction.update(post_ref, {"commentCount": Increment(1)})
+    else:
+        comments = post_ref.collection(FIRESTORE_SUBCOLLECTION_COMMENTS)
+        result = await comments.count(alias="n").get(transaction=transaction)
+        transaction.update(post_ref, {"commentCount": int(result[0][0].value) + 1})
+    transaction.set(comment_ref, doc)
+
 
 @app.post("/posts/{post_id}/comments", response_model=PostCommentOut)
-def add_comment(
+async def add_comment(
     post_id: str,
     payload: PostCommentCreateIn,
     claims: dict[str, Any] = Depends(get_current_claims),
     uid: str = Depends(get_current_uid),
 ):
-    fs = get_firestore()
+    fs = get_async_firestore()
     post_ref = fs.collection(FIRESTORE_COLLECTION_POSTS).document(post_id)
-    if not post_ref.get().exists:
+    # The post read (to spot posts without `commentCount`) runs alongside the author lookup.
+    user_doc, post_snap = await asyncio.gather(_ensure_user_doc_async(uid, claims), post_ref.get())
+    if not post_snap.exists:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    user_doc = _ensure_user_doc(uid, claims)
     comment_id = uuid.uuid4().hex
     created_at = datetime.datetime.utcnow()
     doc = {
@@ -920,7 +1699,25 @@ def add_comment(
             "avatarUrl": user_doc.get("avatarUrl") or "https://picsum.photos/seed/default-avatar/100/100",
         },
     }
-    post_ref.collection("comments").document(comment_id).set(doc)
+
+    comment_ref = post_ref.collection(FIRESTORE_SUBCOLLECTION_COMMENTS).document(comment_id)
+    if "commentCount" in (post_snap.to_dict() or {}):
+        # Write the comment and bump the post's counter atomically.
+        batch = fs.batch()
+        batch.set(comment_ref, doc)
+        batch.update(post_ref, {"commentCount": Increment(1)})
+        try:
+            await batch.commit()
+        except NotFound:
+            raise HTTPException(status_code=404, detail="Post not found")
+    else:
+        await _add_comment_counting(fs.transaction(), post_ref, comment_ref, doc)
+
+    def bump_comment_count(post: dict[str, Any]) -> None:
+        post["commentCount"] = int(post.get("commentCount") or 0) + 1
+
+    get_feed_cache().update_post(post_id, bump_comment_count)
+
     return PostCommentOut(
         id=comment_id,
         user=PostUserOut(uid=uid, name=str(doc["user"]["name"]), avatarUrl=str(doc["user"]["avatarUrl"])),
@@ -929,61 +1726,403 @@ def add_comment(
     )
 
 
+_reaction_counters = CounterBuffer("reactions", get_firestore, counter_flush_interval())
+_member_counters = CounterBuffer("members", get_firestore, counter_flush_interval())
+
+
+@app.on_event("startup")
+def _start_counter_flushers() -> None:
+    _reaction_counters.start()
+    _member_counters.start()
+
+
+@app.on_event("shutdown")
+def _stop_counter_flushers() -> None:
+    _reaction_counters.stop()
+    _member_counters.stop()
+
+
+@async_transactional
+async def _swap_user_reaction(transaction: Any, post_ref: Any, reaction_ref: Any, uid: str, emoji: str | None):
+    """Set (or clear) a user's reaction doc; returns (post doc, previous emoji)."""
+
+    snaps = {snap.reference.path: snap async for snap in await transaction.get_all([post_ref, reaction_ref])}
+    post_snap = snaps.get(post_ref.path)
+    if post_snap is None or not post_snap.exists:
+        raise HTTPException(status_code=404, detail="Post not found")
+    reaction_snap = snaps.get(reaction_ref.path)
+    previous = None
+    if reaction_snap is not None and reaction_snap.exists:
+        previous = (reaction_snap.to_dict() or {}).get("emoji") or None
+
+    if emoji is None:
+        if previous is not None:
+            transaction.delete(reaction_ref)
+    elif emoji != previous:
+        transaction.set(
+            reaction_ref,
+            {"uid": uid, "emoji": emoji, "updatedAt": datetime.datetime.utcnow()},
+        )
+    return post_snap.to_dict() or {}, previous
+
+
+async def _set_reaction(post_id: str, uid: str, emoji: str | None) -> PostReactionOut:
+    fs = get_async_firestore()
+    post_ref = fs.collection(FIRESTORE_COLLECTION_POSTS).document(post_id)
+    reaction_ref = post_ref.collection(FIRESTORE_SUBCOLLECTION_REACTIONS).document(uid)
+    post_doc, previous = await _swap_user_reaction(fs.transaction(), post_ref, reaction_ref, uid, emoji)
+
+    # Totals go through the write-behind buffer so a popular post doesn't take
+    # one Firestore write per reaction.
+    deltas: dict[str, int] = {}
+    if previous != emoji:
+        if previous is not None:
+            deltas[previous] = deltas.get(previous, 0) - 1
+        if emoji is not None:
+            deltas[emoji] = deltas.get(emoji, 0) + 1
+    for key, delta in deltas.items():
+        _reaction_counters.add(post_ref.path, ("reactions", key), delta)
+
+    if deltas:
+
+        def apply_deltas(post: dict[str, Any]) -> None:
+            counts = dict(post.get("reactions") or {})
+            for key, delta in deltas.items():
+                counts[key] = int(counts.get(key) or 0) + delta
+            post["reactions"] = _positive_counts(counts)
+
+        get_feed_cache().update_post(post_id, apply_deltas)
+
+    # Persisted totals plus every delta this worker hasn't flushed yet.
+    counts = dict(post_doc.get("reactions") or {})
+    for field_path, delta in _reaction_counters.pending(post_ref.path).items():
+        if len(field_path) == 2 and field_path[0] == "reactions":
+            counts[field_path[1]] = int(counts.get(field_path[1]) or 0) + delta
+    return PostReactionOut(postId=post_id, userReaction=emoji, reactions=_positive_counts(counts))
+
+
+@app.put("/posts/{post_id}/reactions", response_model=PostReactionOut)
+async def put_reaction(post_id: str, payload: PostReactionIn, uid: str = Depends(get_current_uid)):
+    return await _set_reaction(post_id, uid, payload.emoji)
+
+
+@app.delete("/posts/{post_id}/reactions", response_model=PostReactionOut)
+async def delete_reaction(post_id: str, uid: str = Depends(get_current_uid)):
+    return await _set_reaction(post_id, uid, None)
+
+
+VOICE_REPLY_MODEL = "gpt-4o-mini"
+VOICE_SYSTEM_PROMPT = (
+    "You are SwasthAI, a community health assistant.\n"
+    "Respond in the same language as the user.\n"
+    "Use simple non-medical terms.\n"
+    "Suggest doctor consultation if symptoms are serious.\n"
+    "Do not provide a diagnosis; be conservative and safe."
+)
+EMERGENCY_REPLY = "This may be a medical emergency. Please visit the nearest hospital immediately."
+# Cached replies are only valid for the model + prompt that produced them.
+VOICE_REPLY_CACHE_NAMESPACE = (
+    VOICE_REPLY_MODEL + ":" + hashlib.sha256(VOICE_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+)
+VOICE_REPLY_EMBEDDING_MODEL = (os.getenv("REPLY_CACHE_EMBEDDING_MODEL") or "text-embedding-3-small").strip()
+
+
+def _voice_language_code(languageCode: str | None) -> str:
+    return (languageCode or os.getenv("DEFAULT_LANGUAGE_CODE", "hi-IN")).strip() or "hi-IN"
+
+
+def _voice_transcription_error(e: Exception) -> JSONResponse:
+    if isinstance(e, TranscriptionSaturated):
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Voice transcription is busy, please retry shortly"},
+            headers={"Retry-After": str(e.retry_after_seconds)},
+        )
+    if isinstance(e, RuntimeError):
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    return JSONResponse(status_code=500, content={"error": "Failed to transcribe audio"})
+
+
+def _is_emergency(text: str) -> bool:
+    return get_emergency_matcher().matches(text)
+
+
+def _voice_reply_messages(user_text: str) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": VOICE_SYSTEM_PROMPT},
+        {"role": "user", "content": user_text},
+    ]
+
+
+async def _embed_voice_question(text: str) -> list[float]:
+    response = await get_openai_client().embeddings.create(
+        model=VOICE_REPLY_EMBEDDING_MODEL,
+        input=text,
+        dimensions=256,
+    )
+    return list(response.data[0].embedding)
+
+
+_conversation_log = ConversationLog(get_firestore, FIRESTORE_COLLECTION_CONVERSATIONS, **conversation_log_settings())
+
+
+@app.on_event("startup")
+def _start_conversation_log() -> None:
+    _conversation_log.start()
+
+
+@app.on_event("shutdown")
+def _stop_conversation_log() -> None:
+    _conversation_log.stop()
+
+
+def _save_conversation(user_text: str, reply: str, language_code: str) -> None:
+    _conversation_log.append(
+        {
+            "userInput": user_text,
+            "aiReply": reply,
+            "languageCode": language_code,
+            "createdAt": datetime.datetime.utcnow(),
+        }
+    )
+
+
 @app.post("/voice")
 async def voice_input(
     audio: UploadFile = File(...),
     languageCode: str | None = Form(default=None),
 ):
     # Step 1: Speech to Text
-    language_code = (languageCode or os.getenv("DEFAULT_LANGUAGE_CODE", "hi-IN")).strip() or "hi-IN"
+    language_code = _voice_language_code(languageCode)
     try:
-        user_text = transcribe_audio(audio.file, language_code=language_code)
-    except RuntimeError as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
-    except Exception:
-        return JSONResponse(status_code=500, content={"error": "Failed to transcribe audio"})
+        user_text = await transcribe_audio(audio.file, language_code=language_code)
+    except Exception as e:
+        return _voice_transcription_error(e)
 
     # Step 2: Emergency Detection
-    lowered = user_text.lower()
-    if any(word in lowered for word in EMERGENCY_KEYWORDS):
-        reply = "This may be a medical emergency. Please visit the nearest hospital immediately."
+    if _is_emergency(user_text):
+        reply = EMERGENCY_REPLY
     else:
         # OpenAI is optional. If it's not configured, the endpoint still returns
         # the transcription so the frontend can route the text to another model.
         if not os.getenv("OPENAI_API_KEY"):
             reply = ""
         else:
-            client = get_openai_client()
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are SwasthAI, a community health assistant.\n"
-                            "Respond in the same language as the user.\n"
-                            "Use simple non-medical terms.\n"
-                            "Suggest doctor consultation if symptoms are serious.\n"
-                            "Do not provide a diagnosis; be conservative and safe."
-                        ),
-                    },
-                    {"role": "user", "content": user_text},
-                ],
-            )
-            reply = response.choices[0].message.content or ""
-
-    # Step 3: Save to Firestore (best-effort; ignore failures)
+            reply_cache = get_reply_cache()
+            cached = await reply_cache.lookup(VOICE_REPLY_CACHE_NAMESPACE, user_text, embed=_embed_voice_question)
+            if cached.reply is not None:
+                reply = cached.reply
+            else:
+                response = await get_openai_client().chat.completions.create(
+                    model=VOICE_REPLY_MODEL,
+                    messages=_voice_reply_messages(user_text),
+                )
+                reply = response.choices[0].message.content or ""
+                reply_cache.store(cached, reply)
+
+    # Step 3: Save to Firestore (write-behind)
+    _save_conversation(user_text, reply, language_code)
+
+    return {"transcription": user_text, "reply": reply}
+
+
+def _sse_event(event: str, data: dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+@app.post("/voice/sse")
+async def voice_input_stream(
+    audio: UploadFile = File(...),
+    languageCode: str | None = Form(default=None),
+):
+    """Same flow as POST /voice, streamed as server-sent events.
+
+    Events, in order:
+    - `transcription` {"text", "languageCode"} as soon as speech-to-text finishes
+    - `token` {"text"} for each piece of the reply as the model produces it
+    - `done` {"transcription", "reply"} with the full reply, or
+      `error` {"error"} if generating the reply failed
+    Transcription failures are returned as a plain JSON error, like /voice.
+    """
+
+    language_code = _voice_language_code(languageCode)
     try:
-        fs = get_firestore()
-        fs.collection(FIRESTORE_COLLECTION_CONVERSATIONS).add(
+        user_text = await transcribe_audio(audio.file, language_code=language_code)
+    except Exception as e:
+        return _voice_transcription_error(e)
+
+    reply_parts: list[str] = []
+    completed = False
+
+    async def events():
+        nonlocal completed
+        yield _sse_event("transcription", {"text": user_text, "languageCode": language_code})
+        try:
+            if _is_emergency(user_text):
+                reply_parts.append(EMERGENCY_REPLY)
+                yield _sse_event("token", {"text": EMERGENCY_REPLY})
+            elif os.getenv("OPENAI_API_KEY"):
+                reply_cache = get_reply_cache()
+                cached = await reply_cache.lookup(VOICE_REPLY_CACHE_NAMESPACE, user_text, embed=_embed_voice_question)
+                if cached.reply is not None:
+                    reply_parts.append(cached.reply)
+                    yield _sse_event("token", {"text": cached.reply})
+                else:
+                    stream = await get_openai_client().chat.completions.create(
+                        model=VOICE_REPLY_MODEL,
+                        messages=_voice_reply_messages(user_text),
+                        stream=True,
+                    )
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            reply_parts.append(delta)
+                            yield _sse_event("token", {"text": delta})
+                    reply_cache.store(cached, "".join(reply_parts))
+        except Exception:
+            yield _sse_event("error", {"error": "Failed to generate reply"})
+            return
+        completed = True
+        yield _sse_event("done", {"transcription": user_text, "reply": "".join(reply_parts)})
+
+    def save_after_stream() -> None:
+        if completed:
+            _save_conversation(user_text, "".join(reply_parts), language_code)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(save_after_stream),
+    )
+
+
+VOICE_STREAM_MAX_SECONDS = float(os.getenv("VOICE_STREAM_MAX_SECONDS") or "60")
+VOICE_STREAM_MAX_CHUNK_BYTES = 64 * 1024
+VOICE_STREAM_SAMPLE_RATES = range(8000, 48001)
+
+
+def _voice_stream_sample_rate(value: Any) -> int | None:
+    """Client-supplied sample rate as an int, or None if it isn't a supported rate."""
+
+    if isinstance(value, bool):
+        return None
+    try:
+        rate = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return rate if rate in VOICE_STREAM_SAMPLE_RATES else None
+
+
+async def _reject_voice_stream(websocket: WebSocket, rate: Any) -> None:
+    first, last = VOICE_STREAM_SAMPLE_RATES[0], VOICE_STREAM_SAMPLE_RATES[-1]
+    await websocket.send_json(
+        {"type": "error", "error": f"Unsupported sampleRate {rate!r}; expected {first}-{last} Hz"}
+    )
+    await websocket.close(code=1003)
+
+
+@app.websocket("/voice/stream")
+async def voice_stream(websocket: WebSocket):
+    """Streaming offline transcription.
+
+    Protocol:
+    - optional first text message: {"sampleRate": 16000, "languageCode": "hi-IN"}
+    - binary messages: raw 16-bit mono little-endian PCM (a leading WAV header is accepted)
+      Decoding goes through the shared transcription pool; when it is full the
+      server sends {"type": "error", "retryAfter": seconds} and closes with 1013.
+    - text message "end" (or {"type": "end"}) to finish
+
+    The server replies with {"type": "partial", "text": ...} after each chunk and
+    {"type": "final", "text": ...} once the client ends the stream.
+    """
+
+    await websocket.accept()
+    _ensure_backend_env_loaded()
+
+    sample_rate = 16000
+    language_code = os.getenv("DEFAULT_LANGUAGE_CODE", "hi-IN")
+    pool = get_transcription_pool()
+    stream: VoskStream | None = None
+    first_binary = True
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message.get("type") == "websocket.disconnect":
+                return
+
+            text = message.get("text")
+            if text is not None:
+                try:
+                    control = json.loads(text)
+                except ValueError:
+                    control = {"type": text.strip().lower()}
+                if not isinstance(control, dict):
+                    control = {}
+                if control.get("type") == "end":
+                    break
+                if stream is None:
+                    if control.get("sampleRate") is not None:
+                        rate = _voice_stream_sample_rate(control.get("sampleRate"))
+                        if rate is None:
+                            await _reject_voice_stream(websocket, control.get("sampleRate"))
+                            return
+                        sample_rate = rate
+                    language_code = str(control.get("languageCode") or language_code).strip() or language_code
+                continue
+
+            chunk = message.get("bytes") or b""
+            if not chunk:
+                continue
+            if first_binary and chunk.startswith(b"RIFF"):
+                # Accept a WAV header on the first chunk; take its sample rate and skip it.
+                try:
+                    header_rate, chunk = split_wav_header(chunk)
+                except RuntimeError as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+                    await websocket.close(code=1003)
+                    return
+                rate = _voice_stream_sample_rate(header_rate)
+                if rate is None:
+                    await _reject_voice_stream(websocket, header_rate)
+                    return
+                sample_rate = rate
+            first_binary = False
+            if not chunk:
+                continue
+
+            if stream is None:
+                try:
+                    model_paths = resolve_vosk_model_paths(language_code)
+                    stream = await pool.run(VoskStream, model_paths, sample_rate)
+                except RuntimeError as e:
+                    await websocket.send_json({"type": "error", "error": str(e)})
+                    await websocket.close(code=1011)
+                    return
+
+            for start in range(0, len(chunk), VOICE_STREAM_MAX_CHUNK_BYTES):
+                partial = await pool.run(stream.accept, chunk[start : start + VOICE_STREAM_MAX_CHUNK_BYTES])
+            await websocket.send_json({"type": "partial", "text": partial})
+
+            if stream.seconds_received > VOICE_STREAM_MAX_SECONDS:
+                break
+
+        final_text = await pool.run(stream.finish) if stream is not None else ""
+        await websocket.send_json({"type": "final", "text": final_text})
+        await websocket.close()
+    except TranscriptionSaturated as e:
+        # Same bound as the upload routes; 1013 is "try again later".
+        await websocket.send_json(
             {
-                "userInput": user_text,
-                "aiReply": reply,
-                "languageCode": language_code,
-                "createdAt": datetime.datetime.utcnow(),
+                "type": "error",
+                "error": "Voice transcription is busy, please retry shortly",
+                "retryAfter": e.retry_after_seconds,
             }
         )
-    except Exception:
-        pass
-
-    return {"transcription": user_text, "reply": reply}
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        return
+    finally:
+        if stream is not None:
+            stream.close()
@@ -0,0 +1,189 @@
+"""Read-through cache for `users/{uid}` profile docs.
+
+Two tiers:
+- an in-process TTL+LRU cache (PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS)
+- optionally a SQLite file shared by all uvicorn workers on the same host
+  (PROFILE_CACHE_SQLITE_PATH, PROFILE_CACHE_SHARED_TTL_SECONDS)
+
+Writes go through both tiers. Invalidation removes the entry from the local
+tier and the shared file; other workers may keep serving their local copy
+until its (short) TTL runs out.
+
+Async routes use `aget`/`aput`, which answer local hits inline and run the
+SQLite tier (which can block for up to its 1 s busy timeout) in a thread.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from ttl_cache import TTLCache
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+class _SqliteProfileStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=1.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles (uid TEXT PRIMARY KEY, doc TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, uid: str) -> tuple[float, dict[str, Any]] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT doc, expires_at FROM profiles WHERE uid = ?", (uid,)).fetchone()
+        if row is None:
+            return None
+        doc_json, expires_at = row
+        if float(expires_at) <= time.time():
+            return None
+        try:
+            doc = json.loads(doc_json)
+        except ValueError:
+            return None
+        return float(expires_at), doc
+
+    def set(self, uid: str, doc: dict[str, Any], expires_at: float) -> None:
+        payload = json.dumps(doc, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (uid, doc, expires_at) VALUES (?, ?, ?)",
+                (uid, payload, expires_at),
+            )
+
+    def delete(self, uid: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM profiles WHERE uid = ?", (uid,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM profiles")
+
+
+class ProfileCache:
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        shared_path: str | None = None,
+        shared_ttl_seconds: float | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.shared_ttl_seconds = shared_ttl_seconds if shared_ttl_seconds is not None else ttl_seconds
+        self._local: TTLCache[dict[str, Any]] = TTLCache(max_size=max_size, default_ttl_seconds=ttl_seconds)
+        self._shared: _SqliteProfileStore | None = None
+        self.shared_hits = 0
+        self.shared_errors = 0
+        if shared_path:
+            try:
+                self._shared = _SqliteProfileStore(shared_path)
+            except sqlite3.Error as e:
+                print(f"[profile-cache] shared store disabled ({shared_path}): {e}")
+
+    def get(self, uid: str) -> dict[str, Any] | None:
+        doc = self._local.get(uid)
+        if doc is not None:
+            return copy.deepcopy(doc)
+        if self._shared is None:
+            return None
+        try:
+            found = self._shared.get(uid)
+        except sqlite3.Error:
+            self.shared_errors += 1
+            return None
+        if found is None:
+            return None
+        expires_at, doc = found
+        self.shared_hits += 1
+        self._local.set(uid, doc, expires_at=min(expires_at, time.time() + self.ttl_seconds))
+        return copy.deepcopy(doc)
+
+    def put(self, uid: str, doc: dict[str, Any]) -> None:
+        stored = copy.deepcopy(doc)
+        self._local.set(uid, stored)
+        self._put_shared(uid, stored)
+
+    def _put_shared(self, uid: str, stored: dict[str, Any]) -> None:
+        if self._shared is not None:
+            try:
+                self._shared.set(uid, stored, time.time() + self.shared_ttl_seconds)
+            except sqlite3.Error:
+                self.shared_errors += 1
+
+    async def aget(self, uid: str) -> dict[str, Any] | None:
+        doc = self._local.get(uid)
+        if doc is not None:
+            return copy.deepcopy(doc)
+        if self._shared is None:
+            return None
+        return await run_in_threadpool(self.get, uid)
+
+    async def aput(self, uid: str, doc: dict[str, Any]) -> None:
+        stored = copy.deepcopy(doc)
+        self._local.set(uid, stored)
+        if self._shared is not None:
+            await run_in_threadpool(self._put_shared, uid, stored)
+
+    def invalidate(self, uid: str) -> None:
+        self._local.invalidate(uid)
+        if self._shared is not None:
+            try:
+                self._shared.delete(uid)
+            except sqlite3.Error:
+                self.shared_errors += 1
+
+    def clear(self) -> None:
+        self._local.clear()
+        if self._shared is not None:
+            try:
+                self._shared.clear()
+            except sqlite3.Error:
+                self.shared_errors += 1
+
+    def stats(self) -> dict[str, Any]:
+        out = self._local.stats()
+        out["ttlSeconds"] = self.ttl_seconds
+        out["shared"] = {
+            "enabled": self._shared is not None,
+            "path": self._shared.path if self._shared is not None else None,
+            "hits": self.shared_hits,
+            "errors": self.shared_errors,
+        }
+        return out
+
+
+_profile_cache: ProfileCache | None = None
+
+
+def get_profile_cache() -> ProfileCache:
+    global _profile_cache
+    if _profile_cache is None:
+        enabled = (os.getenv("PROFILE_CACHE") or "1").strip().lower() not in {"0", "false", "no", "off"}
+        _profile_cache = ProfileCache(
+            max_size=_env_int("PROFILE_CACHE_SIZE", 10000) if enabled else 0,
+            ttl_seconds=_env_float("PROFILE_CACHE_TTL_SECONDS", 60.0),
+            shared_path=((os.getenv("PROFILE_CACHE_SQLITE_PATH") or "").strip() or None) if enabled else None,
+            shared_ttl_seconds=_env_float("PROFILE_CACHE_SHARED_TTL_SECONDS", 600.0),
+        )
+    return _profile_cache
@@ -0,0 +1,182 @@
+"""Cache of voice-assistant replies for repeated questions.
+
+Lookups first try an exact match on the normalized transcript (Unicode NFKC,
+case-folded, punctuation stripped, whitespace collapsed), so "Headache
+remedy?" and "headache  remedy" share an entry. When
+REPLY_CACHE_SEMANTIC_THRESHOLD is set and the caller supplies an embedding
+function, misses fall back to a cosine-similarity scan over a small local
+index of question embeddings, which catches paraphrases and transliterations
+("sir dard ka ilaaj").
+
+The scan is pure Python (entries x embedding dimension), so `lookup` runs it
+in a threadpool rather than on the event loop.
+
+Keys include a caller-supplied namespace (model + system prompt), so prompt
+changes never serve replies written for the old prompt. Callers must not look
+up or store emergency text; those requests get the fixed emergency reply.
+"""
+
+import math
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from ttl_cache import TTLCache
+
+EmbedFn = Callable[[str], Awaitable[list[float]]]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def normalize_question(text: str) -> str:
+    normalized = unicodedata.normalize("NFKC", text).casefold()
+    # Keep letters, digits and combining marks (Devanagari vowel signs are marks).
+    kept = "".join(ch if unicodedata.category(ch)[0] in "LNM" else " " for ch in normalized)
+    return " ".join(kept.split())
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+
+@dataclass
+class ReplyLookup:
+    key: str
+    cacheable: bool = True
+    reply: str | None = None
+    embedding: list[float] | None = None
+    similarity: float | None = None
+
+
+class ReplyCache:
+    def __init__(self, max_size: int, ttl_seconds: float, semantic_threshold: float | None = None):
+        self.max_size = max(int(max_size), 0)
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._replies: TTLCache[str] = TTLCache(max_size=self.max_size, default_ttl_seconds=ttl_seconds)
+        self._index: "OrderedDict[str, list[float]]" = OrderedDict()
+        self._index_lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.embed_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _nearest(self, namespace: str, embedding: list[float]) -> tuple[str, float] | None:
+        prefix = namespace + "\n"
+        with self._index_lock:
+            entries = [(key, vector) for key, vector in self._index.items() if key.startswith(prefix)]
+        best: tuple[str, float] | None = None
+        for key, vector in entries:
+            score = sum(a * b for a, b in zip(embedding, vector))
+            if best is None or score > best[1]:
+                best = (key, score)
+        return best
+
+    async def lookup(self, namespace: str, text: str, embed: EmbedFn | None = None) -> ReplyLookup:
+        normalized = normalize_question(text)
+        lookup = ReplyLookup(key=f"{namespace}\n{normalized}", cacheable=self.enabled and bool(normalized))
+        if not lookup.cacheable:
+            return lookup
+        reply = self._replies.get(lookup.key)
+        if reply is not None:
+            self.exact_hits += 1
+            lookup.reply = reply
+            return lookup
+
+        if self.semantic_threshold is not None and embed is not None:
+            try:
+                lookup.embedding = await run_in_threadpool(_unit, await embed(text))
+            except Exception as e:
+                self.embed_errors += 1
+                print(f"[reply-cache] embedding failed: {e}")
+            if lookup.embedding is not None:
+                nearest = await run_in_threadpool(self._nearest, namespace, lookup.embedding)
+                if nearest is not None and nearest[1] >= self.semantic_threshold:
+                    key, similarity = nearest
+                    reply = self._replies.get(key)
+                    if reply is None:
+                        # Expired or evicted from the reply cache.
+                        with self._index_lock:
+                            self._index.pop(key, None)
+                    else:
+                        self.semantic_hits += 1
+                        lookup.reply = reply
+                        lookup.similarity = similarity
+                        return lookup
+
+        self.misses += 1
+        return lookup
+
+    def store(self, lookup: ReplyLookup, reply: str) -> None:
+        if not reply or not lookup.cacheable:
+            return
+        self._replies.set(lookup.key, reply)
+        if lookup.embedding is not None:
+            with self._index_lock:
+                self._index[lookup.key] = lookup.embedding
+                self._index.move_to_end(lookup.key)
+                while len(self._index) > self.max_size:
+                    self._index.popitem(last=False)
+
+    def clear(self) -> None:
+        self._replies.clear()
+        with self._index_lock:
+            self._index.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        with self._index_lock:
+            indexed = len(self._index)
+        return {
+            "exactHits": self.exact_hits,
+            "semanticHits": self.semantic_hits,
+            "misses": self.misses,
+            "hitRate": ((self.exact_hits + self.semantic_hits) / lookups) if lookups else 0.0,
+            "semanticThreshold": self.semantic_threshold,
+            "indexedEmbeddings": indexed,
+            "embedErrors": self.embed_errors,
+            "ttlSeconds": self.ttl_seconds,
+            "replies": self._replies.stats(),
+        }
+
+
+_reply_cache: ReplyCache | None = None
+
+
+def get_reply_cache() -> ReplyCache:
+    global _reply_cache
+    if _reply_cache is None:
+        enabled = (os.getenv("REPLY_CACHE") or "1").strip().lower() not in {"0", "false", "no", "off"}
+        threshold_raw = (os.getenv("REPLY_CACHE_SEMANTIC_THRESHOLD") or "").strip()
+        try:
+            threshold = float(threshold_raw) if threshold_raw else None
+        except ValueError:
+            threshold = None
+        _reply_cache = ReplyCache(
+            max_size=_env_int("REPLY_CACHE_SIZE", 1000) if enabled else 0,
+            ttl_seconds=_env_float("REPLY_CACHE_TTL_SECONDS", 86400.0),
+            semantic_threshold=threshold,
+        )
+    return _reply_cache
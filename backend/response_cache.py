@@ -0,0 +1,94 @@
+"""Pre-encoded JSON response bodies with content ETags.
+
+Hot list endpoints build plain dicts, encode them once per data version and
+reuse the bytes until that version changes. Returning a raw `Response` skips
+FastAPI's second `response_model` validation and its default JSON encoder.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+from fastapi import Response
+
+from ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class EncodedJson:
+    body: bytes
+    etag: str
+
+
+def encode_json(payload: Any) -> EncodedJson:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # Content hash (not a per-process counter) so every worker agrees on the tag.
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    return EncodedJson(body=body, etag=etag)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def json_response(encoded: EncodedJson, if_none_match: str | None = None) -> Response:
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Versioned cache of encoded bodies; callers include the data version in the key."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self._cache: TTLCache[EncodedJson] = TTLCache(max_size=max_size, default_ttl_seconds=ttl_seconds)
+
+    def get(self, key: Hashable) -> EncodedJson | None:
+        return self._cache.get(key)
+
+    def put(self, key: Hashable, encoded: EncodedJson) -> None:
+        self._cache.set(key, encoded)
+
+    def get_or_encode(self, key: Hashable, build: Any) -> EncodedJson:
+        encoded = self._cache.get(key)
+        if encoded is None:
+            encoded = encode_json(build())
+            self._cache.set(key, encoded)
+        return encoded
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return self._cache.stats()
+
+
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        try:
+            size = int(os.getenv("RESPONSE_CACHE_SIZE") or "512")
+        except ValueError:
+            size = 512
+        try:
+            ttl = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS") or "15")
+        except ValueError:
+            ttl = 15.0
+        _response_cache = ResponseCache(max_size=size, ttl_seconds=ttl)
+    return _response_cache
@@ -35,6 +35,27 @@ class UserOut(BaseModel):
     doshaIsBalanced: Optional[bool] = False
 
 
+ActivityKind = Literal["task", "water", "sleep", "gym", "medication", "custom"]
+
+
+class ActivityIn(BaseModel):
+    kind: ActivityKind
+    # Glasses of water, hours of sleep or gym minutes; ignored for the other kinds.
+    amount: float = Field(default=1, gt=0, le=1440)
+    taskName: Optional[str] = Field(default=None, max_length=80)
+    # Retries with the same id are applied once.
+    clientEventId: Optional[str] = Field(default=None, min_length=1, max_length=128, pattern=r"^[A-Za-z0-9_-]+$")
+    # IANA name, e.g. "Asia/Kolkata"; defaults to the user's last timezone.
+    timezone: Optional[str] = Field(default=None, max_length=64)
+
+
+class ActivityOut(BaseModel):
+    user: UserOut
+    pointsEarned: int
+    date: str
+    duplicate: bool = False
+
+
 class AuthLoginIn(BaseModel):
     loginId: str
     password: str
@@ -97,14 +118,93 @@ class UserPatchIn(BaseModel):
     doshaIsBalanced: Optional[bool] = None
 
 
+UserDataList = Literal["challenges", "dailyVibes"]
+
+
 class UserDataOut(BaseModel):
     challenges: list[Any] = Field(default_factory=list)
     dailyVibes: list[Any] = Field(default_factory=list)
+    version: int = 0
+    updatedAt: Optional[str] = None
+    # Set when the client asked for changes since a version: the lists above
+    # then hold only upserted items and `deleted` the ids removed since then.
+    # Unset on a reply to a sinceVersion request means a full resync.
+    sinceVersion: Optional[int] = None
+    deleted: Optional[dict[str, list[str]]] = None
 
 
 class UserDataPutIn(BaseModel):
-    challenges: list[Any] = Field(default_factory=list)
+    # An omitted list is left untouched.
+    challenges: Optional[list[Any]] = None
+    dailyVibes: Optional[list[Any]] = None
+    ifUpdatedAt: Optional[str] = None
+
+
+class UserDataOpIn(BaseModel):
+    op: Literal["upsert", "delete"]
+    field: UserDataList
+    id: str = Field(min_length=1, max_length=200)
+    value: Optional[dict[str, Any]] = None
+
+
+class UserDataPatchIn(BaseModel):
+    ops: list[UserDataOpIn] = Field(min_length=1, max_length=200)
+    ifUpdatedAt: Optional[str] = None
+
+
+class UserDataPatchOut(BaseModel):
+    version: int
+    updatedAt: Optional[str] = None
+
+
+class DayActivities(BaseModel):
+    waterIntake: float = 0
+    waterGoal: float = 8
+    sleepHours: float = 0
+    gymMinutes: float = 0
+    medicationTaken: bool = False
+    tasksCompleted: int = 0
+    pointsEarned: int = 0
+    customActivities: dict[str, Any] = Field(default_factory=dict)
+
+
+class DailyHistoryIn(BaseModel):
+    points: int = 0
+    dailyPoints: int = 0
+    streak: int = 0
+    totalTasksCompleted: int = 0
+    activities: DayActivities = Field(default_factory=DayActivities)
     dailyVibes: list[Any] = Field(default_factory=list)
+    challenges: list[Any] = Field(default_factory=list)
+    resetAt: Optional[str] = None
+
+
+class DailyHistoryNotesIn(BaseModel):
+    # Only what the server does not score; points, streak and activity counters
+    # come from POST /users/me/activities. Omitted fields are left as stored.
+    waterGoal: Optional[float] = None
+    dailyVibes: Optional[list[Any]] = None
+    challenges: Optional[list[Any]] = None
+    resetAt: Optional[str] = None
+
+
+class DailyHistoryOut(DailyHistoryIn):
+    userId: str
+    date: str
+    savedAt: Optional[str] = None
+
+
+class DailyHistoryRangeOut(BaseModel):
+    days: dict[str, Optional[DailyHistoryOut]]
+
+
+class UserDataSummaryOut(BaseModel):
+    streak: int = 0
+    longestStreak: int = 0
+    lastActiveDate: Optional[str] = None
+    totals: dict[str, float] = Field(default_factory=dict)
+    recentDays: list[dict[str, Any]] = Field(default_factory=list)
+    updatedAt: Optional[str] = None
 
 
 class CommunityOut(BaseModel):
@@ -114,6 +214,41 @@ class CommunityOut(BaseModel):
     memberCount: int = 0
 
 
+class CommunityMembershipOut(BaseModel):
+    slug: str
+    uid: str
+    isMember: bool
+    memberCount: int = 0
+
+
+LeaderboardMetric = Literal["points", "streak"]
+
+
+class LeaderboardEntryOut(BaseModel):
+    rank: int
+    uid: str
+    name: str = ""
+    avatarUrl: Optional[str] = None
+    points: int = 0
+    streak: int = 0
+    score: int = 0
+
+
+class LeaderboardOut(BaseModel):
+    metric: LeaderboardMetric
+    community: Optional[str] = None
+    total: int = 0
+    items: list[LeaderboardEntryOut] = Field(default_factory=list)
+
+
+class LeaderboardMeOut(BaseModel):
+    metric: LeaderboardMetric
+    community: Optional[str] = None
+    total: int = 0
+    # None when the user is not on this board (e.g. not a community member).
+    entry: Optional[LeaderboardEntryOut] = None
+
+
 class CommunityCreateIn(BaseModel):
     slug: str
     name: str
@@ -143,6 +278,17 @@ class CommunityPostOut(BaseModel):
     reactions: dict[str, int] = Field(default_factory=dict)
     userReactions: dict[str, str] = Field(default_factory=dict)
     comments: list[PostCommentOut] = Field(default_factory=list)
+    commentCount: int = 0
+
+
+class CommunityPostPageOut(BaseModel):
+    items: list[CommunityPostOut] = Field(default_factory=list)
+    nextCursor: Optional[str] = None
+
+
+class PostCommentPageOut(BaseModel):
+    items: list[PostCommentOut] = Field(default_factory=list)
+    nextCursor: Optional[str] = None
 
 
 class CommunityPostCreateIn(BaseModel):
@@ -154,3 +300,22 @@ class CommunityPostCreateIn(BaseModel):
 
 class PostCommentCreateIn(BaseModel):
     content: str
+
+
+# Each emoji is a key of the post's `reactions` map, so only this fixed set is accepted.
+ReactionEmoji = Literal["🔥", "💪", "🧘", "❤️", "🌿", "😍", "👏", "💚", "🏃‍♀️", "✨", "😤", "🌱"]
+
+
+class PostReactionIn(BaseModel):
+    emoji: ReactionEmoji
+
+
+class PostViewerReactionsOut(BaseModel):
+    # postId -> the caller's emoji
+    reactions: dict[str, str] = Field(default_factory=dict)
+
+
+class PostReactionOut(BaseModel):
+    postId: str
+    userReaction: Optional[str] = None
+    reactions: dict[str, int] = Field(default_factory=dict)
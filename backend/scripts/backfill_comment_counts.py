@@ -0,0 +1,62 @@
+"""Backfill `commentCount` on posts created before the counter existed.
+
+Posts without the field show 0 comments in the feed until someone comments on
+them (add_comment counts them once at that point). This script sets the field
+on every such post from a `count()` aggregation of its comments subcollection,
+so older posts show the right count straight away.
+
+By default it runs in DRY RUN mode. Pass --apply to write.
+
+    python scripts/backfill_comment_counts.py --apply
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure imports work when executed from backend/scripts.
+_BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(_BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(_BACKEND_ROOT))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backfill commentCount on older posts")
+    parser.add_argument("--apply", action="store_true", help="Write the counts (otherwise dry run)")
+    args = parser.parse_args()
+
+    from google.api_core.exceptions import FailedPrecondition
+    from firebase_app import get_firestore  # type: ignore
+
+    fs = get_firestore()
+    scanned = missing = written = skipped = 0
+    for snap in fs.collection("posts").stream():
+        scanned += 1
+        if "commentCount" in (snap.to_dict() or {}):
+            continue
+        missing += 1
+        count = int(snap.reference.collection("comments").count().get()[0][0].value)
+        print(f"{snap.id}: {count} comments")
+        if not args.apply:
+            continue
+        try:
+            # Only if the post hasn't changed since it was read; a concurrent
+            # comment has already set the field in that case.
+            snap.reference.update(
+                {"commentCount": count},
+                option=fs.write_option(last_update_time=snap.update_time),
+            )
+            written += 1
+        except FailedPrecondition:
+            skipped += 1
+
+    print(f"Scanned {scanned} posts, {missing} without commentCount, {written} written, {skipped} changed meanwhile")
+    if not args.apply and missing:
+        print("Dry run complete. Re-run with --apply to write.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
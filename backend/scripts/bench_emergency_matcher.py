@@ -0,0 +1,77 @@
+"""Microbenchmark: emergency phrase matching vs. phrase count.
+
+Compares the previous check (`any(p in text.lower() for p in phrases)`) with
+the Aho-Corasick matcher for growing phrase lists. The lists are the real
+phrase file padded with synthetic phrases, and the texts are typical transcript
+lengths with no emergency phrase in them, which is the worst and most common
+case. The matcher's cost per text should stay flat as phrases grow while the
+naive scan grows linearly.
+
+    python scripts/bench_emergency_matcher.py --sizes 100 1000 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+# Ensure imports work when executed from backend/scripts.
+_BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(_BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(_BACKEND_ROOT))
+
+_TEXTS = [
+    "mujhe kal se sir dard ho raha hai aur thoda bukhar bhi hai, kya karun",
+    "मुझे दो दिन से खांसी और हल्का बुखार है, कौन सी दवा लूं",
+    "my child has a mild cough and runny nose since yesterday, what should I give",
+    "pet mein halka dard hai khana khane ke baad, kya yeh acidity hai",
+]
+
+
+def _synthetic_phrases(count: int, rng: random.Random) -> list[str]:
+    letters = string.ascii_lowercase
+    return [
+        " ".join("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(rng.randint(1, 3)))
+        for _ in range(count)
+    ]
+
+
+def _time_per_text(fn, texts: list[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - started) / (repeat * len(texts))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark emergency phrase matching")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Phrase counts to test")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the sample texts per size")
+    args = parser.parse_args()
+
+    from emergency_matcher import _DEFAULT_PHRASES_PATH, EmergencyMatcher, load_phrases  # type: ignore
+
+    rng = random.Random(7)
+    base = load_phrases(_DEFAULT_PHRASES_PATH)
+    print(f"{'phrases':>8} {'build ms':>9} {'naive us/text':>14} {'automaton us/text':>18}")
+    for size in args.sizes:
+        phrases = (base + _synthetic_phrases(max(size - len(base), 0), rng))[:size]
+        lowered_phrases = [p.lower() for p in phrases]
+
+        started = time.perf_counter()
+        matcher = EmergencyMatcher(phrases)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        naive = _time_per_text(lambda t: any(p in t.lower() for p in lowered_phrases), _TEXTS, args.repeat)
+        automaton = _time_per_text(matcher.matches, _TEXTS, args.repeat)
+        print(f"{size:>8} {build_ms:>9.1f} {naive * 1e6:>14.1f} {automaton * 1e6:>18.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+"""Evaluate the Vosk language-ID prefilter against full dual decoding.
+
+Expects a folder of labelled mono 16-bit WAV clips, one subfolder per model
+label:
+
+    clips/
+      en/*.wav
+      hi/*.wav
+
+For every clip it runs (a) the dual decode (every model over the full clip,
+best score wins) and (b) the prefilter (short prefix through every model, then
+a full decode on the chosen model only, falling back to dual decoding when no
+model clearly wins). It reports prefilter accuracy against the folder label,
+agreement with the dual-decode pick, fallback rate and process CPU time of
+both modes.
+
+    python scripts/eval_vosk_langid.py clips --en path/to/en-model --hi path/to/hi-model
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Ensure imports work when executed from backend/scripts.
+_BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(_BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(_BACKEND_ROOT))
+
+
+def _dual_pick(models: dict[str, str], pcm: bytes, sample_rate: int) -> str:
+    from voice_vosk import VoskDecode, score_vosk_result  # type: ignore
+
+    best_label = ""
+    best_score = 0.0
+    for label, path in models.items():
+        decode = VoskDecode(path, sample_rate)
+        decode.feed(pcm)
+        score = score_vosk_result(decode.finish())
+        if score > best_score:
+            best_score = score
+            best_label = label
+    return best_label
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Evaluate the Vosk language-ID prefilter")
+    parser.add_argument("clips", help="Folder with one subfolder of WAV clips per label (en/, hi/)")
+    parser.add_argument("--en", required=True, help="English Vosk model folder")
+    parser.add_argument("--hi", required=True, help="Hindi Vosk model folder")
+    parser.add_argument("--seconds", type=float, default=1.5, help="Prefix length used for language ID")
+    parser.add_argument("--margin", type=float, default=1.5, help="Required score ratio over the runner-up")
+    args = parser.parse_args()
+
+    from voice_vosk import VoskDecode, get_vosk_model, identify_language_model, read_wav_pcm  # type: ignore
+
+    models = {"en": args.en, "hi": args.hi}
+    label_by_path = {path: label for label, path in models.items()}
+    for path in models.values():
+        get_vosk_model(path)  # keep model loading out of the timings
+
+    clips = sorted(p for p in Path(args.clips).glob("*/*.wav") if p.parent.name in models)
+    if not clips:
+        print(f"No labelled WAV clips found under {args.clips} (expected en/*.wav, hi/*.wav)")
+        return 2
+
+    total = correct = agree = fallbacks = 0
+    dual_cpu = prefilter_cpu = 0.0
+
+    for clip in clips:
+        label = clip.parent.name
+        pcm, sample_rate = read_wav_pcm(clip.read_bytes())
+
+        started = time.process_time()
+        dual_label = _dual_pick(models, pcm, sample_rate)
+        dual_cpu += time.process_time() - started
+
+        started = time.process_time()
+        result = identify_language_model(list(models.values()), pcm, sample_rate, args.seconds, args.margin)
+        if result.model_path is None:
+            fallbacks += 1
+            picked = _dual_pick(models, pcm, sample_rate)
+        else:
+            picked = label_by_path[result.model_path]
+            decode = VoskDecode(result.model_path, sample_rate)
+            decode.feed(pcm)
+            decode.finish()
+        prefilter_cpu += time.process_time() - started
+
+        total += 1
+        correct += int(picked == label)
+        agree += int(picked == dual_label)
+        print(f"{clip.name:40} label={label} dual={dual_label or '-':3} prefilter={picked or '-':3} "
+              f"{'(fallback)' if result.model_path is None else ''}")
+
+    print("\n=== Summary ===")
+    print(f"Clips:                  {total}")
+    print(f"Prefilter accuracy:     {correct / total:.1%} (vs folder label)")
+    print(f"Agreement with dual:    {agree / total:.1%}")
+    print(f"Fallback to dual:       {fallbacks / total:.1%}")
+    print(f"CPU dual decode:        {dual_cpu:.2f}s")
+    print(f"CPU prefilter:          {prefilter_cpu:.2f}s ({(1 - prefilter_cpu / dual_cpu) if dual_cpu else 0:.1%} saved)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+"""Local stand-in for the AssemblyAI endpoints used by the voice route.
+
+Implements /v2/upload, /v2/transcript and /v2/transcript/{id}. A transcript
+stays "processing" for --delay seconds, then completes with the upload size in
+its text; when the request carries a webhook_url the server calls it on
+completion. Point the backend at it with:
+
+    python scripts/fake_assemblyai.py --port 8765
+    ASSEMBLYAI_API_KEY=test ASSEMBLYAI_BASE_URL=http://127.0.0.1:8765 uvicorn main:app
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Any
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+
+def build_app(delay_seconds: float) -> FastAPI:
+    app = FastAPI()
+    uploads: dict[str, int] = {}
+    transcripts: dict[str, dict[str, Any]] = {}
+
+    async def _complete_later(transcript_id: str) -> None:
+        await asyncio.sleep(delay_seconds)
+        transcript = transcripts[transcript_id]
+        transcript["status"] = "completed"
+        webhook_url = transcript.get("webhook_url")
+        if webhook_url:
+            headers = {}
+            if transcript.get("webhook_auth_header_name"):
+                headers[transcript["webhook_auth_header_name"]] = transcript.get("webhook_auth_header_value") or ""
+            async with httpx.AsyncClient() as client:
+                await client.post(webhook_url, json={"transcript_id": transcript_id, "status": "completed"}, headers=headers)
+
+    @app.post("/v2/upload")
+    async def upload(request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        upload_id = uuid.uuid4().hex
+        uploads[upload_id] = size
+        return {"upload_url": f"fake://{upload_id}"}
+
+    @app.post("/v2/transcript")
+    async def create_transcript(body: dict[str, Any]):
+        upload_id = str(body.get("audio_url") or "").removeprefix("fake://")
+        if upload_id not in uploads:
+            raise HTTPException(status_code=400, detail="Unknown audio_url")
+        transcript_id = uuid.uuid4().hex
+        transcripts[transcript_id] = {
+            **body,
+            "id": transcript_id,
+            "status": "processing",
+            "text": f"fake transcript of {uploads[upload_id]} bytes",
+            "created": time.time(),
+        }
+        asyncio.create_task(_complete_later(transcript_id))
+        return {"id": transcript_id, "status": "queued"}
+
+    @app.get("/v2/transcript/{transcript_id}")
+    async def get_transcript(transcript_id: str):
+        transcript = transcripts.get(transcript_id)
+        if transcript is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        out = {"id": transcript_id, "status": transcript["status"]}
+        if transcript["status"] == "completed":
+            out["text"] = transcript["text"]
+        return out
+
+    return app
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a fake AssemblyAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=2.0, help="Seconds before a transcript completes")
+    args = parser.parse_args()
+
+    uvicorn.run(build_app(args.delay), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,108 @@
+"""Concurrency load test for the backend's hot routes.
+
+Fires a fixed number of requests at each concurrency level and reports
+throughput and latency percentiles. Point it at two running backends (e.g. the
+previous sync build on :8010 and the current async build on :8011) to compare
+where each one's throughput stops scaling with concurrency:
+
+    python scripts/load_test.py --url http://127.0.0.1:8010 --url http://127.0.0.1:8011 \
+        --path /posts --path /communities --concurrency 10,40,80,160 --token "$ID_TOKEN"
+
+Authenticated paths (/auth/me, /user-data/me) need --token (a Firebase ID token).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+async def _run_level(client, url: str, concurrency: int, total: int, headers: dict) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = total
+    lock = asyncio.Lock()
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while True:
+            async with lock:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+            start = time.perf_counter()
+            try:
+                resp = await client.get(url, headers=headers)
+                if resp.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+    }
+
+
+async def _main_async(args: argparse.Namespace) -> int:
+    try:
+        import httpx
+    except Exception as exc:
+        print(f"ERROR: httpx is required ({exc})")
+        return 2
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    headers = {"authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for base in args.url:
+            for path in args.path:
+                url = base.rstrip("/") + path
+                print(f"\n=== {url} ===")
+                print(f"{'conc':>6} {'req':>6} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+                for level in levels:
+                    r = await _run_level(client, url, level, max(args.requests, level), headers)
+                    print(
+                        f"{r['concurrency']:>6} {r['requests']:>6} {r['errors']:>5} {r['rps']:>9.1f} "
+                        f"{r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['mean_ms']:>9.1f}"
+                    )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrency load test for SwasthAI backend routes")
+    parser.add_argument("--url", action="append", required=True, help="Backend base URL (repeat to compare)")
+    parser.add_argument("--path", action="append", default=None, help="Route to hit (repeatable, default /posts)")
+    parser.add_argument("--concurrency", default="10,40,80,160", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--token", default="", help="Firebase ID token for authenticated routes")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+    if not args.path:
+        args.path = ["/posts"]
+    return asyncio.run(_main_async(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+"""Reconcile `memberCount` on communities with their membership docs.
+
+Joins and leaves update `memberCount` through each worker's write-behind
+buffer, so a worker that dies before flushing loses its deltas and the stored
+count drifts from `communities/{slug}/members`. This script compares every
+community's count with a `count()` aggregation of its members.
+
+Deltas still sitting in a live worker's buffer show up as drift too, so a
+community is only corrected when the difference is the same on a second read
+taken --settle seconds later (well past COUNTER_FLUSH_INTERVAL_SECONDS). The
+fix is written as an `Increment` of the difference, which composes with
+increments that land in between instead of overwriting them.
+
+By default it runs in DRY RUN mode. Pass --apply to write.
+
+    python scripts/reconcile_member_counts.py --apply
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Ensure imports work when executed from backend/scripts.
+_BACKEND_ROOT = Path(__file__).resolve().parents[1]
+if str(_BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(_BACKEND_ROOT))
+
+
+def _drift(ref) -> tuple[int, int]:
+    """(stored memberCount, member docs) for one community."""
+
+    stored = int((ref.get().to_dict() or {}).get("memberCount") or 0)
+    actual = int(ref.collection("members").count().get()[0][0].value)
+    return stored, actual
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reconcile community memberCount with membership docs")
+    parser.add_argument("--apply", action="store_true", help="Write corrections (otherwise dry run)")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=10.0,
+        help="Seconds between the two reads that must agree before correcting (default: 10)",
+    )
+    args = parser.parse_args()
+
+    from google.cloud.firestore_v1 import Increment
+    from firebase_app import get_firestore  # type: ignore
+
+    fs = get_firestore()
+    drifted: dict[str, tuple[object, int]] = {}
+    scanned = 0
+    for snap in fs.collection("communities").stream():
+        scanned += 1
+        stored, actual = _drift(snap.reference)
+        if stored != actual:
+            drifted[snap.id] = (snap.reference, stored - actual)
+
+    if drifted:
+        time.sleep(max(args.settle, 0.0))
+
+    corrected = unsettled = 0
+    for slug, (ref, first_diff) in drifted.items():
+        stored, actual = _drift(ref)
+        diff = stored - actual
+        if diff == 0:
+            continue
+        if diff != first_diff:
+            unsettled += 1
+            print(f"{slug}: memberCount moving ({first_diff:+d} then {diff:+d}); skipped, re-run later")
+            continue
+        print(f"{slug}: memberCount {stored}, {actual} members ({diff:+d})")
+        if not args.apply:
+            continue
+        ref.update({"memberCount": Increment(-diff)})
+        corrected += 1
+
+    print(f"Scanned {scanned} communities, {len(drifted)} drifted, {corrected} corrected, {unsettled} still moving")
+    if not args.apply and drifted:
+        print("Dry run complete. Re-run with --apply to write.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+"""Content-addressed cache of finished transcriptions.
+
+Mobile clients retry `/voice` uploads and the test harness replays the same
+clips, so identical audio is common. Entries are keyed by the SHA-256 of the
+audio bytes plus the language code and a scope string naming the engine and
+model set, so changing models never serves a stale transcript.
+
+Two tiers, like the profile cache:
+- an in-process TTL+LRU cache (TRANSCRIPT_CACHE_SIZE, TRANSCRIPT_CACHE_TTL_SECONDS)
+- optionally a SQLite file that survives restarts and is shared by workers on
+  the same host (TRANSCRIPT_CACHE_SQLITE_PATH, capped at
+  TRANSCRIPT_CACHE_SQLITE_MAX_ROWS)
+
+Concurrent requests for the same key share one transcription. It runs as its
+own task, so a client that disconnects doesn't cancel it for the others, and
+its result is still cached. Hashing and SQLite I/O run in the threadpool.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, BinaryIO, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from ttl_cache import TTLCache
+
+_HASH_CHUNK_BYTES = 256 * 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def transcript_cache_key(audio_file: BinaryIO, language_code: str, scope: str) -> str:
+    """Hash the whole file (then rewind it) together with language and engine scope."""
+
+    digest = hashlib.sha256()
+    while True:
+        chunk = audio_file.read(_HASH_CHUNK_BYTES)
+        if not chunk:
+            break
+        digest.update(chunk)
+    audio_file.seek(0)
+    return f"{digest.hexdigest()}:{language_code.strip().lower()}:{scope}"
+
+
+class _SqliteTranscriptStore:
+    def __init__(self, path: str, max_rows: int):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=1.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts (key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS transcripts_created_at ON transcripts (created_at)")
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM transcripts WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key: str, text: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM transcripts WHERE key IN "
+                "(SELECT key FROM transcripts ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM transcripts")
+
+
+class TranscriptCache:
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        shared_path: str | None = None,
+        shared_max_rows: int = 10000,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self._local: TTLCache[str] = TTLCache(max_size=max_size, default_ttl_seconds=ttl_seconds)
+        self._shared: _SqliteTranscriptStore | None = None
+        self._inflight: dict[str, asyncio.Task[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+        self.coalesced = 0
+        if shared_path and shared_max_rows > 0:
+            try:
+                self._shared = _SqliteTranscriptStore(shared_path, shared_max_rows)
+            except sqlite3.Error as e:
+                print(f"[transcript-cache] shared store disabled ({shared_path}): {e}")
+
+    @property
+    def enabled(self) -> bool:
+        return self._local.max_size > 0 or self._shared is not None
+
+    def get(self, key: str) -> str | None:
+        text = self._local.get(key)
+        if text is None and self._shared is not None:
+            try:
+                text = self._shared.get(key)
+            except sqlite3.Error:
+                self.shared_errors += 1
+            if text is not None:
+                self.shared_hits += 1
+                self._local.set(key, text)
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        # Empty results may come from a bad upload; let a retry decode again.
+        if not text:
+            return
+        self._local.set(key, text)
+        if self._shared is not None:
+            try:
+                self._shared.set(key, text)
+            except sqlite3.Error:
+                self.shared_errors += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        pending = self._inflight.get(key)
+        if pending is None:
+            cached = await run_in_threadpool(self.get, key)
+            if cached is not None:
+                return cached
+            # Re-check: another request may have started while we read SQLite.
+            pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        async def run() -> str:
+            try:
+                text = await compute()
+            finally:
+                self._inflight.pop(key, None)
+            await run_in_threadpool(self.put, key, text)
+            return text
+
+        task = asyncio.ensure_future(run())
+        # Mark the exception retrieved when every waiter has gone away.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._local.clear()
+        if self._shared is not None:
+            try:
+                self._shared.clear()
+            except sqlite3.Error:
+                self.shared_errors += 1
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        shared_rows = None
+        if self._shared is not None:
+            try:
+                shared_rows = self._shared.count()
+            except sqlite3.Error:
+                self.shared_errors += 1
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": (self.hits / lookups) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "ttlSeconds": self.ttl_seconds,
+            "local": self._local.stats(),
+            "shared": {
+                "enabled": self._shared is not None,
+                "path": self._shared.path if self._shared is not None else None,
+                "maxRows": self._shared.max_rows if self._shared is not None else None,
+                "rows": shared_rows,
+                "hits": self.shared_hits,
+                "errors": self.shared_errors,
+            },
+        }
+
+
+_transcript_cache: TranscriptCache | None = None
+
+
+def get_transcript_cache() -> TranscriptCache:
+    global _transcript_cache
+    if _transcript_cache is None:
+        enabled = (os.getenv("TRANSCRIPT_CACHE") or "1").strip().lower() not in {"0", "false", "no", "off"}
+        _transcript_cache = TranscriptCache(
+            max_size=_env_int("TRANSCRIPT_CACHE_SIZE", 1000) if enabled else 0,
+            ttl_seconds=_env_float("TRANSCRIPT_CACHE_TTL_SECONDS", 86400.0),
+            shared_path=((os.getenv("TRANSCRIPT_CACHE_SQLITE_PATH") or "").strip() or None) if enabled else None,
+            shared_max_rows=_env_int("TRANSCRIPT_CACHE_SQLITE_MAX_ROWS", 10000),
+        )
+    return _transcript_cache
@@ -0,0 +1,120 @@
+"""Bounded executor for blocking speech-to-text work.
+
+`voice_input` is an async route, so running a Vosk decode inline would stall
+the event loop. Decodes go to a dedicated thread pool instead (Kaldi releases
+the GIL, and preloaded models/recognizer pools live in this process, which a
+process pool would have to duplicate). At most
+TRANSCRIBE_MAX_WORKERS jobs run at once and TRANSCRIBE_MAX_QUEUE more may
+wait; anything beyond that is rejected immediately with a Retry-After hint.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class TranscriptionSaturated(Exception):
+    def __init__(self, retry_after_seconds: int):
+        super().__init__("Transcription capacity exhausted")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class TranscriptionPool:
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max(int(max_workers), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcribe")
+        self._lock = threading.Lock()
+        self.running = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._decode_seconds: deque[float] = deque(maxlen=200)
+        self._wait_seconds: deque[float] = deque(maxlen=200)
+
+    def _avg_decode_seconds(self) -> float:
+        return (sum(self._decode_seconds) / len(self._decode_seconds)) if self._decode_seconds else 2.0
+
+    def _retry_after(self) -> int:
+        backlog = self.running + self.queued + 1
+        return max(1, math.ceil(self._avg_decode_seconds() * backlog / self.max_workers))
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            if self.running + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise TranscriptionSaturated(self._retry_after())
+            self.queued += 1
+        submitted_at = time.perf_counter()
+
+        def job() -> Any:
+            started_at = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self._wait_seconds.append(started_at - submitted_at)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self._decode_seconds.append(time.perf_counter() - started_at)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+
+        try:
+            future = self._executor.submit(job)
+        except RuntimeError:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            decode = sorted(self._decode_seconds)
+            wait = list(self._wait_seconds)
+            return {
+                "maxWorkers": self.max_workers,
+                "maxQueue": self.max_queue,
+                "running": self.running,
+                "queueDepth": self.queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "decodeSecondsAvg": (sum(decode) / len(decode)) if decode else 0.0,
+                "decodeSecondsP95": decode[min(len(decode) - 1, int(0.95 * len(decode)))] if decode else 0.0,
+                "queueWaitSecondsAvg": (sum(wait) / len(wait)) if wait else 0.0,
+            }
+
+
+_transcription_pool: TranscriptionPool | None = None
+
+
+def get_transcription_pool() -> TranscriptionPool:
+    global _transcription_pool
+    if _transcription_pool is None:
+        try:
+            workers = int(os.getenv("TRANSCRIBE_MAX_WORKERS") or "2")
+        except ValueError:
+            workers = 2
+        try:
+            queue = int(os.getenv("TRANSCRIBE_MAX_QUEUE") or "8")
+        except ValueError:
+            queue = 8
+        _transcription_pool = TranscriptionPool(max_workers=workers, max_queue=queue)
+    return _transcription_pool
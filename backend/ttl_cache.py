@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, TypeVar
+
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """Small thread-safe LRU cache with per-entry expiry.
+
+    Entries are stored with an absolute expiry timestamp (``time.time()`` based)
+    so callers can tie them to something meaningful, e.g. a token's ``exp``.
+    When the cache is full the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int, default_ttl_seconds: float | None = None):
+        self.max_size = max(int(max_size), 0)
+        self.default_ttl_seconds = default_ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> V | Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry  # type: ignore[misc]
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, expires_at: float | None = None) -> None:
+        if self.max_size <= 0:
+            return
+        if expires_at is None:
+            if self.default_ttl_seconds is None:
+                raise ValueError("expires_at is required when the cache has no default TTL")
+            expires_at = time.time() + self.default_ttl_seconds
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxSize": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,113 @@
+"""Per-day history docs and the rolling summary for the dashboard.
+
+History lives in `userData/{uid}/days/{YYYY-MM-DD}`, one small doc per day,
+instead of growing the working-set doc. `userData/{uid}/summary/current`
+keeps what the dashboard shows at a glance (streak, lifetime totals, the last
+7 days), so a dashboard load reads the summary plus only the days on screen.
+
+The summary is maintained incrementally: saving a day applies the difference
+between the day's previous and new metrics, so it never rescans history.
+"""
+
+import datetime
+from typing import Any
+
+DAY_METRICS = ("tasksCompleted", "pointsEarned", "waterIntake", "sleepHours", "gymMinutes")
+SUMMARY_RECENT_DAYS = 7
+MAX_RANGE_DAYS = 62
+
+
+def parse_day(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+def day_range(start: str, end: str) -> list[str]:
+    first, last = parse_day(start), parse_day(end)
+    if last < first:
+        raise ValueError("'to' must not be before 'from'")
+    count = (last - first).days + 1
+    if count > MAX_RANGE_DAYS:
+        raise ValueError(f"Date range is limited to {MAX_RANGE_DAYS} days")
+    return [(first + datetime.timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def day_metrics(day: dict[str, Any] | None) -> dict[str, float]:
+    activities = (day or {}).get("activities") or {}
+    out: dict[str, float] = {}
+    for name in DAY_METRICS:
+        try:
+            out[name] = float(activities.get(name) or 0)
+        except (TypeError, ValueError):
+            out[name] = 0.0
+    return out
+
+
+def is_active_day(metrics: dict[str, float]) -> bool:
+    return metrics["tasksCompleted"] > 0 or metrics["pointsEarned"] > 0
+
+
+def empty_summary() -> dict[str, Any]:
+    return {
+        "streak": 0,
+        "longestStreak": 0,
+        "lastActiveDate": None,
+        "totals": {"days": 0, **{name: 0 for name in DAY_METRICS}},
+        "recentDays": [],
+        "updatedAt": None,
+    }
+
+
+def apply_day_to_summary(
+    summary: dict[str, Any] | None,
+    date: str,
+    previous_day: dict[str, Any] | None,
+    day: dict[str, Any],
+    updated_at: str,
+) -> dict[str, Any]:
+    """Return the summary after `date` changed from `previous_day` to `day`."""
+
+    out = empty_summary()
+    out.update(summary or {})
+    totals = {**empty_summary()["totals"], **(out.get("totals") or {})}
+    before, after = day_metrics(previous_day), day_metrics(day)
+    if previous_day is None:
+        totals["days"] += 1
+    for name in DAY_METRICS:
+        totals[name] = totals[name] + after[name] - before[name]
+    out["totals"] = totals
+
+    # Streaks advance on consecutive active days. Activating an older day only
+    # adjusts totals; clearing a day inside the current streak cuts it there.
+    last_active = out.get("lastActiveDate")
+    streak = int(out.get("streak") or 0)
+    recent = [entry for entry in (out.get("recentDays") or []) if entry.get("date") != date]
+    if is_active_day(after) and (last_active is None or date > last_active):
+        consecutive = last_active is not None and (parse_day(date) - parse_day(last_active)).days == 1
+        out["streak"] = streak + 1 if consecutive else 1
+        out["lastActiveDate"] = date
+        out["longestStreak"] = max(int(out.get("longestStreak") or 0), out["streak"])
+    elif is_active_day(before) and not is_active_day(after) and last_active is not None and date <= last_active:
+        offset = (parse_day(last_active) - parse_day(date)).days
+        if 0 < offset < streak:
+            out["streak"] = offset
+        elif offset == 0 and streak > 1:
+            out["streak"] = streak - 1
+            out["lastActiveDate"] = (parse_day(date) - datetime.timedelta(days=1)).isoformat()
+        elif offset == 0:
+            # The streak was this day alone; fall back to the latest earlier active day we still know.
+            earlier = [
+                entry["date"]
+                for entry in recent
+                if entry["date"] < date and is_active_day(day_metrics({"activities": entry}))
+            ]
+            out["lastActiveDate"] = max(earlier) if earlier else None
+            out["streak"] = 1 if earlier else 0
+
+    recent.append({"date": date, **after})
+    recent.sort(key=lambda entry: entry["date"], reverse=True)
+    out["recentDays"] = recent[:SUMMARY_RECENT_DAYS]
+    out["updatedAt"] = updated_at
+    return out
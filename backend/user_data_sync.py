@@ -0,0 +1,274 @@
+"""Versioned per-item storage for the `userData/{uid}` dashboard doc.
+
+Layout (legacy docs with plain `challenges` / `dailyVibes` arrays are read
+transparently and migrated on their first write):
+
+    version:   int, bumped once per accepted write
+    updatedAt: ISO timestamp of the last write (optimistic-concurrency token)
+    items:     {list: {itemId: {"value": item, "version": int}}}
+    order:     {list: [itemId, ...]}
+    deleted:   {list: {itemId: version}}   tombstones for delta readers
+    tombstonesPrunedThrough: int   highest version whose tombstone was dropped
+
+Items are stored as sent; the id is kept next to the value, never rewritten in
+it. The exception is a dict item without an id: it gets a permanent id once
+(content-derived on migration, random when a PUT adds it) written into it, so
+clients can address it and positions no longer decide identity.
+Tombstones older than TOMBSTONE_RETENTION_VERSIONS versions are dropped on
+write so the doc stays bounded; a reader behind `tombstonesPrunedThrough`
+can't be given a complete delta and gets the full lists instead.
+
+A write only touches the field paths of the items it changes, so saving one
+challenge no longer rewrites every challenge and vibe. Readers holding
+`version` N ask for changes since N and get the upserted items plus the ids
+deleted after N.
+"""
+
+import copy
+import hashlib
+import json
+import uuid
+from typing import Any
+
+from google.cloud.firestore_v1 import DELETE_FIELD
+from google.cloud.firestore_v1.field_path import FieldPath
+
+USER_DATA_LISTS = ("challenges", "dailyVibes")
+TOMBSTONE_RETENTION_VERSIONS = 200
+
+
+class UserDataConflict(Exception):
+    def __init__(self, version: int, updated_at: str | None):
+        super().__init__("userData was modified by another client")
+        self.version = version
+        self.updated_at = updated_at
+
+
+def _explicit_id(item: Any) -> str | None:
+    if isinstance(item, dict) and item.get("id") not in (None, ""):
+        return str(item["id"])
+    return None
+
+
+def _content(item: Any) -> Any:
+    return {k: v for k, v in item.items() if k != "id"} if isinstance(item, dict) else item
+
+
+def _with_id(item: Any, item_id: str) -> Any:
+    return {**item, "id": item_id} if isinstance(item, dict) else item
+
+
+def _legacy_item_id(item: Any, seen: dict[str, int]) -> str:
+    """Id for an id-less item of a legacy array; the same on every read until the doc is migrated."""
+
+    digest = hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+    seen[digest] = seen.get(digest, 0) + 1
+    return f"legacy-{digest}" if seen[digest] == 1 else f"legacy-{digest}-{seen[digest]}"
+
+
+def empty_user_data_doc(updated_at: str) -> dict[str, Any]:
+    return {
+        "version": 0,
+        "updatedAt": updated_at,
+        "items": {name: {} for name in USER_DATA_LISTS},
+        "order": {name: [] for name in USER_DATA_LISTS},
+        "deleted": {name: {} for name in USER_DATA_LISTS},
+        "tombstonesPrunedThrough": 0,
+    }
+
+
+def read_user_data_state(doc: dict[str, Any] | None) -> dict[str, Any]:
+    """Normalize a stored doc (new or legacy layout, or None) into the versioned layout."""
+
+    doc = doc or {}
+    version = int(doc.get("version") or 0)
+    state: dict[str, Any] = {
+        "version": version,
+        "updatedAt": doc.get("updatedAt"),
+        "items": {name: {} for name in USER_DATA_LISTS},
+        "order": {name: [] for name in USER_DATA_LISTS},
+        "deleted": {name: {} for name in USER_DATA_LISTS},
+        "tombstonesPrunedThrough": int(doc.get("tombstonesPrunedThrough") or 0),
+        "legacy": "items" not in doc,
+        "exists": bool(doc),
+    }
+    for name in USER_DATA_LISTS:
+        if state["legacy"]:
+            seen: dict[str, int] = {}
+            for item in doc.get(name) or []:
+                item_id = _explicit_id(item)
+                if item_id is None:
+                    item_id = _legacy_item_id(item, seen)
+                    item = _with_id(item, item_id)
+                if item_id not in state["items"][name]:
+                    state["order"][name].append(item_id)
+                state["items"][name][item_id] = {"id": item_id, "value": item, "version": version}
+        else:
+            state["items"][name] = dict((doc.get("items") or {}).get(name) or {})
+            state["deleted"][name] = dict((doc.get("deleted") or {}).get(name) or {})
+            order = [i for i in ((doc.get("order") or {}).get(name) or []) if i in state["items"][name]]
+            # Items missing from `order` (should not happen) still get returned, at the end.
+            order += [i for i in state["items"][name] if i not in set(order)]
+            state["order"][name] = order
+    return state
+
+
+def full_user_data_lists(state: dict[str, Any]) -> dict[str, list[Any]]:
+    return {name: [state["items"][name][i]["value"] for i in state["order"][name]] for name in USER_DATA_LISTS}
+
+
+def user_data_delta_available(state: dict[str, Any], since_version: int) -> bool:
+    """False when tombstones the reader hasn't seen were pruned; send the full lists then."""
+
+    return since_version >= state["tombstonesPrunedThrough"]
+
+
+def user_data_changes_since(
+    state: dict[str, Any], since_version: int
+) -> tuple[dict[str, list[Any]], dict[str, list[str]]]:
+    changed = {
+        name: [
+            state["items"][name][i]["value"]
+            for i in state["order"][name]
+            if int(state["items"][name][i].get("version") or 0) > since_version
+        ]
+        for name in USER_DATA_LISTS
+    }
+    deleted = {
+        name: [i for i, v in state["deleted"][name].items() if int(v or 0) > since_version] for name in USER_DATA_LISTS
+    }
+    return changed, deleted
+
+
+def user_data_replace_ops(state: dict[str, Any], lists: dict[str, list[Any] | None]) -> list[dict[str, Any]]:
+    """Ops that turn the stored lists into `lists` (None leaves a list untouched)."""
+
+    ops: list[dict[str, Any]] = []
+    for name in USER_DATA_LISTS:
+        items = lists.get(name)
+        if items is None:
+            continue
+        stored = state["items"][name]
+        explicit = {_explicit_id(item) for item in items} - {None}
+        # Id-less items keep the id of an equal stored item, so resending them writes nothing.
+        unclaimed = [i for i in state["order"][name] if i not in explicit]
+        ids: list[str] = []
+        for item in items:
+            item_id = _explicit_id(item)
+            if item_id is None:
+                match = next((i for i in unclaimed if _content(stored[i]["value"]) == item), None)
+                if match is not None:
+                    unclaimed.remove(match)
+                    ids.append(match)
+                    continue
+                item_id = f"item-{uuid.uuid4().hex[:16]}"
+                item = _with_id(item, item_id)
+            ids.append(item_id)
+            current = stored.get(item_id)
+            if current is None or current["value"] != item:
+                ops.append({"op": "upsert", "field": name, "id": item_id, "value": item})
+        ids = list(dict.fromkeys(ids))
+        for item_id in state["order"][name]:
+            if item_id not in ids:
+                ops.append({"op": "delete", "field": name, "id": item_id})
+        if ids != state["order"][name]:
+            ops.append({"op": "order", "field": name, "ids": ids})
+    return ops
+
+
+def stage_user_data_ops(
+    state: dict[str, Any],
+    ops: list[dict[str, Any]],
+    updated_at: str,
+    if_updated_at: str | None = None,
+) -> dict[str, Any] | None:
+    """Apply `ops` to `state` in place and return the Firestore update payload.
+
+    Returns None when nothing changes. Raises UserDataConflict when
+    `if_updated_at` is given and does not match the stored `updatedAt`.
+    """
+
+    if if_updated_at is not None and if_updated_at != state["updatedAt"]:
+        raise UserDataConflict(state["version"], state["updatedAt"])
+
+    new_version = state["version"] + 1
+    touched: dict[str, set[str]] = {name: set() for name in USER_DATA_LISTS}
+    reordered: set[str] = set()
+    for op in ops:
+        name = op["field"]
+        items, order, deleted = state["items"][name], state["order"][name], state["deleted"][name]
+        if op["op"] == "order":
+            # Listed ids first, in that order; anything not listed keeps its place after them.
+            ids = [i for i in dict.fromkeys(op["ids"]) if i in items]
+            new_order = ids + [i for i in order if i not in set(ids)]
+            if new_order != order:
+                order[:] = new_order
+                reordered.add(name)
+            continue
+        item_id = op["id"]
+        if op["op"] == "upsert":
+            value = copy.deepcopy(op["value"])
+            if item_id in items and items[item_id]["value"] == value:
+                continue
+            if item_id not in items:
+                order.append(item_id)
+            items[item_id] = {"id": item_id, "value": value, "version": new_version}
+            deleted.pop(item_id, None)
+        else:
+            if item_id not in items:
+                continue
+            del items[item_id]
+            order.remove(item_id)
+            deleted[item_id] = new_version
+        touched[name].add(item_id)
+
+    if not any(touched.values()) and not reordered and not state["legacy"]:
+        return None
+
+    state["version"] = new_version
+    state["updatedAt"] = updated_at
+    updates: dict[str, Any] = {"version": new_version, "updatedAt": updated_at}
+
+    cutoff = new_version - TOMBSTONE_RETENTION_VERSIONS
+    pruned: dict[str, list[str]] = {name: [] for name in USER_DATA_LISTS}
+    for name in USER_DATA_LISTS:
+        for item_id, version in list(state["deleted"][name].items()):
+            if int(version or 0) <= cutoff:
+                del state["deleted"][name][item_id]
+                pruned[name].append(item_id)
+                state["tombstonesPrunedThrough"] = max(state["tombstonesPrunedThrough"], int(version or 0))
+    if any(pruned.values()):
+        updates["tombstonesPrunedThrough"] = state["tombstonesPrunedThrough"]
+
+    if state["legacy"]:
+        # New doc, or one-time migration: write the whole versioned layout and drop the arrays.
+        updates.update(
+            {
+                "items": state["items"],
+                "order": state["order"],
+                "deleted": state["deleted"],
+                "tombstonesPrunedThrough": state["tombstonesPrunedThrough"],
+            }
+        )
+        if state["exists"]:
+            updates.update({name: DELETE_FIELD for name in USER_DATA_LISTS})
+        state["legacy"] = False
+        state["exists"] = True
+        return updates
+
+    for name in USER_DATA_LISTS:
+        for item_id in pruned[name]:
+            updates[FieldPath("deleted", name, item_id).to_api_repr()] = DELETE_FIELD
+        if not touched[name] and name not in reordered:
+            continue
+        updates[FieldPath("order", name).to_api_repr()] = state["order"][name]
+        for item_id in touched[name]:
+            item_path = FieldPath("items", name, item_id).to_api_repr()
+            tombstone_path = FieldPath("deleted", name, item_id).to_api_repr()
+            if item_id in state["items"][name]:
+                updates[item_path] = state["items"][name][item_id]
+                updates[tombstone_path] = DELETE_FIELD
+            else:
+                updates[item_path] = DELETE_FIELD
+                updates[tombstone_path] = state["deleted"][name][item_id]
+    return updates
@@ -0,0 +1,589 @@
+"""Offline (Vosk) speech-to-text helpers.
+
+Models are configured with VOSK_MODEL_PATH_EN / VOSK_MODEL_PATH_HI (both set
+means both are run and the better-scoring transcript wins) or VOSK_MODEL_PATH,
+and fall back to models downloaded under backend/.vosk/models.
+"""
+
+import io
+import json
+import os
+import struct
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+_BACKEND_DIR = os.path.dirname(__file__)
+
+# Frames handed to the recognizer per AcceptWaveform call.
+CHUNK_FRAMES = 4000
+
+_vosk_models_by_path: dict[str, object] = {}
+# One lock per model path: the startup preload and the first requests share a
+# single load instead of each reading the model from disk.
+_vosk_model_locks: dict[str, threading.Lock] = {}
+_vosk_model_locks_guard = threading.Lock()
+
+_decode_executor: ThreadPoolExecutor | None = None
+_decode_executor_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except ValueError:
+        return default
+
+
+def _parallel_decode_enabled() -> bool:
+    return (os.getenv("VOSK_PARALLEL") or "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _get_decode_executor() -> ThreadPoolExecutor:
+    """Shared pool for running candidate models side by side.
+
+    Kaldi releases the GIL while decoding, so threads give real parallelism
+    without copying models into worker processes.
+    """
+
+    global _decode_executor
+    with _decode_executor_lock:
+        if _decode_executor is None:
+            try:
+                workers = int(os.getenv("VOSK_PARALLEL_WORKERS") or "4")
+            except ValueError:
+                workers = 4
+            _decode_executor = ThreadPoolExecutor(max_workers=max(workers, 2), thread_name_prefix="vosk-decode")
+        return _decode_executor
+
+
+def get_vosk_model(model_path: str):
+    if not model_path:
+        raise RuntimeError(
+            "Voice transcription is not configured. Set ASSEMBLYAI_API_KEY (cloud) or VOSK_MODEL_PATH_* (offline)."
+        )
+    if not os.path.isdir(model_path):
+        raise RuntimeError(
+            "Vosk model path is set but the folder does not exist. "
+            "Download a Vosk model, extract it, and point VOSK_MODEL_PATH_* to that folder."
+        )
+
+    cached = _vosk_models_by_path.get(model_path)
+    if cached is not None:
+        return cached
+
+    with _vosk_model_locks_guard:
+        lock = _vosk_model_locks.setdefault(model_path, threading.Lock())
+    with lock:
+        cached = _vosk_models_by_path.get(model_path)
+        if cached is not None:
+            return cached
+        try:
+            from vosk import Model  # type: ignore
+        except Exception as e:
+            raise RuntimeError(f"Offline transcription dependency missing: {e}")
+
+        model = Model(model_path)
+        _vosk_models_by_path[model_path] = model
+        return model
+
+
+def new_recognizer(model_path: str, sample_rate: int):
+    try:
+        from vosk import KaldiRecognizer  # type: ignore
+    except Exception as e:
+        raise RuntimeError(f"Offline transcription dependency missing: {e}")
+    return KaldiRecognizer(get_vosk_model(model_path), sample_rate)
+
+
+def score_vosk_result(payload: dict) -> float:
+    text = (payload.get("text") or "").strip()
+    if not text:
+        return 0.0
+    words = payload.get("result")
+    if isinstance(words, list) and words:
+        confs: list[float] = []
+        for w in words:
+            if not isinstance(w, dict):
+                continue
+            conf = w.get("conf")
+            if isinstance(conf, (int, float)):
+                confs.append(float(conf))
+        if confs:
+            avg_conf = sum(confs) / max(len(confs), 1)
+            return float(avg_conf) * float(len(text) + 1)
+    return float(len(text))
+
+
+def auto_detect_vosk_models() -> tuple[str, str, str]:
+    """Auto-detect local Vosk models under backend/.vosk/models.
+
+    Returns (en_path, hi_path, default_path). Any value may be empty.
+    """
+
+    models_root = os.path.join(_BACKEND_DIR, ".vosk", "models")
+    if not os.path.isdir(models_root):
+        return "", "", ""
+
+    try:
+        dirs = [
+            os.path.join(models_root, d)
+            for d in os.listdir(models_root)
+            if os.path.isdir(os.path.join(models_root, d))
+        ]
+    except Exception:
+        return "", "", ""
+
+    def pick(prefixes: list[str]) -> str:
+        for p in prefixes:
+            for d in dirs:
+                name = os.path.basename(d).lower()
+                if name.startswith(p.lower()):
+                    return d
+        return ""
+
+    en = pick(["vosk-model-small-en-us", "vosk-model-en-us", "vosk-model-small-en-in", "vosk-model-en-in"])
+    hi = pick(["vosk-model-small-hi", "vosk-model-hi"])
+    default = en or hi or (dirs[0] if dirs else "")
+    return en, hi, default
+
+
+def configured_vosk_models() -> tuple[str, str, str]:
+    """(en_path, hi_path, default_path) from env, else auto-detected."""
+
+    model_path_default = (os.getenv("VOSK_MODEL_PATH") or "").strip()
+    model_path_en = (os.getenv("VOSK_MODEL_PATH_EN") or "").strip()
+    model_path_hi = (os.getenv("VOSK_MODEL_PATH_HI") or "").strip()
+
+    # If env vars are not present (common on Windows + reload quirks),
+    # auto-detect models we downloaded under backend/.vosk/models.
+    if not (model_path_default or model_path_en or model_path_hi):
+        return auto_detect_vosk_models()
+    return model_path_en, model_path_hi, model_path_default
+
+
+def resolve_vosk_model_paths(language_code: str) -> list[str]:
+    model_path_en, model_path_hi, model_path_default = configured_vosk_models()
+
+    # If both language models are available, run both and pick the better result.
+    # This keeps UX simple (no language picker) while supporting English + Hindi.
+    if model_path_en and model_path_hi:
+        return [model_path_en, model_path_hi]
+
+    # If only one model is configured, pick based on language code when possible.
+    if language_code.lower().startswith("hi") and model_path_hi:
+        return [model_path_hi]
+    if language_code.lower().startswith("en") and model_path_en:
+        return [model_path_en]
+    if model_path_default:
+        return [model_path_default]
+    if model_path_en:
+        return [model_path_en]
+    if model_path_hi:
+        return [model_path_hi]
+    raise RuntimeError(
+        "Offline voice transcription is not configured. Set VOSK_MODEL_PATH_EN and VOSK_MODEL_PATH_HI (recommended), or VOSK_MODEL_PATH."
+    )
+
+
+def read_wav_pcm(audio_bytes: bytes) -> tuple[bytes, int]:
+    """Validate a mono 16-bit WAV and return (pcm_frames, sample_rate)."""
+
+    if not audio_bytes.startswith(b"RIFF"):
+        raise RuntimeError(
+            "Offline transcription expects WAV audio. Please update the client to send WAV/PCM."
+        )
+    with wave.open(io.BytesIO(audio_bytes), "rb") as wf:
+        if wf.getnchannels() != 1:
+            raise RuntimeError("Offline transcription requires mono WAV audio")
+        if wf.getsampwidth() != 2:
+            raise RuntimeError("Offline transcription requires 16-bit PCM WAV audio")
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+
+def split_wav_header(chunk: bytes) -> tuple[int, bytes]:
+    """Parse the RIFF header leading a streamed WAV; return (sample_rate, PCM after the header).
+
+    Everything up to the start of the `data` chunk must be in `chunk`.
+    """
+
+    if len(chunk) < 12 or not chunk.startswith(b"RIFF") or chunk[8:12] != b"WAVE":
+        raise RuntimeError("Invalid WAV header")
+    sample_rate: int | None = None
+    offset = 12
+    while offset + 8 <= len(chunk):
+        chunk_id = chunk[offset : offset + 4]
+        size = int.from_bytes(chunk[offset + 4 : offset + 8], "little")
+        body = offset + 8
+        if chunk_id == b"data":
+            if sample_rate is None:
+                raise RuntimeError("WAV header has no fmt chunk before the audio data")
+            return sample_rate, chunk[body:]
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(chunk):
+                raise RuntimeError("Invalid WAV header")
+            audio_format, channels, rate = struct.unpack_from("<HHI", chunk, body)
+            (bits,) = struct.unpack_from("<H", chunk, body + 14)
+            # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE (PCM with a channel mask).
+            if audio_format not in (1, 0xFFFE) or bits != 16:
+                raise RuntimeError("Offline transcription requires 16-bit PCM WAV audio")
+            if channels != 1:
+                raise RuntimeError("Offline transcription requires mono WAV audio")
+            sample_rate = rate
+        # Chunks are padded to an even size.
+        offset = body + size + (size & 1)
+    raise RuntimeError("The WAV header must arrive whole in the first binary message")
+
+
+class RecognizerPool:
+    """Idle recognizers per (model, sample rate, words flag), reset between uses.
+
+    Building a KaldiRecognizer allocates decoder state on every request; the
+    pool keeps up to VOSK_RECOGNIZER_POOL_SIZE idle ones per key instead.
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max(int(max_idle), 0)
+        self._idle: dict[tuple[str, int, bool], list[Any]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, model_path: str, sample_rate: int, words: bool = False) -> Any:
+        key = (model_path, int(sample_rate), bool(words))
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        recognizer = new_recognizer(model_path, sample_rate)
+        if words:
+            # Per-word confidences make score_vosk_result confidence-weighted.
+            recognizer.SetWords(True)
+        return recognizer
+
+    def release(self, model_path: str, sample_rate: int, words: bool, recognizer: Any) -> None:
+        try:
+            recognizer.Reset()
+        except Exception:
+            return
+        key = (model_path, int(sample_rate), bool(words))
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(recognizer)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "maxIdlePerKey": self.max_idle,
+                "idle": {f"{os.path.basename(k[0])}@{k[1]}{'+words' if k[2] else ''}": len(v) for k, v in self._idle.items()},
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+
+_recognizer_pool: RecognizerPool | None = None
+
+
+def get_recognizer_pool() -> RecognizerPool:
+    global _recognizer_pool
+    if _recognizer_pool is None:
+        try:
+            size = int(os.getenv("VOSK_RECOGNIZER_POOL_SIZE") or "4")
+        except ValueError:
+            size = 4
+        _recognizer_pool = RecognizerPool(max_idle=size)
+    return _recognizer_pool
+
+
+class VoskDecode:
+    """One recognizer plus the text of the segments it has finished.
+
+    Kaldi starts a new segment after each endpoint, so segment results are
+    collected as they complete and merged into one payload at the end.
+    """
+
+    def __init__(self, model_path: str, sample_rate: int, words: bool = False):
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.words = words
+        self.recognizer: Any = get_recognizer_pool().acquire(model_path, sample_rate, words)
+        self.segments: list[dict[str, Any]] = []
+        self.partial = ""
+
+    def feed(self, pcm: bytes, start: int = 0, end: int | None = None) -> None:
+        end = len(pcm) if end is None else end
+        chunk_bytes = CHUNK_FRAMES * 2
+        for pos in range(start, end, chunk_bytes):
+            if self.recognizer.AcceptWaveform(pcm[pos : min(pos + chunk_bytes, end)]):
+                self.segments.append(json.loads(self.recognizer.Result() or "{}"))
+                self.partial = ""
+
+    def refresh_partial(self) -> str:
+        self.partial = (json.loads(self.recognizer.PartialResult() or "{}").get("partial") or "").strip()
+        return self.partial
+
+    def committed_text(self) -> str:
+        return " ".join((seg.get("text") or "").strip() for seg in self.segments if seg.get("text")).strip()
+
+    def current_text(self) -> str:
+        return " ".join(t for t in (self.committed_text(), self.partial) if t)
+
+    def release(self) -> None:
+        """Return the recognizer to the pool; safe to call more than once."""
+
+        if self.recognizer is not None:
+            get_recognizer_pool().release(self.model_path, self.sample_rate, self.words, self.recognizer)
+            self.recognizer = None
+
+    def finish(self) -> dict[str, Any]:
+        self.segments.append(json.loads(self.recognizer.FinalResult() or "{}"))
+        self.release()
+        words: list[Any] = []
+        for seg in self.segments:
+            if isinstance(seg.get("result"), list):
+                words.extend(seg["result"])
+        payload: dict[str, Any] = {"text": self.committed_text()}
+        if words:
+            payload["result"] = words
+        return payload
+
+
+def pick_best_text(payloads: list[dict[str, Any]]) -> str:
+    best_text = ""
+    best_score = 0.0
+    for payload in payloads:
+        text = (payload.get("text") or "").strip()
+        score = score_vosk_result(payload)
+        if score > best_score:
+            best_score = score
+            best_text = text
+    return best_text
+
+
+def _decode_sequential(candidate_paths: list[str], pcm: bytes, sample_rate: int) -> list[dict[str, Any]]:
+    payloads: list[dict[str, Any]] = []
+    for model_path in candidate_paths:
+        decode = VoskDecode(model_path, sample_rate)
+        decode.feed(pcm)
+        payloads.append(decode.finish())
+    return payloads
+
+
+def _decode_parallel(candidate_paths: list[str], pcm: bytes, sample_rate: int) -> list[dict[str, Any]]:
+    """Run every candidate model concurrently over the same PCM buffer.
+
+    With VOSK_EARLY_EXIT_SECONDS > 0, the models advance in one-second
+    lockstep windows. At that point of the audio, a model whose transcript
+    so far is VOSK_EARLY_EXIT_RATIO times longer than every other model's
+    is kept, and the others are dropped. A model decoding the wrong language
+    tends to emit few or no words, so this is a cheap dominance signal.
+    Dropped models return an empty payload.
+    """
+
+    executor = _get_decode_executor()
+    decodes = list(executor.map(lambda p: VoskDecode(p, sample_rate), candidate_paths))
+    active = list(range(len(decodes)))
+
+    early_exit_seconds = _env_float("VOSK_EARLY_EXIT_SECONDS", 0.0)
+    early_exit_ratio = _env_float("VOSK_EARLY_EXIT_RATIO", 3.0)
+    bytes_per_second = sample_rate * 2
+
+    pos = 0
+    if early_exit_seconds > 0 and len(decodes) > 1:
+        # Whole samples only, so a 16-bit sample is never split across windows.
+        checkpoint = min(len(pcm), int(early_exit_seconds * sample_rate) * 2)
+        while pos < checkpoint:
+            end = min(pos + bytes_per_second, checkpoint)
+            list(executor.map(lambda i: decodes[i].feed(pcm, pos, end), active))
+            pos = end
+
+        lengths = {}
+        for i in active:
+            decodes[i].refresh_partial()
+            lengths[i] = len(decodes[i].current_text())
+        leader = max(active, key=lambda i: lengths[i])
+        others = [lengths[i] for i in active if i != leader]
+        if lengths[leader] >= 4 and all(lengths[leader] >= early_exit_ratio * max(n, 1) for n in others):
+            for i in active:
+                if i != leader:
+                    decodes[i].release()
+            active = [leader]
+
+    def finish(i: int) -> dict[str, Any]:
+        decodes[i].feed(pcm, pos, len(pcm))
+        return decodes[i].finish()
+
+    results = dict(zip(active, executor.map(finish, active)))
+    return [results.get(i, {}) for i in range(len(decodes))]
+
+
+@dataclass
+class LanguageIdResult:
+    # Chosen model, or None when no model clearly won (caller decodes with all).
+    model_path: str | None
+    scores: dict[str, float]
+
+
+def _langid_enabled() -> bool:
+    return (os.getenv("VOSK_LANGID") or "0").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def identify_language_model(
+    candidate_paths: list[str],
+    pcm: bytes,
+    sample_rate: int,
+    seconds: float | None = None,
+    margin: float | None = None,
+) -> LanguageIdResult:
+    """Pick a model from a short prefix of the audio.
+
+    Every candidate decodes only the first VOSK_LANGID_SECONDS (default 1.5)
+    with word confidences enabled. The best confidence-weighted score must
+    beat the runner-up by VOSK_LANGID_MARGIN (default 1.5x). Otherwise no
+    model is chosen.
+    """
+
+    seconds = _env_float("VOSK_LANGID_SECONDS", 1.5) if seconds is None else seconds
+    margin = _env_float("VOSK_LANGID_MARGIN", 1.5) if margin is None else margin
+    prefix_len = min(len(pcm), int(seconds * sample_rate) * 2)
+    prefix = pcm[:prefix_len]
+
+    def score_prefix(model_path: str) -> float:
+        decode = VoskDecode(model_path, sample_rate, words=True)
+        decode.feed(prefix)
+        return score_vosk_result(decode.finish())
+
+    scores = dict(zip(candidate_paths, _get_decode_executor().map(score_prefix, candidate_paths)))
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    if not ranked or ranked[0][1] <= 0:
+        return LanguageIdResult(model_path=None, scores=scores)
+    if len(ranked) == 1 or ranked[0][1] >= margin * max(ranked[1][1], 1e-9):
+        return LanguageIdResult(model_path=ranked[0][0], scores=scores)
+    return LanguageIdResult(model_path=None, scores=scores)
+
+
+def transcribe_pcm(pcm: bytes, sample_rate: int, candidate_paths: list[str], langid: bool | None = None) -> str:
+    if len(candidate_paths) > 1 and (_langid_enabled() if langid is None else langid):
+        chosen = identify_language_model(candidate_paths, pcm, sample_rate).model_path
+        if chosen is not None:
+            candidate_paths = [chosen]
+
+    if len(candidate_paths) > 1 and _parallel_decode_enabled():
+        payloads = _decode_parallel(candidate_paths, pcm, sample_rate)
+    else:
+        payloads = _decode_sequential(candidate_paths, pcm, sample_rate)
+    return pick_best_text(payloads)
+
+
+def transcribe_wav(audio_bytes: bytes, language_code: str) -> str:
+    if not audio_bytes:
+        return ""
+    pcm, sample_rate = read_wav_pcm(audio_bytes)
+    return transcribe_pcm(pcm, sample_rate, resolve_vosk_model_paths(language_code))
+
+
+def transcription_scope(language_code: str) -> str:
+    """Identifies everything besides the audio that can change `transcribe_wav` output."""
+
+    paths = resolve_vosk_model_paths(language_code)
+    scope = "vosk:" + "|".join(paths)
+    if len(paths) > 1:
+        if _langid_enabled():
+            scope += f":langid={_env_float('VOSK_LANGID_SECONDS', 1.5)}/{_env_float('VOSK_LANGID_MARGIN', 1.5)}"
+        early_exit_seconds = _env_float("VOSK_EARLY_EXIT_SECONDS", 0.0)
+        if _parallel_decode_enabled() and early_exit_seconds > 0:
+            scope += f":early-exit={early_exit_seconds}/{_env_float('VOSK_EARLY_EXIT_RATIO', 3.0)}"
+    return scope
+
+
+class VoskStream:
+    """Incremental decode of raw 16-bit mono PCM through one or more models.
+
+    Audio is handed to every candidate recognizer as it arrives and is not
+    retained, so memory per stream stays bounded regardless of length. Each
+    recognizer's finished segments are kept as text only. A chunk that ends
+    mid-sample keeps its last byte for the next one, so samples stay aligned.
+    """
+
+    def __init__(self, model_paths: list[str], sample_rate: int):
+        self.sample_rate = sample_rate
+        self._decodes = [VoskDecode(p, sample_rate) for p in model_paths]
+        self._carry = b""
+        self.bytes_received = 0
+
+    @property
+    def seconds_received(self) -> float:
+        return self.bytes_received / float(2 * self.sample_rate)
+
+    def accept(self, pcm: bytes) -> str:
+        """Feed PCM to every recognizer; return the current best partial transcript."""
+
+        pcm = self._carry + pcm
+        whole = len(pcm) - len(pcm) % 2
+        pcm, self._carry = pcm[:whole], pcm[whole:]
+        self.bytes_received += len(pcm)
+        for decode in self._decodes:
+            decode.feed(pcm)
+            decode.refresh_partial()
+        texts = [d.current_text() for d in self._decodes]
+        return max(texts, key=len) if texts else ""
+
+    def finish(self) -> str:
+        return pick_best_text([d.finish() for d in self._decodes])
+
+    def close(self) -> None:
+        for decode in self._decodes:
+            decode.release()
+
+
+_preload_lock = threading.Lock()
+_preload_status: dict[str, Any] = {"state": "idle", "models": {}}
+
+
+def preload_status() -> dict[str, Any]:
+    with _preload_lock:
+        return {**_preload_status, "models": dict(_preload_status["models"])}
+
+
+def preload_vosk_models(sample_rate: int | None = None) -> dict[str, Any]:
+    """Load every configured/auto-detected model and warm its recognizer pool.
+
+    Intended to run once in a background thread at startup; progress is
+    reported through `preload_status()`.
+    """
+
+    if sample_rate is None:
+        try:
+            sample_rate = int(os.getenv("VOSK_PRELOAD_SAMPLE_RATE") or "16000")
+        except ValueError:
+            sample_rate = 16000
+
+    paths = [p for p in dict.fromkeys(configured_vosk_models()) if p]
+    with _preload_lock:
+        _preload_status.update({"state": "loading", "models": {p: "pending" for p in paths}, "startedAt": time.time()})
+
+    pool = get_recognizer_pool()
+    failed = False
+    for path in paths:
+        try:
+            get_vosk_model(path)
+            warm = [VoskDecode(path, sample_rate) for _ in range(max(pool.max_idle, 1))]
+            for decode in warm:
+                decode.release()
+            status = "ready"
+        except Exception as e:
+            failed = True
+            status = f"error: {e}"
+        with _preload_lock:
+            _preload_status["models"][path] = status
+
+    with _preload_lock:
+        _preload_status["state"] = "error" if failed else ("ready" if paths else "disabled")
+        _preload_status["loadSeconds"] = round(time.time() - _preload_status["startedAt"], 3)
+    return preload_status()
@@ -6,7 +6,8 @@ import { apiFetch } from '@/lib/api-client';
 // Get all community posts (public)
 export async function getAllCommunityPosts(communitySlug?: string | null): Promise<CommunityPost[]> {
   const qs = communitySlug ? `?community=${encodeURIComponent(communitySlug)}` : '';
-  return apiFetch<CommunityPost[]>(`/posts${qs}`);
+  const page = await apiFetch<{ items: CommunityPost[]; nextCursor: string | null }>(`/posts${qs}`);
+  return page?.items || [];
 }
 
 // Add a new community post (requires auth)
@@ -1,5 +1,7 @@
 'use client';
 
+import { apiFetch } from '@/lib/api-client';
+
 export type DailyHistoricalData = {
   userId: string;
   date: string;
@@ -23,12 +25,23 @@ export type DailyHistoricalData = {
   resetAt: string;
 };
 
-export async function getDailyHistoricalData(_userId: string, _date: string): Promise<DailyHistoricalData | null> {
-  return null;
+type DailyHistoryRange = { days: { [date: string]: DailyHistoricalData | null } };
+
+export async function getDailyHistoricalData(_userId: string, date: string): Promise<DailyHistoricalData | null> {
+  const range = await apiFetch<DailyHistoryRange>(`/user-data/me/days?from=${date}&to=${date}`);
+  return range.days?.[date] ?? null;
 }
 
+// One request (one batched read on the backend) for the whole span of dates.
 export async function getWeeklyHistoricalData(_userId: string, dates: string[]): Promise<{ [date: string]: DailyHistoricalData | null }> {
   const out: { [date: string]: DailyHistoricalData | null } = {};
   for (const d of dates) out[d] = null;
+  if (!dates.length) return out;
+
+  const sorted = [...dates].sort();
+  const range = await apiFetch<DailyHistoryRange>(
+    `/user-data/me/days?from=${sorted[0]}&to=${sorted[sorted.length - 1]}`,
+  );
+  for (const d of dates) out[d] = range.days?.[d] ?? null;
   return out;
 }
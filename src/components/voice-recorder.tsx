@@ -79,20 +79,48 @@ export default function VoiceRecorder() {
     const formData = new FormData();
     formData.append('audio', audioBlob, 'voice.webm');
 
-    const response = await fetch(`${baseUrl.replace(/\/$/, '')}/voice`, {
+    setReply('');
+    setTranscription('');
+
+    const response = await fetch(`${baseUrl.replace(/\/$/, '')}/voice/sse`, {
       method: 'POST',
       body: formData,
     });
 
-    const data = (await response.json().catch(() => ({}))) as VoiceResponse;
-
-    if (!response.ok) {
+    if (!response.ok || !response.body) {
+      const data = (await response.json().catch(() => ({}))) as VoiceResponse;
       setError(data.error || `Request failed (${response.status})`);
       return;
     }
 
-    setReply(data.reply || '');
-    setTranscription(data.transcription || '');
+    // Server-sent events: the transcription arrives first, then reply tokens.
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const payload = (data ? JSON.parse(data) : {}) as { text?: string; reply?: string; error?: string };
+
+        if (event === 'transcription') setTranscription(payload.text || '');
+        else if (event === 'token') setReply((prev) => prev + (payload.text || ''));
+        else if (event === 'done') setReply(payload.reply || '');
+        else if (event === 'error') setError(payload.error || 'Failed to generate reply');
+      }
+    }
   };
 
   return (
@@ -101,8 +101,8 @@ export function AuthProvider({ children }: { children: React.ReactNode }) {
   const refreshPosts = useCallback(async (communitySlug?: string | null) => {
     try {
       const qs = communitySlug ? `?community=${encodeURIComponent(communitySlug)}` : '';
-      const list = await apiFetch<CommunityPost[]>(`/posts${qs}`);
-      setPosts(list || []);
+      const page = await apiFetch<{ items: CommunityPost[]; nextCursor: string | null }>(`/posts${qs}`);
+      setPosts(page?.items || []);
     } catch {
       setPosts([]);
     }
@@ -4,14 +4,20 @@ import type { BuddyPersona, User } from '@/lib/user-store';
 import { apiFetch } from '@/lib/api-client';
 import type { Challenge, DailyVibe } from '@/lib/data';
 
-async function getUserData(): Promise<{ challenges: Challenge[]; dailyVibes: DailyVibe[] }> {
-  return apiFetch('/user-data/me');
-}
+type UserDataList = 'challenges' | 'dailyVibes';
+type UserDataOp =
+  | { op: 'upsert'; field: UserDataList; id: string; value: Challenge | DailyVibe }
+  | { op: 'delete'; field: UserDataList; id: string };
 
-async function putUserData(payload: { challenges: Challenge[]; dailyVibes: DailyVibe[] }) {
+async function putUserData(payload: { challenges?: Challenge[]; dailyVibes?: DailyVibe[] }) {
   return apiFetch('/user-data/me', { method: 'PUT', body: JSON.stringify(payload) });
 }
 
+// Per-item changes; only the touched items are sent and written.
+async function patchUserData(ops: UserDataOp[]) {
+  return apiFetch('/user-data/me', { method: 'PATCH', body: JSON.stringify({ ops }) });
+}
+
 // Kept for backward compatibility with existing imports.
 export async function createUserInFirestore(_uid: string, _data: Omit<User, 'uid'>) {
   // User creation now happens via backend /auth/signup.
@@ -26,34 +32,26 @@ export async function getUserFromFirestore(_uid: string): Promise<User | null> {
   }
 }
 
-// Dashboard persistence (now SQLite-backed)
+// Dashboard persistence
 export async function updateDailyVibes(_userId: string, vibes: DailyVibe[]) {
-  const existing = await getUserData();
-  await putUserData({ ...existing, dailyVibes: vibes });
+  // The backend diffs the list and only writes vibes that changed.
+  await putUserData({ dailyVibes: vibes });
 }
 
 export async function removeDailyVibe(_userId: string, vibeId: string) {
-  const existing = await getUserData();
-  const filtered = (existing.dailyVibes || []).filter((v: any) => v.id !== vibeId);
-  await putUserData({ ...existing, dailyVibes: filtered });
+  await patchUserData([{ op: 'delete', field: 'dailyVibes', id: vibeId }]);
 }
 
 export async function updateChallenge(_userId: string, challenge: Challenge) {
-  const existing = await getUserData();
-  const updated = (existing.challenges || []).map((c: any) => (c.id === challenge.id ? challenge : c));
-  await putUserData({ ...existing, challenges: updated });
+  await patchUserData([{ op: 'upsert', field: 'challenges', id: challenge.id, value: challenge }]);
 }
 
 export async function addChallenge(_userId: string, newChallenge: Challenge) {
-  const existing = await getUserData();
-  const next = [...(existing.challenges || []), newChallenge];
-  await putUserData({ ...existing, challenges: next });
+  await patchUserData([{ op: 'upsert', field: 'challenges', id: newChallenge.id, value: newChallenge }]);
 }
 
 export async function removeChallenge(_userId: string, challengeId: string) {
-  const existing = await getUserData();
-  const filtered = (existing.challenges || []).filter((c: any) => c.id !== challengeId);
-  await putUserData({ ...existing, challenges: filtered });
+  await patchUserData([{ op: 'delete', field: 'challenges', id: challengeId }]);
 }
 
 // Profile management (now SQLite-backed)